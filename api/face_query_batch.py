@@ -0,0 +1,46 @@
+from typing import List
+
+from fastapi import APIRouter, File, UploadFile, Query
+from fastapi.responses import JSONResponse
+
+
+from service.face_query_batch_service import query_face_batch_service
+
+face_query_batch_router = APIRouter()
+
+@face_query_batch_router.post(
+    '/query_batch',
+    summary="Nhận diện khuôn mặt hàng loạt",
+    description="""
+    **Nhận diện nhiều ảnh khuôn mặt trong một request**
+
+    API này tương tự `/query` nhưng xử lý nhiều ảnh cùng lúc:
+    - Nhận nhiều file ảnh và/hoặc file zip chứa ảnh
+    - Trích xuất đặc trưng toàn bộ ảnh trong một lần chạy model
+    - Tìm kiếm tất cả ảnh trong một lần truy vấn FAISS
+    - Trả về kết quả riêng cho từng ảnh theo đúng thứ tự gửi lên
+
+    **Ứng dụng:**
+    - Kiểm tra danh tính hàng loạt (log cổng ra vào, album ảnh)
+    - Thay thế nhiều lần gọi `/query` liên tiếp
+
+    **Lưu ý:**
+    - Tối đa 64 ảnh mỗi request (kể cả ảnh trong file zip)
+    - Ảnh không decode được sẽ trả về trường `error` riêng cho ảnh đó
+    - Chỉ trả về kết quả có score > 0.45 (giống `/query`)
+    """,
+    response_description="Kết quả nhận diện cho từng ảnh",
+    tags=["👤 Nhận Diện Khuôn Mặt"]
+)
+async def query_face_batch(
+    files: List[UploadFile] = File(
+        ...,
+        description="Các file ảnh (JPG, PNG, WEBP) hoặc file zip chứa ảnh"
+    ),
+    topk: int = Query(1, ge=1, le=5, description="Số kết quả tối đa cho mỗi ảnh (1-5)")
+):
+    result = await query_face_batch_service(files, topk)
+    status_code = result.get("status_code", 200)
+    if "status_code" in result:
+        result = {k: v for k, v in result.items() if k != "status_code"}
+    return JSONResponse(content=result, status_code=status_code)
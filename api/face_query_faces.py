@@ -0,0 +1,44 @@
+from fastapi import APIRouter, File, UploadFile, Query
+from fastapi.responses import JSONResponse
+
+
+from service.face_query_faces_service import query_faces_service
+
+face_query_faces_router = APIRouter()
+
+@face_query_faces_router.post(
+    '/query_faces',
+    summary="Nhận diện tất cả khuôn mặt trong ảnh nhóm",
+    description="""
+    **Nhận diện mọi khuôn mặt trong một ảnh (ảnh nhóm, ảnh sự kiện, đám đông)**
+
+    API này sẽ:
+    - Phát hiện tất cả khuôn mặt trong ảnh (SCRFD) và căn chỉnh theo 5 điểm landmark
+    - Trích xuất đặc trưng toàn bộ khuôn mặt trong một lần chạy model
+    - Tìm kiếm tất cả khuôn mặt trong một lần truy vấn FAISS
+    - Lấy thông tin người bằng một truy vấn MySQL duy nhất
+
+    **Kết quả trả về cho từng khuôn mặt:**
+    - `bbox`: [x1, y1, x2, y2] trên ảnh gốc, `det_score`, `kps` (5 landmark)
+    - `results`: top-k kết quả có score > 0.45 kèm thông tin người
+
+    **Lưu ý:**
+    - Cần bật `FACE_DETECTION_ENABLED` trong config.py và có model SCRFD, nếu không trả về 503
+    - Hỗ trợ định dạng: JPG, PNG, WEBP
+    """,
+    response_description="Danh sách khuôn mặt phát hiện được và kết quả nhận diện của từng khuôn mặt",
+    tags=["👤 Nhận Diện Khuôn Mặt"]
+)
+async def query_faces(
+    file: UploadFile = File(
+        ...,
+        description="File ảnh nhóm cần nhận diện (JPG, PNG, WEBP)",
+        media_type="image/*"
+    ),
+    topk: int = Query(1, ge=1, le=5, description="Số kết quả tối đa cho mỗi khuôn mặt (1-5)")
+):
+    result = await query_faces_service(file, topk)
+    status_code = result.get("status_code", 200)
+    if "status_code" in result:
+        result = {k: v for k, v in result.items() if k != "status_code"}
+    return JSONResponse(content=result, status_code=status_code)
@@ -15,17 +15,17 @@ list_nguoi_router = APIRouter()
     API này cung cấp:
     - Danh sách tất cả người trong cơ sở dữ liệu
     - Thông tin chi tiết: tên, tuổi, giới tính, nơi ở, class_id
-    - Tính năng tìm kiếm theo tên
+    - Tìm kiếm không dấu, không phân biệt hoa thường theo tên, nơi ở, tuổi, giới tính (vd. "nguyen van duc" khớp "Nguyễn Văn Đức")
     - Phân trang để hiển thị hiệu quả
     
     **Tham số tìm kiếm:**
-    - query: Từ khóa tìm kiếm theo tên (để trống để hiển thị tất cả)
+    - query: Từ khóa tìm kiếm theo tên, nơi ở, tuổi, giới tính, có dấu hoặc không dấu (để trống để hiển thị tất cả)
     - page: Số trang hiện tại (bắt đầu từ 1)
     - page_size: Số lượng kết quả mỗi trang (tối đa 100)
     
     **Kết quả trả về:**
     - Danh sách người phù hợp với điều kiện tìm kiếm
-    - Tổng số kết quả tìm được
+    - Tổng số kết quả tìm được (lọc trước khi phân trang nên các trang luôn đủ page_size, trừ trang cuối)
     - Thông tin phân trang
     """,
     response_description="Danh sách thông tin người với phân trang",
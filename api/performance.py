@@ -0,0 +1,90 @@
+from fastapi import APIRouter
+
+from service.performance_monitor import get_performance_stats, get_performance_summary
+from service.shared_instances import get_inference_batcher, get_faiss_manager, get_faiss_lock
+from service.stage_executor import get_stage_stats
+from db.mysql_conn import get_pool
+from db.async_repository import get_async_pool_stats
+from db.nguoi_cache import nguoi_cache
+from db.nguoi_search_index import nguoi_search_index
+
+performance_router = APIRouter()
+
+
+@performance_router.get(
+    '/performance/stats',
+    summary="Thống kê hiệu suất các thao tác",
+    description="Số lần gọi, thời gian trung bình/min/max và số lỗi của từng thao tác được theo dõi."
+)
+def performance_stats():
+    return {
+        "summary": get_performance_summary(),
+        "operations": get_performance_stats()
+    }
+
+
+@performance_router.get(
+    '/performance/batcher',
+    summary="Thống kê micro-batching inference",
+    description="Histogram độ sâu hàng đợi và kích thước batch của micro-batcher ArcFace."
+)
+def batcher_stats():
+    return get_inference_batcher().get_stats()
+
+
+@performance_router.get(
+    '/performance/stages',
+    summary="Thống kê thread pool theo stage",
+    description="Số việc đang chạy, số request bị từ chối (503) và histogram thời gian chờ/chạy của các stage decode, model, index, db."
+)
+def stage_stats():
+    return get_stage_stats()
+
+
+@performance_router.get(
+    '/performance/persistence',
+    summary="Thống kê ghi bền FAISS nền",
+    description="Số thay đổi đang chờ ghi, số lần ghi (đã gộp) và thời gian lần ghi gần nhất của persistence worker."
+)
+def persistence_stats():
+    persistence = get_faiss_manager().persistence
+    return persistence.get_stats() if persistence is not None else {"enabled": False}
+
+
+@performance_router.get(
+    '/performance/faiss_lock',
+    summary="Thống kê reader-writer lock của FAISS",
+    description="Số reader đang giữ lock, số writer đang chờ, số reader chạy song song tối đa và thời gian chờ lâu nhất của writer."
+)
+def faiss_lock_stats():
+    return get_faiss_lock().get_stats()
+
+
+@performance_router.get(
+    '/performance/db_pool',
+    summary="Thống kê connection pool MySQL",
+    description="Số kết nối đang mở/rảnh/đang dùng, số lần lấy kết nối, số lần phải chờ, timeout và lỗi health check. "
+                "`async_pools`: pool aiomysql của từng event loop khi bật MYSQL_ASYNC_ENABLED."
+)
+def db_pool_stats():
+    stats = get_pool().get_stats()
+    stats['async_pools'] = get_async_pool_stats()
+    return stats
+
+
+@performance_router.get(
+    '/performance/nguoi_cache',
+    summary="Thống kê cache thông tin người",
+    description="Số lần trúng/trượt (kể cả kết quả âm), tỉ lệ trúng, số mục hết hạn, bị loại (LRU) và số lần invalidate của cache bảng nguoi."
+)
+def nguoi_cache_stats():
+    return nguoi_cache.get_stats()
+
+
+@performance_router.get(
+    '/performance/nguoi_search',
+    summary="Thống kê index tìm kiếm người",
+    description="Số người trong index (chính + delta), số bản ghi đã xóa chờ gộp, số trigram, bộ nhớ, tuổi index, số lần dựng lại/gộp và thời gian dựng gần nhất của index tìm kiếm /list_nguoi."
+)
+def nguoi_search_stats():
+    return nguoi_search_index.get_stats()
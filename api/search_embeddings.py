@@ -24,6 +24,7 @@ embedding_search_router = APIRouter()
     **Kết quả trả về:**
     - Danh sách embedding phù hợp
     - Chi tiết image_id, image_path, class_id
+    - Thông tin người (nguoi) của từng ảnh, lấy cho cả trang trong một truy vấn MySQL
     - Thông tin phân trang
     - Tổng số kết quả tìm được
     
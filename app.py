@@ -1,6 +1,8 @@
 import os
+import threading
 import time
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from api.face_query import router as face_query_router
 from api.delete_class import delete_class_router
@@ -11,11 +13,19 @@ from api.get_image_ids_by_class import get_image_ids_by_class_router
 from api.index_status import status_router
 from api.reset_index import reset_router
 from api.face_query_top5 import face_query_top5_router
+from api.face_query_batch import face_query_batch_router
+from api.face_query_faces import face_query_faces_router
 from api.edit_embedding import edit_embedding_router
 from api.list_nguoi import list_nguoi_router
 from api.search_embeddings import embedding_search_router
 from api.health import health_router
 from api.predict import predict_router
+from service.stage_executor import StageOverloadedError, run_in_stage
+from service.shared_instances import get_faiss_manager, reload_faiss_if_needed
+from db.mysql_conn import get_pool, MYSQL_ASYNC_ENABLED
+from db.async_repository import close_async_pool
+from service.nguoi_info_service import warm_up_nguoi_search
+from config import SERVER_WORKERS
 # Optional performance monitoring
 try:
     from api.performance import performance_router
@@ -131,6 +141,44 @@ async def security_headers(request: Request, call_next):
     
     return response
 
+# Backpressure: stage decode/model/index/db đã đầy -> 503 để client thử lại
+@app.exception_handler(StageOverloadedError)
+async def stage_overloaded_handler(request: Request, exc: StageOverloadedError):
+    return JSONResponse(status_code=503, content={"error": str(exc)}, headers={"Retry-After": "1"})
+
+# Nhiều worker: load generation FAISS mới khi worker khác đã publish (kiểm tra một lần đọc mmap mỗi request).
+# Một worker thì mọi generation đều do chính process này ghi, không cần kiểm tra.
+if SERVER_WORKERS > 1:
+    @app.middleware("http")
+    async def refresh_faiss_generation(request: Request, call_next):
+        if get_faiss_manager().snapshot_changed():
+            await run_in_stage('index', reload_faiss_if_needed)
+        return await call_next(request)
+
+# Mở sẵn connection pool MySQL (min_size kết nối) và dựng index tìm kiếm người (/list_nguoi) trên thread nền,
+# không chặn khởi động
+def warm_up_mysql():
+    get_pool()
+    warm_up_nguoi_search()
+
+@app.on_event("startup")
+def start_mysql_warm_up():
+    threading.Thread(target=warm_up_mysql, daemon=True, name='mysql-warm-up').start()
+
+# Ghi nốt các thay đổi FAISS đang chờ persistence worker trước khi tắt
+@app.on_event("shutdown")
+def flush_faiss_on_shutdown():
+    faiss_manager = get_faiss_manager()
+    if faiss_manager.persistence is not None:
+        faiss_manager.persistence.stop()
+    print("💾 Đã ghi bền FAISS trước khi tắt")
+    get_pool().close()
+
+@app.on_event("shutdown")
+async def close_async_mysql_pool():
+    if MYSQL_ASYNC_ENABLED:
+        await close_async_pool()
+
 # Performance Monitoring Middleware
 @app.middleware("http")
 async def performance_monitoring(request: Request, call_next):
@@ -154,6 +202,8 @@ print("📊 Security middleware và logging đã được kích hoạt!")
 # 🏠 Public APIs (không cần authentication)
 app.include_router(face_query_router, tags=["🔍 Tìm Kiếm Khuôn Mặt"])
 app.include_router(face_query_top5_router, tags=["🔍 Tìm Kiếm Khuôn Mặt"])
+app.include_router(face_query_batch_router, tags=["🔍 Tìm Kiếm Khuôn Mặt"])
+app.include_router(face_query_faces_router, tags=["🔍 Tìm Kiếm Khuôn Mặt"])
 app.include_router(vector_info_router, tags=["📊 Thông Tin Hệ Thống"])
 app.include_router(get_image_ids_by_class_router, tags=["📊 Thông Tin Hệ Thống"])
 app.include_router(status_router, tags=["📊 Thông Tin Hệ Thống"])
@@ -204,6 +254,8 @@ def read_root():
             "public": [
                 "POST /query - Tìm kiếm khuôn mặt",
                 "POST /query_top5 - Top 5 kết quả tương tự",
+                "POST /query_batch - Nhận diện nhiều ảnh trong một request",
+                "POST /query_faces - Nhận diện tất cả khuôn mặt trong ảnh nhóm",
                 "GET /vector_info - Thông tin database",
                 "GET /health - Kiểm tra sức khỏe"
             ],
@@ -225,4 +277,8 @@ if __name__ == "__main__":
     print("🚀 Starting Face Recognition API with MySQL Authentication...")
     print("📚 Swagger UI: http://localhost:8000/docs")
     print("📖 ReDoc: http://localhost:8000/redoc")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    if SERVER_WORKERS > 1:
+        # Mỗi worker là một process riêng, uvicorn cần import string để tự khởi tạo app trong từng process
+        uvicorn.run("app:app", host="0.0.0.0", port=8000, workers=SERVER_WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -7,11 +7,57 @@ MODEL_PATH = 'model/ms1mv3_arcface_r18_fp16.pth'  # Primary ArcFace model
 BACKUP_MODEL_PATH = 'model/glint360k_cosface_r18_fp16_0.1.pth'  # Backup model
 AGE_MODEL=  'model/ModelAge.pth' # Age prediction model
 GENDER_MODEL = 'model/ModelGender.pth' # Gender prediction model
+ARCFACE_INPUT_RGB = False  # Đổi BGR->RGB trước khi vào ArcFace; index hiện tại được trích xuất với BGR, bật thì phải trích xuất lại toàn bộ
+
+# Face Detection (SCRFD, ONNX CPU) + căn chỉnh 5 điểm trước khi trích xuất embedding
+# Tắt: cả ảnh upload được resize về 112x112 như trước (ảnh đã crop sẵn khuôn mặt)
+FACE_DETECTION_ENABLED = False
+DETECTOR_MODEL_PATH = 'model/scrfd_10g_bnkps.onnx'  # Model SCRFD có landmark (bnkps)
+DET_SIZE = (640, 640)  # Kích thước đầu vào detector (rộng, cao)
+DET_THRESH = 0.5  # Ngưỡng score phát hiện khuôn mặt
+DET_NMS_THRESH = 0.4
+DET_MAX_FACES = 0  # Số khuôn mặt tối đa mỗi ảnh (0 = không giới hạn)
 
 
 # FAISS Vector Database Configuration
 FAISS_INDEX_PATH = 'index/faiss_db_r18.index'
-FAISS_META_PATH = 'index/faiss_db_r18_meta.npz'
+FAISS_META_PATH = 'index/faiss_db_r18_meta'  # Thư mục metadata dạng cột (index/metadata.py), .npz cũ: migrate_faiss_metadata.py
+FAISS_EMBEDDINGS_PATH = 'index/faiss_db_r18_embeddings.npy'  # Ma trận embedding float32 (N, 512) dạng .npy thô
+FAISS_MMAP = True  # mmap embedding và FAISS index khi load: khởi động nhanh, các worker dùng chung page cache
+FAISS_WAL_PATH = 'index/faiss_db_r18.wal'  # Log ghi nối các thay đổi (add/update/delete), replay khi load
+FAISS_WAL_COMPACT_BYTES = 64 * 1024 * 1024  # Log vượt ngưỡng này thì ghi snapshot mới ở nền và xóa phần log cũ
+FAISS_SNAPSHOT_DIR = 'index/faiss_db_r18_snapshots'  # Snapshot dạng generation (gen-N + MANIFEST + CURRENT), publish nguyên tử
+FAISS_KEEP_GENERATIONS = 2  # Số generation giữ lại cho worker còn đang mmap bản trước
+FAISS_FLUSH_INTERVAL_S = 0.5  # Thread nền gộp các thay đổi trong khoảng này rồi mới fsync/ghi snapshot (có thể mất tối đa khoảng này khi crash)
+FAISS_FLUSH_MAX_DIRTY = 256  # ... hoặc ghi ngay khi đủ số thay đổi này
+FAISS_NUM_SHARDS = 1  # > 1: chia index theo class_id % FAISS_NUM_SHARDS, truy vấn song song các shard (đổi số shard: shard_faiss_index.py)
+EDIT_EMBEDDING_DEBUG = False  # In chẩn đoán chi tiết (so sánh vector, test query) khi sửa embedding
+
+# FAISS Index Backend: 'auto' | 'flat' | 'ivf_flat' | 'ivf_pq' | 'hnsw_flat' | 'opq_ivf_pq'
+# 'auto' dùng flat (tìm chính xác) khi gallery nhỏ hơn INDEX_AUTO_THRESHOLD, vượt ngưỡng thì dùng INDEX_AUTO_LARGE_TYPE
+INDEX_TYPE = 'auto'
+INDEX_AUTO_THRESHOLD = 100_000
+INDEX_AUTO_LARGE_TYPE = 'ivf_flat'  # IVF xóa/sửa tại chỗ qua direct map; HNSW không remove_ids được, mỗi lần xóa/sửa là rebuild O(N)
+IVF_NLIST = None  # Số cluster IVF, None = tự chọn ~4*sqrt(N)
+IVF_NPROBE = 16  # Số cluster duyệt mỗi truy vấn (tăng recall, giảm tốc độ)
+PQ_M = 64  # Số sub-quantizer PQ/OPQ (512 chiều -> 8 chiều mỗi sub-vector)
+PQ_NBITS = 8
+HNSW_M = 32
+HNSW_EF_SEARCH = 64
+HNSW_EF_CONSTRUCTION = 200
+INDEX_TRAIN_SAMPLE_SIZE = 100_000  # Số embedding lấy mẫu để train IVF/PQ
+INDEX_PARAMS = {
+    'auto_threshold': INDEX_AUTO_THRESHOLD,
+    'auto_large_type': INDEX_AUTO_LARGE_TYPE,
+    'nlist': IVF_NLIST,
+    'nprobe': IVF_NPROBE,
+    'pq_m': PQ_M,
+    'pq_nbits': PQ_NBITS,
+    'hnsw_m': HNSW_M,
+    'ef_search': HNSW_EF_SEARCH,
+    'ef_construction': HNSW_EF_CONSTRUCTION,
+    'train_sample_size': INDEX_TRAIN_SAMPLE_SIZE,
+}
 
 # Application Configuration
 IMAGES_LIST = 'images.txt'
@@ -26,6 +72,15 @@ AUTH_PASSWORD_FIELD = 'passwrd'
 API_TITLE = "🤖 Hệ Thống Nhận Diện Khuôn Mặt với MySQL Authentication"
 API_VERSION = "2.0.0"
 API_DESCRIPTION = "Face Recognition API với MySQL session-based authentication"
+SERVER_WORKERS = 1  # Số uvicorn worker (process). > 1: các worker mmap chung generation snapshot, thay đổi được nối vào
+                    # log dùng chung trong FAISS_SNAPSHOT_DIR (khóa liên process); tắt sạch chế độ 1 worker trước khi chuyển
+# Single writer: chỉ process `python faiss_writer.py` thay đổi FAISS, API worker gửi lệnh qua kết nối local
+FAISS_WRITER_ENABLED = False
+FAISS_WRITER_ADDRESS = 'index/faiss_writer.sock'  # Unix socket (quyền 0600, chỉ user chạy API); Windows: ('127.0.0.1', 6011)
+FAISS_WRITER_AUTHKEY_ENV = 'FAISS_WRITER_AUTHKEY'  # Biến môi trường chứa authkey (bắt buộc, >= 16 byte, writer và API dùng chung)
+FAISS_WRITER_AUTHKEY_FILE = None  # ... hoặc đường dẫn file secret chứa authkey (ví dụ '/run/secrets/faiss_writer_authkey')
+FAISS_WRITER_MAX_BATCH = 256  # Số lệnh tối đa gộp vào một lần fsync + publish log dùng chung
+FAISS_WRITER_MAX_WAIT_MS = 5  # Thời gian chờ gom thêm lệnh sau lệnh đầu tiên
 
 # Security Configuration
 CORS_ORIGINS = ["*"]  # In production, specify exact origins
@@ -35,4 +90,16 @@ SECURITY_HEADERS = True
 # Performance Configuration
 MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10MB
 SUPPORTED_FORMATS = ["image/jpeg", "image/png", "image/jpg"]
+BATCH_QUERY_MAX_IMAGES = 64  # Số ảnh tối đa mỗi request /query_batch (kể cả ảnh trong file zip)
+BATCH_QUERY_MAX_ZIP_ENTRIES = 1000  # Số mục tối đa (kể cả thư mục, file không phải ảnh) trong một file zip của /query_batch
+BATCH_QUERY_MAX_UNZIPPED_BYTES = 256 * 1024 * 1024  # Tổng dung lượng ảnh sau giải nén tối đa mỗi request /query_batch
+INFERENCE_MAX_BATCH = 16  # Micro-batching: số ảnh tối đa gom vào một lần forward ArcFace
+INFERENCE_MAX_WAIT_MS = 5  # Micro-batching: thời gian tối đa chờ gom thêm request (ms)
+INFERENCE_MAX_QUEUE = 256  # Micro-batching: số ảnh tối đa chờ trong hàng đợi, vượt quá trả về 503
+INFERENCE_EXPLICIT_MAX_BATCH = 64  # Số ảnh tối đa mỗi lần forward cho request nhiều ảnh (/query_batch, /query_faces), không qua hàng đợi micro-batch
+# Thread pool cho từng stage của request (decode ảnh, detect khuôn mặt, model, FAISS, MySQL)
+STAGE_WORKERS = {'decode': 4, 'detect': 1, 'model': 1, 'index': 2, 'db': 8}
+# Số việc tối đa đang chờ/chạy trên mỗi stage (backpressure)
+STAGE_MAX_PENDING = {'decode': 64, 'detect': 16, 'model': 16, 'index': 64, 'db': 64}
+STAGE_QUEUE_TIMEOUT = 2.0  # Thời gian tối đa (giây) chờ slot trên một stage trước khi trả về 503
 PERFORMANCE_MONITORING = True 
\ No newline at end of file
@@ -0,0 +1,190 @@
+import asyncio
+import contextlib
+
+from db.models import Nguoi, TaiKhoan
+from db.connection_pool import PoolTimeoutError
+from db.mysql_conn import (
+    MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB, MYSQL_POOL_RECYCLE_S,
+    MYSQL_ASYNC_POOL_MIN_SIZE, MYSQL_ASYNC_POOL_MAX_SIZE, MYSQL_ASYNC_POOL_TIMEOUT_S
+)
+from db.nguoi_cache import nguoi_cache
+from db.nguoi_search_index import nguoi_search_index
+from db.nguoi_repository import (
+    SQL_COUNT_NGUOI, SQL_NGUOI_EXAMPLES, SQL_TRUNCATE_NGUOI, SQL_REPLACE_NGUOI, SQL_DELETE_NGUOI,
+    SQL_NGUOI_BY_CLASS_ID, NGUOI_IN_CHUNK_SIZE, sql_nguoi_by_class_ids, nguoi_params, split_cached
+)
+from db.taikhoan_repository import SQL_INSERT_TAIKHOAN, SQL_TAIKHOAN_BY_USERNAME, SQL_CHECK_LOGIN
+
+# Pool aiomysql gắn với event loop tạo ra nó: mỗi loop (mỗi worker uvicorn, mỗi asyncio.run của test) một pool
+_async_pools = {}
+
+
+async def get_async_pool():
+    """Pool aiomysql của event loop hiện tại (tạo lần đầu gọi)."""
+    loop = asyncio.get_running_loop()
+    pool = _async_pools.get(loop)
+    if pool is None:
+        # Import tại chỗ: aiomysql là dependency tùy chọn (MYSQL_ASYNC_ENABLED)
+        import aiomysql
+        pool = await aiomysql.create_pool(
+            host=MYSQL_HOST,
+            port=MYSQL_PORT,
+            user=MYSQL_USER,
+            password=MYSQL_PASSWORD,
+            db=MYSQL_DB,
+            charset='utf8mb4',
+            cursorclass=aiomysql.DictCursor,
+            autocommit=False,
+            minsize=MYSQL_ASYNC_POOL_MIN_SIZE,
+            maxsize=MYSQL_ASYNC_POOL_MAX_SIZE,
+            pool_recycle=MYSQL_POOL_RECYCLE_S
+        )
+        # Hai request đầu tiên cùng tạo pool: giữ pool tạo trước, đóng pool thừa
+        existing = _async_pools.setdefault(loop, pool)
+        if existing is not pool:
+            pool.close()
+            await pool.wait_closed()
+            pool = existing
+    return pool
+
+
+async def close_async_pool():
+    """Đóng pool aiomysql của event loop hiện tại (gọi khi shutdown)."""
+    pool = _async_pools.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        pool.close()
+        await pool.wait_closed()
+
+
+def get_async_pool_stats():
+    """Thống kê pool aiomysql của mọi event loop trong process."""
+    return [
+        {'size': pool.size, 'free': pool.freesize, 'in_use': pool.size - pool.freesize,
+         'min_size': pool.minsize, 'max_size': pool.maxsize}
+        for pool in list(_async_pools.values())
+    ]
+
+
+class AsyncConnectionHelper:
+    """
+    Bản async của ConnectionHelper: `async with repo.cursor() as cursor` mượn một kết nối từ pool aiomysql,
+    commit/rollback rồi trả về pool khi thoát khối; kết nối lỗi khi commit/rollback bị đóng thay vì trả lại.
+    Trong lúc chờ MySQL, event loop tiếp tục phục vụ request khác.
+    """
+
+    @contextlib.asynccontextmanager
+    async def cursor(self):
+        pool = await get_async_pool()
+        try:
+            conn = await asyncio.wait_for(pool.acquire(), MYSQL_ASYNC_POOL_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            raise PoolTimeoutError(
+                f'Không có kết nối MySQL rảnh sau {MYSQL_ASYNC_POOL_TIMEOUT_S}s (max_size={pool.maxsize})'
+            ) from None
+        try:
+            cursor = await conn.cursor()
+        except BaseException:
+            conn.close()
+            pool.release(conn)
+            raise
+        failed = False
+        try:
+            yield cursor
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            try:
+                if failed:
+                    await conn.rollback()
+                else:
+                    await conn.commit()
+                await cursor.close()
+            except BaseException:
+                conn.close()
+                pool.release(conn)
+                raise
+            pool.release(conn)
+
+
+class AsyncNguoiRepository(AsyncConnectionHelper):
+    """Cùng SQL, model Nguoi và nguoi_cache với NguoiRepository, nhưng các hàm là coroutine."""
+
+    async def get_total_and_examples(self, limit=5):
+        """Trả về tổng số người và ví dụ một số người."""
+        async with self.cursor() as cursor:
+            await cursor.execute(SQL_COUNT_NGUOI)
+            total = (await cursor.fetchone())['total']
+            await cursor.execute(SQL_NGUOI_EXAMPLES, (limit,))
+            examples = list(await cursor.fetchall())
+        return total, examples
+
+    async def truncate_all(self):
+        """Xóa toàn bộ dữ liệu bảng nguoi, giữ lại cấu trúc."""
+        async with self.cursor() as cursor:
+            await cursor.execute(SQL_TRUNCATE_NGUOI)
+        nguoi_cache.clear()
+        nguoi_search_index.clear()
+
+    async def add(self, nguoi: Nguoi):
+        async with self.cursor() as cursor:
+            await cursor.execute(SQL_REPLACE_NGUOI, nguoi_params(nguoi))
+        nguoi_cache.invalidate(nguoi.class_id)
+        nguoi_search_index.upsert(nguoi)
+
+    async def delete_by_class_id(self, class_id):
+        async with self.cursor() as cursor:
+            await cursor.execute(SQL_DELETE_NGUOI, (str(class_id),))
+        nguoi_cache.invalidate(class_id)
+        nguoi_search_index.delete(class_id)
+
+    async def get_by_class_id(self, class_id):
+        key = str(class_id)
+        found, nguoi = nguoi_cache.get(key)
+        if found:
+            return nguoi
+        version = nguoi_cache.version()
+        async with self.cursor() as cursor:
+            await cursor.execute(SQL_NGUOI_BY_CLASS_ID, (key,))
+            row = await cursor.fetchone()
+        nguoi = Nguoi.from_row(row) if row else None
+        nguoi_cache.put(key, nguoi, version)
+        return nguoi
+
+    async def get_by_class_ids(self, class_ids, chunk_size=NGUOI_IN_CHUNK_SIZE):
+        """Giống NguoiRepository.get_by_class_ids: dict {str(class_id): Nguoi}, một truy vấn IN cho mỗi chunk."""
+        result, missing = split_cached(class_ids)
+        if not missing:
+            return result
+        version = nguoi_cache.version()
+        fetched = {}
+        async with self.cursor() as cursor:
+            for start in range(0, len(missing), chunk_size):
+                chunk = missing[start:start + chunk_size]
+                await cursor.execute(sql_nguoi_by_class_ids(len(chunk)), tuple(chunk))
+                for row in await cursor.fetchall():
+                    fetched[str(row['class_id'])] = Nguoi.from_row(row)
+        for key in missing:
+            nguoi_cache.put(key, fetched.get(key), version)
+        result.update(fetched)
+        return result
+
+
+class AsyncTaiKhoanRepository(AsyncConnectionHelper):
+    """Bản async của TaiKhoanRepository, cùng SQL và model TaiKhoan."""
+
+    async def add(self, taikhoan: TaiKhoan):
+        async with self.cursor() as cursor:
+            await cursor.execute(SQL_INSERT_TAIKHOAN, (taikhoan.username, taikhoan.passwrd))
+
+    async def get_by_username(self, username: str):
+        async with self.cursor() as cursor:
+            await cursor.execute(SQL_TAIKHOAN_BY_USERNAME, (username,))
+            row = await cursor.fetchone()
+        return TaiKhoan.from_row(row) if row else None
+
+    async def check_login(self, username: str, passwrd: str):
+        async with self.cursor() as cursor:
+            await cursor.execute(SQL_CHECK_LOGIN, (username, passwrd))
+            row = await cursor.fetchone()
+        return row is not None
@@ -1,15 +1,41 @@
-from db.mysql_conn import get_connection
+import threading
+
+from db.mysql_conn import get_pool
 
 class ConnectionHelper:
+    """
+    Mượn một kết nối từ connection pool dùng chung (db/mysql_conn.get_pool) cho mỗi khối `with repo as cursor`,
+    commit/rollback rồi trả về pool khi thoát khối; kết nối lỗi khi commit/rollback bị đóng thay vì trả lại.
+    Kết nối/cursor lưu theo thread (threading.local) để một repository dùng chung
+    có thể được gọi đồng thời từ nhiều thread (thread pool stage 'db').
+    """
+    @property
+    def _local(self):
+        local = self.__dict__.get('_thread_local')
+        if local is None:
+            local = self.__dict__.setdefault('_thread_local', threading.local())
+        return local
+
     def __enter__(self):
-        self.conn = get_connection()
-        self.cursor = self.conn.cursor()
-        return self.cursor
+        local = self._local
+        local.pooled = get_pool().acquire()
+        try:
+            local.cursor = local.pooled.conn.cursor()
+        except Exception:
+            get_pool().release(local.pooled, broken=True)
+            raise
+        return local.cursor
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if exc_type is None:
-            self.conn.commit()
-        else:
-            self.conn.rollback()
-        self.cursor.close()
-        self.conn.close()
+        local = self._local
+        pooled = local.pooled
+        try:
+            if exc_type is None:
+                pooled.conn.commit()
+            else:
+                pooled.conn.rollback()
+            local.cursor.close()
+        except Exception:
+            get_pool().release(pooled, broken=True)
+            raise
+        get_pool().release(pooled)
@@ -0,0 +1,190 @@
+import collections
+import threading
+import time
+
+
+class PoolTimeoutError(TimeoutError):
+    """Hết thời gian chờ kết nối rảnh (pool đã đủ max_size kết nối đang được dùng)."""
+
+
+class PooledConnection:
+    """Kết nối MySQL trong pool cùng thời điểm tạo và lần trả về gần nhất."""
+
+    __slots__ = ('conn', 'created_at', 'last_used')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = self.last_used = time.monotonic()
+
+
+class ConnectionPool:
+    """
+    Pool kết nối MySQL dùng chung giữa các thread, giới hạn số kết nối:
+    - acquire(): lấy kết nối rảnh dùng gần nhất (LIFO, còn "ấm"), chưa đủ max_size thì mở kết nối mới,
+      đủ rồi thì chờ tối đa `timeout` giây (PoolTimeoutError).
+    - Kiểm tra khi lấy ra: kết nối sống quá `recycle` giây được mở lại; rảnh quá `ping_after` giây thì ping,
+      ping lỗi (MySQL đóng kết nối do wait_timeout, server restart) thì mở kết nối mới thay thế.
+    - Mở sẵn `min_size` kết nối khi tạo pool; kết nối rảnh quá `idle_timeout` giây bị đóng, nhưng luôn giữ lại `min_size` kết nối.
+    - release(broken=True) đóng kết nối lỗi thay vì trả lại pool.
+    Mỗi request chỉ tốn một lần lấy/trả trong bộ nhớ thay vì TCP connect + xác thực MySQL.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=5.0, recycle=3600, idle_timeout=300, ping_after=30):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError('Cần 1 <= max_size và min_size <= max_size')
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = collections.deque()
+        self._size = 0
+        self._closed = False
+        # Thống kê
+        self.created = 0
+        self.discarded = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.health_check_failures = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._prefill()
+
+    def _prefill(self):
+        """Mở sẵn min_size kết nối để các request đầu tiên sau khi khởi động không phải chờ TCP connect + xác thực."""
+        opened = []
+        try:
+            for _ in range(self.min_size):
+                opened.append(PooledConnection(self._connect()))
+        except Exception as e:
+            # MySQL chưa sẵn sàng: không chặn khởi động, các kết nối còn thiếu được mở khi cần
+            print(f"⚠️ Chỉ mở sẵn được {len(opened)}/{self.min_size} kết nối MySQL: {e}")
+        with self._cond:
+            self._idle.extend(opened)
+            self._size += len(opened)
+            self.created += len(opened)
+
+    def acquire(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError('Connection pool đã đóng')
+                if self._idle:
+                    pooled = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    pooled = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeoutError(f'Không có kết nối MySQL rảnh sau {timeout}s (max_size={self.max_size})')
+                if not waited:
+                    waited = True
+                    self.waits += 1
+                self._cond.wait(remaining)
+            self.checkouts += 1
+            waited_s = time.monotonic() - start
+            self._wait_total += waited_s
+            self._wait_max = max(self._wait_max, waited_s)
+
+        # Mở/kiểm tra kết nối ngoài lock: không chặn thread khác lấy kết nối rảnh
+        try:
+            if pooled is None:
+                return self._open()
+            return self._checked(pooled)
+        except BaseException:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def _open(self):
+        pooled = PooledConnection(self._connect())
+        with self._cond:
+            self.created += 1
+        return pooled
+
+    def _checked(self, pooled):
+        now = time.monotonic()
+        if now - pooled.created_at > self.recycle:
+            self._close(pooled)
+            return self._open()
+        if now - pooled.last_used > self.ping_after:
+            try:
+                pooled.conn.ping(reconnect=False)
+            except Exception:
+                with self._cond:
+                    self.health_check_failures += 1
+                self._close(pooled)
+                return self._open()
+        return pooled
+
+    def release(self, pooled, broken=False):
+        """Trả kết nối về pool; broken=True (lỗi kết nối, commit/rollback lỗi) thì đóng luôn."""
+        stale = []
+        with self._cond:
+            if broken or self._closed:
+                self._size -= 1
+                stale.append(pooled)
+            else:
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+                stale = self._reap_idle()
+            self._cond.notify()
+        for item in stale:
+            self._close(item)
+
+    def _reap_idle(self):
+        """Lấy ra các kết nối rảnh quá idle_timeout (cũ nhất ở đầu deque), giữ lại min_size kết nối. Gọi trong lock."""
+        stale = []
+        cutoff = time.monotonic() - self.idle_timeout
+        while self._idle and self._size > self.min_size and self._idle[0].last_used < cutoff:
+            stale.append(self._idle.popleft())
+            self._size -= 1
+        return stale
+
+    def _close(self, pooled):
+        with self._cond:
+            self.discarded += 1
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """Đóng mọi kết nối rảnh; kết nối đang dùng được đóng khi trả về."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), collections.deque()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for pooled in idle:
+            self._close(pooled)
+
+    def get_stats(self):
+        with self._cond:
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'created': self.created,
+                'discarded': self.discarded,
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'health_check_failures': self.health_check_failures,
+                'avg_wait_ms': round(self._wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'max_wait_ms': round(self._wait_max * 1000, 3)
+            }
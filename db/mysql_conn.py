@@ -1,3 +1,5 @@
+import threading
+
 import pymysql
 
 # Thông tin kết nối MySQL (XAMPP mặc định)
@@ -7,6 +9,20 @@ MYSQL_USER = 'root'
 MYSQL_PASSWORD = ''  # Mặc định XAMPP không có mật khẩu cho root
 MYSQL_DB = 'face_db'  # Đặt tên database bạn muốn sử dụng
 
+# Connection pool dùng chung cho các repository (db/connection_pool.py)
+MYSQL_POOL_MIN_SIZE = 2  # Số kết nối luôn giữ lại kể cả khi rảnh
+MYSQL_POOL_MAX_SIZE = 20  # Số kết nối tối đa (nên >= số thread của stage 'db' + thread pool của FastAPI dùng DB)
+MYSQL_POOL_TIMEOUT_S = 5.0  # Chờ kết nối rảnh tối đa bao lâu khi pool đã đầy
+MYSQL_POOL_RECYCLE_S = 3600  # Mở lại kết nối sống lâu hơn (nhỏ hơn wait_timeout của MySQL)
+MYSQL_POOL_IDLE_TIMEOUT_S = 300  # Đóng kết nối rảnh quá lâu (ngoài MYSQL_POOL_MIN_SIZE)
+MYSQL_POOL_PING_AFTER_S = 30  # Ping kiểm tra kết nối rảnh lâu hơn mức này trước khi dùng lại
+
+# Driver async (aiomysql, db/async_repository.py) cho các handler async (/query, /query_top5)
+MYSQL_ASYNC_ENABLED = False  # True: await truy vấn MySQL trên event loop thay vì chạy pymysql trên stage 'db' (cần: pip install aiomysql)
+MYSQL_ASYNC_POOL_MIN_SIZE = 2
+MYSQL_ASYNC_POOL_MAX_SIZE = 50  # Không bị giới hạn bởi số thread của stage 'db', chỉ bởi max_connections của MySQL
+MYSQL_ASYNC_POOL_TIMEOUT_S = 5.0  # Chờ kết nối rảnh tối đa bao lâu khi pool đã đầy
+
 # Hàm tạo kết nối MySQL
 
 def get_connection():
@@ -21,6 +37,28 @@ def get_connection():
     )
     return conn
 
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Connection pool dùng chung của process (tạo lần đầu gọi)."""
+    global _pool
+    if _pool is None:
+        # Import tại chỗ: các script trong db/ import `mysql_conn` như module cấp cao nhất
+        from db.connection_pool import ConnectionPool
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    get_connection,
+                    min_size=MYSQL_POOL_MIN_SIZE,
+                    max_size=MYSQL_POOL_MAX_SIZE,
+                    timeout=MYSQL_POOL_TIMEOUT_S,
+                    recycle=MYSQL_POOL_RECYCLE_S,
+                    idle_timeout=MYSQL_POOL_IDLE_TIMEOUT_S,
+                    ping_after=MYSQL_POOL_PING_AFTER_S
+                )
+    return _pool
+
 # Ví dụ sử dụng:
 if __name__ == '__main__':
     try:
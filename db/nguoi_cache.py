@@ -0,0 +1,100 @@
+import collections
+import threading
+import time
+
+# Cache thông tin người (bảng nguoi) theo class_id trong process
+NGUOI_CACHE_MAX_SIZE = 10_000  # Số class_id tối đa, vượt thì bỏ mục dùng lâu nhất (LRU)
+NGUOI_CACHE_TTL_S = 300  # Thời gian sống của một bản ghi; giới hạn độ cũ khi process khác (worker khác) sửa bảng nguoi
+NGUOI_CACHE_NEGATIVE_TTL_S = 30  # Thời gian sống của kết quả "không có người" (class_id chưa có trong bảng)
+
+
+class NguoiCache:
+    """
+    Cache read-through LRU + TTL cho NguoiRepository, khóa là str(class_id), giá trị là Nguoi hoặc None
+    (cache cả kết quả âm với TTL ngắn hơn). Thread-safe.
+    - get(key) -> (có trong cache không, giá trị).
+    - version() lấy TRƯỚC khi đọc MySQL, put(key, value, version) bỏ qua nếu đã có invalidate xen giữa,
+      để lần đọc cũ đang chạy không ghi đè lại dữ liệu vừa bị xóa/sửa.
+    - invalidate(class_id) / clear() được NguoiRepository gọi trong các thao tác ghi (add, delete, truncate).
+    """
+
+    def __init__(self, max_size=NGUOI_CACHE_MAX_SIZE, ttl=NGUOI_CACHE_TTL_S, negative_ttl=NGUOI_CACHE_NEGATIVE_TTL_S):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    if value is None:
+                        self.negative_hits += 1
+                    return True, value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return False, None
+
+    def version(self):
+        with self._lock:
+            return self._version
+
+    def put(self, key, value, version):
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if value is not None else self.negative_ttl)
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, class_id):
+        with self._lock:
+            self._version += 1
+            self.invalidations += 1
+            self._entries.pop(str(class_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self.invalidations += 1
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_s': self.ttl,
+                'negative_ttl_s': self.negative_ttl,
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'expirations': self.expirations,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+
+# Cache dùng chung của process cho mọi NguoiRepository
+nguoi_cache = NguoiCache()
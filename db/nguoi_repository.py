@@ -1,121 +1,105 @@
 
 from db.models import Nguoi
 from db.connection_helper import ConnectionHelper
+from db.nguoi_cache import nguoi_cache
+from db.nguoi_search_index import nguoi_search_index, NGUOI_SEARCH_LOAD_CHUNK
+
+# SQL dùng chung cho NguoiRepository (pymysql) và AsyncNguoiRepository (aiomysql, db/async_repository.py)
+SQL_COUNT_NGUOI = 'SELECT COUNT(*) as total FROM nguoi'
+SQL_NGUOI_EXAMPLES = 'SELECT * FROM nguoi LIMIT %s'
+SQL_TRUNCATE_NGUOI = 'TRUNCATE TABLE nguoi'
+SQL_REPLACE_NGUOI = """
+        REPLACE INTO nguoi (class_id, ten, tuoi, gioitinh, noio)
+        VALUES (%s, %s, %s, %s, %s)
+        """
+SQL_DELETE_NGUOI = "DELETE FROM nguoi WHERE class_id = %s"
+SQL_NGUOI_BY_CLASS_ID = "SELECT * FROM nguoi WHERE class_id = %s"
+SQL_NGUOI_SEARCH_FIRST_CHUNK = "SELECT class_id, ten, tuoi, gioitinh, noio FROM nguoi ORDER BY class_id LIMIT %s"
+SQL_NGUOI_SEARCH_NEXT_CHUNK = "SELECT class_id, ten, tuoi, gioitinh, noio FROM nguoi WHERE class_id > %s ORDER BY class_id LIMIT %s"
+NGUOI_IN_CHUNK_SIZE = 1000  # Số class_id tối đa trong một câu WHERE class_id IN (...)
+
+
+def sql_nguoi_by_class_ids(count):
+    return f"SELECT * FROM nguoi WHERE class_id IN ({', '.join(['%s'] * count)})"
+
+
+def nguoi_params(nguoi: Nguoi):
+    return (nguoi.class_id, nguoi.ten, nguoi.tuoi, nguoi.gioitinh, nguoi.noio)
+
+
+def split_cached(class_ids):
+    """Tách các class_id đã có trong nguoi_cache: trả về (dict người đã cache, danh sách khóa cần truy vấn)."""
+    result = {}
+    missing = []
+    for key in dict.fromkeys(str(class_id) for class_id in class_ids):
+        found, nguoi = nguoi_cache.get(key)
+        if not found:
+            missing.append(key)
+        elif nguoi is not None:
+            result[key] = nguoi
+    return result, missing
+
 
 class NguoiRepository(ConnectionHelper):
     def search_nguoi_paged(self, query: str = "", page: int = 1, page_size: int = 15):
         """
         Tìm kiếm danh sách người, trả về kết quả của một trang chỉ định (phân trang).
+        Tìm không dấu, không phân biệt hoa thường trên ten, noio, tuoi, gioitinh qua nguoi_search_index:
+        lọc trước rồi mới phân trang, total là tổng số người khớp. Thứ tự theo tên (không dấu).
         page: số trang (bắt đầu từ 1)
         page_size: số lượng mỗi trang
         """
-        import unicodedata
-        def remove_accents(input_str):
-            return ''.join(
-                c for c in unicodedata.normalize('NFD', input_str)
-                if unicodedata.category(c) != 'Mn'
-            )
         offset = (page - 1) * page_size
-        sql = "SELECT * FROM nguoi"
-        params = []
-        where_clauses = []
-        if query:
-            query_no_accents = remove_accents(query.lower())
-            where_clauses.append("(LOWER(ten) LIKE %s OR LOWER(noio) LIKE %s OR CAST(tuoi AS CHAR) LIKE %s OR CAST(gioitinh AS CHAR) LIKE %s)")
-            params += [f"%{query.lower()}%", f"%{query.lower()}%", f"%{query.lower()}%", f"%{query.lower()}%"]
-        if where_clauses:
-            sql += " WHERE " + " AND ".join(where_clauses)
-        sql += " ORDER BY ten ASC LIMIT %s OFFSET %s"
-        params += [page_size, offset]
-        with self as cursor:
-            cursor.execute(sql, tuple(params))
-            rows = cursor.fetchall()
-            # Đếm tổng số kết quả phù hợp
-            count_sql = "SELECT COUNT(*) as total FROM nguoi"
-            count_params = []
-            if where_clauses:
-                count_sql += " WHERE " + " AND ".join(where_clauses)
-                count_params = params[:-2]  # loại bỏ LIMIT/OFFSET
-            cursor.execute(count_sql, tuple(count_params))
-            total = cursor.fetchone()['total']
-            # Lọc tiếng Việt không dấu nếu có query
-            if query:
-                filtered = []
-                for row in rows:
-                    ten_no_accents = remove_accents(row['ten'].lower()) if 'ten' in row else ''
-                    noio_no_accents = remove_accents(row['noio'].lower()) if 'noio' in row else ''
-                    tuoi_str = str(row.get('tuoi', '')).lower()
-                    gioitinh_str = str(row.get('gioitinh', '')).lower()
-                    if (
-                        query_no_accents in ten_no_accents
-                        or query_no_accents in noio_no_accents
-                        or query.lower() in tuoi_str
-                        or query.lower() in gioitinh_str
-                    ):
-                        filtered.append(Nguoi.from_row(row))
-                return {
-                    'nguoi_list': filtered,
-                    'total': total
-                }
-            return {
-                'nguoi_list': [Nguoi.from_row(row) for row in rows],
-                'total': total
-            }
+        class_ids, total = nguoi_search_index.search(query, offset, page_size, self.iter_search_rows)
+        return {
+            'nguoi_list': self._get_ordered(class_ids),
+            'total': total
+        }
     def search_nguoi(self, query: str = ""):
         """
-        Tìm kiếm danh sách người với đầu vào là một chuỗi, tìm trên các trường: ten, noio, hỗ trợ tiếng Việt không dấu.
+        Tìm kiếm danh sách người với đầu vào là một chuỗi, tìm trên các trường: ten, noio, tuoi, gioitinh, hỗ trợ tiếng Việt không dấu.
         Nếu query rỗng thì trả về toàn bộ.
         """
-        import unicodedata
-        def remove_accents(input_str):
-            return ''.join(
-                c for c in unicodedata.normalize('NFD', input_str)
-                if unicodedata.category(c) != 'Mn'
-            )
-        sql = "SELECT * FROM nguoi"
-        params = []
-        if query:
-            query_no_accents = remove_accents(query.lower())
-            sql += " WHERE LOWER(ten) LIKE %s OR LOWER(noio) LIKE %s OR CAST(tuoi AS CHAR) LIKE %s OR CAST(gioitinh AS CHAR) LIKE %s"
-            params = [f"%{query.lower()}%", f"%{query.lower()}%", f"%{query.lower()}%", f"%{query.lower()}%"]
-        with self as cursor:
-            cursor.execute(sql, tuple(params))
-            rows = cursor.fetchall()
-            if query:
-                filtered = []
-                for row in rows:
-                    ten_no_accents = remove_accents(row['ten'].lower()) if 'ten' in row else ''
-                    noio_no_accents = remove_accents(row['noio'].lower()) if 'noio' in row else ''
-                    tuoi_str = str(row.get('tuoi', '')).lower()
-                    gioitinh_str = str(row.get('gioitinh', '')).lower()
-                    if (
-                        query_no_accents in ten_no_accents
-                        or query_no_accents in noio_no_accents
-                        or query.lower() in tuoi_str
-                        or query.lower() in gioitinh_str
-                    ):
-                        filtered.append(Nguoi.from_row(row))
-                return filtered
-            return [Nguoi.from_row(row) for row in rows]
+        class_ids, _ = nguoi_search_index.search(query, 0, None, self.iter_search_rows)
+        return self._get_ordered(class_ids)
+    def _get_ordered(self, class_ids):
+        """Lấy Nguoi theo đúng thứ tự class_ids (một truy vấn IN, đọc qua nguoi_cache)."""
+        found = self.get_by_class_ids(class_ids)
+        return [found[str(class_id)] for class_id in class_ids if str(class_id) in found]
+    def iter_search_rows(self, chunk_size=NGUOI_SEARCH_LOAD_CHUNK):
+        """Đọc các cột tìm kiếm của cả bảng nguoi theo từng chunk (keyset theo class_id), dùng để dựng nguoi_search_index."""
+        last_class_id = None
+        while True:
+            with self as cursor:
+                if last_class_id is None:
+                    cursor.execute(SQL_NGUOI_SEARCH_FIRST_CHUNK, (chunk_size,))
+                else:
+                    cursor.execute(SQL_NGUOI_SEARCH_NEXT_CHUNK, (last_class_id, chunk_size))
+                rows = cursor.fetchall()
+            yield from rows
+            if len(rows) < chunk_size:
+                return
+            last_class_id = rows[-1]['class_id']
     def get_total_and_examples(self, limit=5):
         """Trả về tổng số người và ví dụ một số người."""
         with self as cursor:
-            cursor.execute('SELECT COUNT(*) as total FROM nguoi')
+            cursor.execute(SQL_COUNT_NGUOI)
             total = cursor.fetchone()['total']
-            cursor.execute('SELECT * FROM nguoi LIMIT %s', (limit,))
+            cursor.execute(SQL_NGUOI_EXAMPLES, (limit,))
             examples = [row for row in cursor.fetchall()]
         return total, examples
     def truncate_all(self):
         """Xóa toàn bộ dữ liệu bảng nguoi, giữ lại cấu trúc."""
         with self as cursor:
-            cursor.execute('TRUNCATE TABLE nguoi')
+            cursor.execute(SQL_TRUNCATE_NGUOI)
+        nguoi_cache.clear()
+        nguoi_search_index.clear()
     def add(self, nguoi: Nguoi):
-        sql = """
-        REPLACE INTO nguoi (class_id, ten, tuoi, gioitinh, noio)
-        VALUES (%s, %s, %s, %s, %s)
-        """
         with self as cursor:
-            cursor.execute(sql, (nguoi.class_id, nguoi.ten, nguoi.tuoi, nguoi.gioitinh, nguoi.noio))
+            cursor.execute(SQL_REPLACE_NGUOI, nguoi_params(nguoi))
+        # Xóa cả kết quả âm đã cache (class_id trước đó chưa có người)
+        nguoi_cache.invalidate(nguoi.class_id)
+        nguoi_search_index.upsert(nguoi)
 
     def delete_by_class_id(self, class_id):
         # Đảm bảo class_id là UUID hợp lệ
@@ -125,9 +109,10 @@ class NguoiRepository(ConnectionHelper):
         #         class_id = UUID(str(class_id))
         #     except Exception:
         #         raise ValueError('class_id phải là UUID hợp lệ')
-        sql = "DELETE FROM nguoi WHERE class_id = %s"
         with self as cursor:
-            cursor.execute(sql, (str(class_id),))
+            cursor.execute(SQL_DELETE_NGUOI, (str(class_id),))
+        nguoi_cache.invalidate(class_id)
+        nguoi_search_index.delete(class_id)
 
     def get_by_class_id(self, class_id):
         # from uuid import UUID
@@ -139,11 +124,38 @@ class NguoiRepository(ConnectionHelper):
         #         print(3, class_id, type(class_id))
         #     except Exception:
         #         raise ValueError('class_id phải là UUID hợp lệ')
-        sql = "SELECT * FROM nguoi WHERE class_id = %s"
+        # Đọc qua cache (nguoi_cache): request nhận diện ổn định không cần round trip MySQL
+        key = str(class_id)
+        found, nguoi = nguoi_cache.get(key)
+        if found:
+            return nguoi
+        version = nguoi_cache.version()
         # print("abc", class_id, type(class_id))
         with self as cursor:
-            cursor.execute(sql, (str(class_id),))
+            cursor.execute(SQL_NGUOI_BY_CLASS_ID, (key,))
             row = cursor.fetchone()
-            if row:
-                return Nguoi.from_row(row)
-            return None
+        nguoi = Nguoi.from_row(row) if row else None
+        nguoi_cache.put(key, nguoi, version)
+        return nguoi
+
+    def get_by_class_ids(self, class_ids, chunk_size=NGUOI_IN_CHUNK_SIZE):
+        """
+        Lấy thông tin nhiều người trong một truy vấn (WHERE class_id IN (...)).
+        Trả về dict {str(class_id): Nguoi}; class_id không có trong bảng thì không có trong dict.
+        class_id đã có trong cache (kể cả kết quả âm) không được truy vấn lại.
+        """
+        result, missing = split_cached(class_ids)
+        if not missing:
+            return result
+        version = nguoi_cache.version()
+        fetched = {}
+        with self as cursor:
+            for start in range(0, len(missing), chunk_size):
+                chunk = missing[start:start + chunk_size]
+                cursor.execute(sql_nguoi_by_class_ids(len(chunk)), tuple(chunk))
+                for row in cursor.fetchall():
+                    fetched[str(row['class_id'])] = Nguoi.from_row(row)
+        for key in missing:
+            nguoi_cache.put(key, fetched.get(key), version)
+        result.update(fetched)
+        return result
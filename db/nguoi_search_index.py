@@ -0,0 +1,359 @@
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+# Index tìm kiếm không dấu cho /list_nguoi, dựng từ bảng nguoi và giữ trong bộ nhớ process
+NGUOI_SEARCH_REFRESH_S = 600  # Dựng lại từ MySQL (chạy nền) sau khoảng này; bắt thay đổi do process khác/script import ghi thẳng vào bảng. 0 = không tự làm mới
+NGUOI_SEARCH_MAX_DELTA = 10_000  # Số thay đổi (thêm/sửa/xóa) gom ngoài index chính trước khi gộp lại (chạy nền, không đọc MySQL)
+NGUOI_SEARCH_LOAD_CHUNK = 50_000  # Số dòng mỗi lần đọc bảng nguoi khi dựng index (keyset theo class_id)
+
+FIELD_SEP = '\x1f'  # Ngăn cách các trường trong chuỗi tìm kiếm của một người: từ khóa không khớp vắt qua hai trường
+DOC_SEP = b'\x1e'  # Ngăn cách các người trong blob
+MATCH_CHUNK_BYTES = 4_000_000  # Số byte ứng viên so khớp mỗi lượt (giới hạn bộ nhớ tạm khi từ khóa phổ biến)
+POSTINGS_CHUNK_BYTES = 8_000_000  # Số byte blob xử lý mỗi lượt khi dựng trigram
+
+# Bảng translate: bỏ dấu (ký tự tổ hợp Mn sau NFD) và ký tự điều khiển, đ -> d
+_STRIP_TABLE = {cp: None for cp in range(0x10000) if unicodedata.category(chr(cp)) in ('Mn', 'Cc')}
+_STRIP_TABLE[ord('đ')] = 'd'
+_HAYSTACK_TABLE = {cp: repl for cp, repl in _STRIP_TABLE.items() if cp != ord(FIELD_SEP)}
+
+
+def normalize_text(text):
+    """Chữ thường, không dấu: 'Nguyễn Văn Đức' -> 'nguyen van duc'."""
+    if text is None:
+        return ''
+    return unicodedata.normalize('NFD', str(text).lower()).translate(_STRIP_TABLE)
+
+
+def nguoi_haystack(ten, tuoi, gioitinh, noio):
+    """
+    Chuỗi tìm kiếm đã chuẩn hóa (UTF-8) của một người: ten, noio, tuoi, gioitinh ngăn cách bằng FIELD_SEP.
+    ten đứng đầu nên chuỗi này cũng là khóa sắp xếp.
+    """
+    fields = ('' if value is None else str(value) for value in (ten, noio, tuoi, gioitinh))
+    return unicodedata.normalize('NFD', FIELD_SEP.join(fields).lower()).translate(_HAYSTACK_TABLE).encode('utf-8')
+
+
+class _SearchBase:
+    """
+    Phần index chính, bất biến sau khi dựng. Người được xếp theo (chuỗi tìm kiếm, class_id), tức theo tên
+    không dấu, nên số thứ tự doc tăng dần cũng là thứ tự hiển thị.
+    - blob: chuỗi tìm kiếm UTF-8 của mọi người nối bằng DOC_SEP, starts[d] là vị trí bắt đầu của doc d.
+    - Trigram (3 byte liên tiếp trong một trường) -> danh sách doc dạng CSR (grams, gram_starts, posting_docs).
+    """
+
+    def __init__(self, entries):
+        """entries: list (chuỗi tìm kiếm dạng bytes, class_id) đã sắp xếp."""
+        n = len(entries)
+        self.class_ids = np.fromiter((cid for _, cid in entries), dtype=np.int64, count=n)
+        lengths = np.fromiter((len(hay) for hay, _ in entries), dtype=np.int64, count=n)
+        self.blob = DOC_SEP.join(hay for hay, _ in entries) + DOC_SEP
+        self.starts = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(lengths + 1, out=self.starts[1:])
+        self.by_class = np.argsort(self.class_ids, kind='stable')
+        self.sorted_class_ids = self.class_ids[self.by_class]
+        self._build_postings(lengths)
+
+    def __len__(self):
+        return self.class_ids.shape[0]
+
+    def _build_postings(self, lengths):
+        data = np.frombuffer(self.blob, dtype=np.uint8)
+        keys = []
+        # Theo từng nhóm doc để giới hạn bộ nhớ tạm; mỗi cặp (trigram, doc) giữ một lần
+        for first, last in self._doc_chunks(POSTINGS_CHUNK_BYTES):
+            chunk = data[self.starts[first]:self.starts[last]]
+            sep = chunk < 0x20
+            valid = np.flatnonzero(~(sep[:-2] | sep[1:-1] | sep[2:]))
+            codes = (chunk[valid].astype(np.int64) << 16) | (chunk[valid + 1].astype(np.int64) << 8) | chunk[valid + 2]
+            docs = np.repeat(np.arange(first, last, dtype=np.int64), lengths[first:last] + 1)[valid]
+            keys.append((codes << 32) | docs)
+        keys = np.concatenate(keys) if keys else np.empty(0, dtype=np.int64)
+        keys.sort()
+        keys = keys[np.diff(keys, prepend=-1) != 0]
+        gram_of_key = keys >> 32
+        first = np.flatnonzero(np.diff(gram_of_key, prepend=-1))
+        self.grams = gram_of_key[first]
+        self.gram_starts = np.append(first, keys.shape[0])
+        self.posting_docs = (keys & 0xFFFFFFFF).astype(np.int32)
+
+    def _doc_chunks(self, max_bytes):
+        """Chia các doc thành nhóm liền nhau khoảng max_bytes byte blob: list (doc đầu, doc cuối + 1)."""
+        n = len(self)
+        bounds = np.unique(np.append(np.searchsorted(self.starts, np.arange(0, self.starts[-1], max_bytes)), n))
+        return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+    def nbytes(self):
+        return (len(self.blob) + self.starts.nbytes + self.class_ids.nbytes + self.by_class.nbytes
+                + self.sorted_class_ids.nbytes + self.grams.nbytes + self.gram_starts.nbytes + self.posting_docs.nbytes)
+
+    def haystack(self, doc):
+        return self.blob[self.starts[doc]:self.starts[doc + 1] - 1]
+
+    def doc_of(self, class_id):
+        """Số thứ tự doc của class_id, -1 nếu không có."""
+        i = int(np.searchsorted(self.sorted_class_ids, class_id))
+        if i < self.sorted_class_ids.shape[0] and self.sorted_class_ids[i] == class_id:
+            return int(self.by_class[i])
+        return -1
+
+    def insertion_point(self, hay, class_id):
+        """Vị trí (theo thứ tự doc) mà người có khóa (hay, class_id) sẽ đứng nếu nằm trong index chính."""
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if (self.haystack(mid), int(self.class_ids[mid])) < (hay, class_id):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _posting(self, code):
+        i = int(np.searchsorted(self.grams, code))
+        if i < self.grams.shape[0] and self.grams[i] == code:
+            return self.posting_docs[self.gram_starts[i]:self.gram_starts[i + 1]]
+        return self.posting_docs[:0]
+
+    def match_docs(self, query):
+        """Các doc (tăng dần) có chuỗi tìm kiếm chứa `query` (bytes đã chuẩn hóa)."""
+        if not query:
+            return np.arange(len(self), dtype=np.int64)
+        if len(query) < 3:
+            return self._scan(query)
+        codes = {(query[i] << 16) | (query[i + 1] << 8) | query[i + 2] for i in range(len(query) - 2)}
+        postings = sorted((self._posting(code) for code in codes), key=len)
+        candidates = postings[0]
+        for posting in postings[1:]:
+            if not candidates.shape[0]:
+                break
+            candidates = np.intersect1d(candidates, posting, assume_unique=True)
+        candidates = candidates.astype(np.int64)
+        if len(query) == 3:
+            return candidates
+        # Có đủ các trigram nhưng chưa chắc liền nhau: kiểm tra lại chuỗi con trên ứng viên
+        return self._verify(candidates, query)
+
+    def _scan(self, query):
+        """Từ khóa 1-2 byte (không có trigram): so khớp vector hóa trên cả blob rồi gom theo doc."""
+        data = np.frombuffer(self.blob, dtype=np.uint8)
+        m = data.shape[0] - len(query) + 1
+        if not len(self) or m <= 0:
+            return np.empty(0, dtype=np.int64)
+        hit = data[:m] == query[0]
+        for k in range(1, len(query)):
+            hit &= data[k:k + m] == query[k]
+        # Mỗi doc có ít nhất 3 FIELD_SEP nên không có đoạn rỗng trong reduceat
+        return np.flatnonzero(np.logical_or.reduceat(hit, self.starts[:-1]))
+
+    def _verify(self, docs, query):
+        """Giữ lại các doc chứa `query`, so khớp vector hóa trên các byte của doc theo từng lượt."""
+        data = np.frombuffer(self.blob, dtype=np.uint8)
+        width = len(query)
+        keep = []
+        sizes = self.starts[docs + 1] - self.starts[docs]
+        bounds = np.searchsorted(np.cumsum(sizes), np.arange(MATCH_CHUNK_BYTES, int(sizes.sum()), MATCH_CHUNK_BYTES))
+        for part in np.split(docs, bounds):
+            starts = self.starts[part]
+            # Số vị trí bắt đầu có thể của query trong mỗi doc (không tính DOC_SEP cuối doc)
+            counts = np.maximum(self.starts[part + 1] - 1 - starts - width + 1, 0)
+            total = int(counts.sum())
+            if not total:
+                continue
+            offsets = np.cumsum(counts) - counts
+            pos = np.arange(total, dtype=np.int64) + np.repeat(starts - offsets, counts)
+            hit = data[pos] == query[0]
+            for k in range(1, width):
+                hit &= data[pos + k] == query[k]
+            found = np.zeros(part.shape[0], dtype=bool)
+            found[np.repeat(np.arange(part.shape[0]), counts)[hit]] = True
+            keep.append(part[found])
+        return np.concatenate(keep) if keep else np.empty(0, dtype=np.int64)
+
+
+class NguoiSearchIndex:
+    """
+    Tìm kiếm không dấu, không phân biệt hoa thường trên ten, noio, tuoi, gioitinh của bảng nguoi, lọc trước
+    rồi mới phân trang (total đúng bằng số người khớp), thứ tự theo tên không dấu rồi class_id.
+    - Index chính (_SearchBase, trigram) dựng lần đầu tìm kiếm bằng loader (NguoiRepository.iter_search_rows).
+    - NguoiRepository gọi upsert/delete/clear sau mỗi thao tác ghi: bản ghi cũ trong index chính bị đánh dấu
+      xóa, bản mới nằm trong phần delta nhỏ (quét tuyến tính) cho tới khi gộp lại.
+    - Delta quá NGUOI_SEARCH_MAX_DELTA thì gộp, quá NGUOI_SEARCH_REFRESH_S thì đọc lại MySQL; cả hai chạy
+      trên thread nền, tìm kiếm vẫn dùng index cũ, thay đổi xảy ra trong lúc dựng được áp lại lên index mới.
+    Thread-safe: tìm kiếm chỉ giữ lock để lấy bản sao trạng thái, phần tìm chạy ngoài lock.
+    """
+
+    def __init__(self, refresh_s=NGUOI_SEARCH_REFRESH_S, max_delta=NGUOI_SEARCH_MAX_DELTA):
+        self.refresh_s = refresh_s
+        self.max_delta = max_delta
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._base = None
+        self._alive = None
+        self._dead = 0
+        self._delta = {}  # class_id -> chuỗi tìm kiếm (bytes) của bản ghi thêm/sửa sau khi dựng index chính
+        self._replay = None  # Thay đổi trong lúc đang dựng index mới, áp lại sau khi dựng xong
+        self._loaded_at = 0.0
+        self._loader = None
+        # Thống kê
+        self.searches = 0
+        self.builds = 0
+        self.refreshes = 0
+        self.compactions = 0
+        self.build_errors = 0
+        self.last_build_ms = 0.0
+
+    # ----- Ghi: NguoiRepository gọi sau khi MySQL đã commit -----
+
+    def upsert(self, nguoi):
+        hay = nguoi_haystack(nguoi.ten, nguoi.tuoi, nguoi.gioitinh, nguoi.noio)
+        self._write(('upsert', int(nguoi.class_id), hay))
+
+    def delete(self, class_id):
+        self._write(('delete', int(class_id), None))
+
+    def clear(self):
+        self._write(('clear', None, None))
+
+    def _write(self, op):
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append(op)
+            # Chưa dựng index thì bỏ qua: lần dựng đầu đọc MySQL đã có thay đổi này
+            if self._base is not None:
+                self._apply(op)
+
+    def _apply(self, op):
+        """Áp một thay đổi lên index hiện tại. Gọi trong lock."""
+        kind, class_id, hay = op
+        if kind == 'clear':
+            self._set_base(_SearchBase([]))
+            return
+        doc = self._base.doc_of(class_id)
+        if doc >= 0 and self._alive[doc]:
+            self._alive[doc] = False
+            self._dead += 1
+        if kind == 'upsert':
+            self._delta[class_id] = hay
+        else:
+            self._delta.pop(class_id, None)
+
+    def _set_base(self, base):
+        self._base = base
+        self._alive = np.ones(len(base), dtype=bool)
+        self._dead = 0
+        self._delta = {}
+
+    # ----- Dựng index -----
+
+    def _rebuild(self, from_db):
+        with self._lock:
+            self._replay = []
+            if not from_db:
+                base, alive, delta = self._base, self._alive.copy(), dict(self._delta)
+        try:
+            start = time.perf_counter()
+            if from_db:
+                entries = [
+                    (nguoi_haystack(row['ten'], row['tuoi'], row['gioitinh'], row['noio']), int(row['class_id']))
+                    for row in self._loader()
+                ]
+            else:
+                entries = [(base.haystack(doc), int(base.class_ids[doc])) for doc in np.flatnonzero(alive).tolist()]
+                entries.extend((hay, class_id) for class_id, hay in delta.items())
+            entries.sort()
+            new_base = _SearchBase(entries)
+        except BaseException:
+            with self._lock:
+                self._replay = None
+                self.build_errors += 1
+            raise
+        with self._lock:
+            self._set_base(new_base)
+            for op in self._replay:
+                self._apply(op)
+            self._replay = None
+            if from_db:
+                self._loaded_at = time.monotonic()
+                self.refreshes += 1
+            else:
+                self.compactions += 1
+            self.builds += 1
+            self.last_build_ms = (time.perf_counter() - start) * 1000
+
+    def _background_rebuild(self, from_db):
+        try:
+            self._rebuild(from_db)
+        except Exception as e:
+            print(f'⚠️ Lỗi dựng lại index tìm kiếm người: {e}')
+        finally:
+            self._build_lock.release()
+
+    def _ensure_ready(self, loader):
+        self._loader = loader
+        if self._base is None:
+            # Lần đầu: các request cùng chờ một lần dựng
+            with self._build_lock:
+                if self._base is None:
+                    print('🔎 Đang dựng index tìm kiếm người từ MySQL...')
+                    self._rebuild(from_db=True)
+                    print(f'✅ Index tìm kiếm người: {len(self._base)} người, {self.last_build_ms:.0f} ms')
+            return
+        stale = self.refresh_s > 0 and time.monotonic() - self._loaded_at > self.refresh_s
+        oversized = len(self._delta) + self._dead > self.max_delta
+        if (stale or oversized) and self._build_lock.acquire(blocking=False):
+            threading.Thread(target=self._background_rebuild, args=(stale,), daemon=True,
+                             name='nguoi-search-rebuild').start()
+
+    # ----- Tìm kiếm -----
+
+    def search(self, query, offset, limit, loader):
+        """
+        Trả về (danh sách class_id của trang [offset, offset + limit), tổng số người khớp).
+        limit=None: mọi kết quả từ offset. loader: hàm trả về các dòng của bảng nguoi (dùng khi dựng index).
+        """
+        self._ensure_ready(loader)
+        with self._lock:
+            base, alive = self._base, self._alive.copy()
+            delta = list(self._delta.items())
+            self.searches += 1
+
+        query = normalize_text(query).strip().encode('utf-8')
+        docs = base.match_docs(query)
+        docs = docs[alive[docs]]
+        delta_hits = sorted((hay, class_id) for class_id, hay in delta if query in hay)
+        class_ids = base.class_ids[docs]
+        if delta_hits:
+            # Chèn bản ghi trong delta vào đúng vị trí theo thứ tự tên
+            points = [base.insertion_point(hay, class_id) for hay, class_id in delta_hits]
+            class_ids = np.insert(class_ids, np.searchsorted(docs, points), [class_id for _, class_id in delta_hits])
+        total = int(class_ids.shape[0])
+        end = None if limit is None else offset + limit
+        return class_ids[offset:end].tolist(), total
+
+    def get_stats(self):
+        with self._lock:
+            base = self._base
+            return {
+                'loaded': base is not None,
+                'size': 0 if base is None else len(base) - self._dead + len(self._delta),
+                'base_size': 0 if base is None else len(base),
+                'delta_size': len(self._delta),
+                'dead': self._dead,
+                'trigrams': 0 if base is None else int(base.grams.shape[0]),
+                'memory_mb': 0.0 if base is None else round(base.nbytes() / 1e6, 1),
+                'age_s': round(time.monotonic() - self._loaded_at, 1) if base is not None else None,
+                'refresh_s': self.refresh_s,
+                'max_delta': self.max_delta,
+                'searches': self.searches,
+                'builds': self.builds,
+                'refreshes': self.refreshes,
+                'compactions': self.compactions,
+                'build_errors': self.build_errors,
+                'last_build_ms': round(self.last_build_ms, 1)
+            }
+
+
+# Index dùng chung của process cho mọi NguoiRepository
+nguoi_search_index = NguoiSearchIndex()
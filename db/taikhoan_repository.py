@@ -1,24 +1,26 @@
 from db.models import TaiKhoan
 from db.connection_helper import ConnectionHelper
 
+# SQL dùng chung cho TaiKhoanRepository (pymysql) và AsyncTaiKhoanRepository (aiomysql, db/async_repository.py)
+SQL_INSERT_TAIKHOAN = "INSERT INTO taikhoan (username, passwrd) VALUES (%s, %s)"
+SQL_TAIKHOAN_BY_USERNAME = "SELECT * FROM taikhoan WHERE username = %s"
+SQL_CHECK_LOGIN = "SELECT * FROM taikhoan WHERE username = %s AND passwrd = %s"
+
 class TaiKhoanRepository(ConnectionHelper):
     def add(self, taikhoan: TaiKhoan):
-        sql = "INSERT INTO taikhoan (username, passwrd) VALUES (%s, %s)"
         with self as cursor:
-            cursor.execute(sql, (taikhoan.username, taikhoan.passwrd))
+            cursor.execute(SQL_INSERT_TAIKHOAN, (taikhoan.username, taikhoan.passwrd))
 
     def get_by_username(self, username: str):
-        sql = "SELECT * FROM taikhoan WHERE username = %s"
         with self as cursor:
-            cursor.execute(sql, (username,))
+            cursor.execute(SQL_TAIKHOAN_BY_USERNAME, (username,))
             row = cursor.fetchone()
             if row:
                 return TaiKhoan(username=row.get('username'), passwrd=row.get('passwrd'))
             return None
 
     def check_login(self, username: str, passwrd: str):
-        sql = "SELECT * FROM taikhoan WHERE username = %s AND passwrd = %s"
         with self as cursor:
-            cursor.execute(sql, (username, passwrd))
+            cursor.execute(SQL_CHECK_LOGIN, (username, passwrd))
             row = cursor.fetchone()
             return row is not None
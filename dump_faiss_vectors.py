@@ -6,7 +6,10 @@ import os
 
 print("Kiểm tra tồn tại file index:", os.path.exists('face_api/index/faiss_db_r18.index'))
 print("Bắt đầu load FAISS index và metadata...")
-faiss_manager = FaissIndexManager(embedding_size=512, index_path='face_api/'+FAISS_INDEX_PATH, meta_path='face_api/'+FAISS_META_PATH)
+faiss_manager = FaissIndexManager(embedding_size=512, index_path='face_api/'+FAISS_INDEX_PATH, meta_path='face_api/'+FAISS_META_PATH,
+                                 wal_path='face_api/'+FAISS_WAL_PATH,
+                                 embeddings_path='face_api/'+FAISS_EMBEDDINGS_PATH, use_mmap=True,
+                                 snapshot_dir='face_api/'+FAISS_SNAPSHOT_DIR)
 faiss_manager.load()
 print(f'Số lượng vector: {len(faiss_manager.image_ids)}')
 
@@ -22,7 +25,7 @@ for idx, (id, path, cid) in enumerate(zip(faiss_manager.image_ids, faiss_manager
     if (idx+1) % 1000 == 0:
         print(f'  Đã reconstruct {idx+1} vector đầu...')
     try:
-        vec = faiss_manager.index.reconstruct(idx)
+        vec = faiss_manager.embeddings[idx]
     except Exception as e:
         print(f'  Lỗi reconstruct vector idx={idx}: {e}')
         continue
@@ -39,7 +42,7 @@ for idx, (id, path, cid) in enumerate(zip(faiss_manager.image_ids, faiss_manager
     if (idx - (total-N)+1) % 1000 == 0:
         print(f'  Đã reconstruct {idx+1} vector cuối...')
     try:
-        vec = faiss_manager.index.reconstruct(idx)
+        vec = faiss_manager.embeddings[idx]
     except Exception as e:
         print(f'  Lỗi reconstruct vector idx={idx}: {e}')
         continue
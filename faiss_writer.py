@@ -0,0 +1,51 @@
+"""
+Process ghi FAISS duy nhất (single writer) khi FAISS_WRITER_ENABLED = True.
+
+    FAISS_WRITER_AUTHKEY=<secret> python faiss_writer.py
+
+Process này sở hữu FAISS index: load generation mới nhất, replay log, nhận lệnh add/edit/delete/reset từ các
+API worker qua FAISS_WRITER_ADDRESS, áp dụng theo lô và nối vào log dùng chung trong FAISS_SNAPSHOT_DIR
+(fsync + publish một lần mỗi lô, generation mới chỉ khi compact log). API worker mmap generation và áp dụng
+phần log sau nó để truy vấn. Khởi động process này trước uvicorn.
+"""
+import signal
+
+from config import *
+from index.sharded import create_faiss_manager
+from index.writer import IndexWriterServer, read_authkey
+
+
+def main():
+    # Không có authkey thì dừng ngay, trước khi load index
+    authkey = read_authkey(FAISS_WRITER_AUTHKEY_ENV, FAISS_WRITER_AUTHKEY_FILE)
+    manager = create_faiss_manager(
+        num_shards=FAISS_NUM_SHARDS,
+        embedding_size=512,
+        index_path=FAISS_INDEX_PATH,
+        meta_path=FAISS_META_PATH,
+        index_type=INDEX_TYPE,
+        index_params=INDEX_PARAMS,
+        wal_compact_bytes=FAISS_WAL_COMPACT_BYTES,
+        embeddings_path=FAISS_EMBEDDINGS_PATH,
+        use_mmap=FAISS_MMAP,
+        snapshot_dir=FAISS_SNAPSHOT_DIR,
+        keep_generations=FAISS_KEEP_GENERATIONS,
+        # Log dùng chung trong snapshot_dir là cơ chế ghi bền duy nhất (không dùng FAISS_WAL_PATH riêng)
+        shared_writes=True
+    )
+    manager.load()
+    # Publish trạng thái sau replay log thành generation để worker đọc (cả lần chạy đầu chưa có generation nào)
+    manager.save()
+
+    server = IndexWriterServer(manager, FAISS_WRITER_ADDRESS, authkey,
+                               max_batch=FAISS_WRITER_MAX_BATCH, max_wait_ms=FAISS_WRITER_MAX_WAIT_MS)
+    signal.signal(signal.SIGTERM, lambda *_: server.stop())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f'💾 FAISS writer dừng: {server.commands} lệnh trong {server.batches} lô')
+
+
+if __name__ == '__main__':
+    main()
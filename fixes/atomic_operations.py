@@ -0,0 +1,100 @@
+# ===== ATOMIC FILE OPERATIONS =====
+# File: face_api/fixes/atomic_operations.py
+# Mục đích: Các hàm ghi file bền vững (fsync) và thay thế nguyên tử (ghi tạm + os.replace),
+#           dùng cho snapshot FAISS (index/snapshot.py) để crash giữa chừng không để lại file dở dang,
+#           và khóa liên process để nhiều worker không ghi snapshot cùng lúc.
+
+import os
+import threading
+import zlib
+
+CHUNK_SIZE = 16 * 1024 * 1024
+
+
+def fsync_dir(path):
+    """fsync thư mục để các thao tác tạo/đổi tên file bên trong được ghi bền. Windows không hỗ trợ: bỏ qua."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_file(path, data):
+    """Ghi bytes vào file và fsync (không nguyên tử, dùng cho file trong thư mục tạm)."""
+    with open(path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def atomic_write_bytes(path, data):
+    """Ghi file tạm cạnh path, fsync rồi os.replace: người đọc luôn thấy bản cũ hoặc bản mới đầy đủ."""
+    tmp = path + '.tmp'
+    write_file(tmp, data)
+    os.replace(tmp, path)
+    fsync_dir(os.path.dirname(os.path.abspath(path)))
+
+
+def file_crc32(path):
+    """CRC32 của toàn bộ file, đọc theo khối để không nạp cả file vào RAM."""
+    crc = 0
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return crc
+            crc = zlib.crc32(chunk, crc)
+
+
+class InterProcessLock:
+    """
+    Khóa độc quyền giữa các process bằng flock (Windows: msvcrt.locking) trên một file khóa.
+    Reentrant trong cùng process: thread đã giữ khóa có thể lấy lại (vd. save() bên trong một lần ghi).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            self._file = open(self.path, 'a+b')
+            if os.name == 'nt':
+                import msvcrt
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            if os.name == 'nt':
+                import msvcrt
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
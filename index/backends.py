@@ -0,0 +1,167 @@
+import math
+
+import numpy as np
+import faiss
+
+
+# Các loại index hỗ trợ (giá trị của INDEX_TYPE trong config.py)
+INDEX_TYPES = ('flat', 'ivf_flat', 'ivf_pq', 'hnsw_flat', 'opq_ivf_pq')
+AUTO = 'auto'
+
+# Tham số mặc định, có thể ghi đè qua INDEX_PARAMS trong config.py
+DEFAULT_INDEX_PARAMS = {
+    'auto_threshold': 100_000,     # 'auto': dưới ngưỡng này dùng flat
+    'auto_large_type': 'ivf_flat', # 'auto': loại index khi vượt ngưỡng (remove_ids được, xóa/sửa không rebuild)
+    'nlist': None,                 # Số cluster IVF, None = tự chọn ~4*sqrt(N)
+    'nprobe': 16,                  # Số cluster IVF được duyệt khi search
+    'pq_m': 64,                    # Số sub-quantizer PQ (phải chia hết số chiều)
+    'pq_nbits': 8,                 # Số bit mỗi mã PQ
+    'hnsw_m': 32,                  # Số láng giềng mỗi node HNSW
+    'ef_search': 64,               # efSearch của HNSW
+    'ef_construction': 200,        # efConstruction của HNSW
+    'train_sample_size': 100_000,  # Số embedding lấy mẫu để train IVF/PQ
+}
+
+# Số điểm train tối thiểu cho mỗi centroid (khuyến nghị của FAISS)
+MIN_POINTS_PER_CENTROID = 39
+
+
+def merge_params(index_params=None):
+    params = dict(DEFAULT_INDEX_PARAMS)
+    if index_params:
+        params.update(index_params)
+    return params
+
+
+def resolve_index_type(index_type, ntotal, params):
+    """
+    Chọn loại index thực tế.
+    - 'auto': flat khi gallery nhỏ hơn auto_threshold, ngược lại dùng auto_large_type.
+    - Loại cần train (IVF/PQ) nhưng chưa đủ dữ liệu thì tạm dùng flat.
+    """
+    index_type = (index_type or 'flat').lower()
+    if index_type == AUTO:
+        index_type = 'flat' if ntotal < params['auto_threshold'] else params['auto_large_type']
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f'INDEX_TYPE không hợp lệ: {index_type}. Hỗ trợ: {AUTO}, {", ".join(INDEX_TYPES)}')
+    if ntotal < min_train_size(index_type, ntotal, params):
+        return 'flat'
+    return index_type
+
+
+def choose_nlist(ntotal, params):
+    if params['nlist']:
+        return int(params['nlist'])
+    nlist = int(4 * math.sqrt(max(ntotal, 1)))
+    return max(1, min(nlist, 65536, ntotal // MIN_POINTS_PER_CENTROID or 1))
+
+
+def min_train_size(index_type, ntotal, params):
+    if index_type in ('ivf_flat', 'ivf_pq', 'opq_ivf_pq'):
+        size = choose_nlist(ntotal, params) * MIN_POINTS_PER_CENTROID
+        if index_type != 'ivf_flat':
+            size = max(size, (2 ** params['pq_nbits']) * MIN_POINTS_PER_CENTROID)
+        return size
+    return 0
+
+
+def factory_string(index_type, ntotal, params):
+    """
+    Chuỗi faiss.index_factory. Flat và HNSW được bọc IDMap2 để id của vector là image_id.
+    IVF tự lưu id trong inverted list nên không bọc: IDMap2 giả định index bên trong dồn lại
+    vị trí sau remove_ids, điều IVF không làm, nên id_map sẽ lệch.
+    """
+    if index_type == 'flat':
+        return 'IDMap2,Flat'
+    if index_type == 'hnsw_flat':
+        return f"IDMap2,HNSW{params['hnsw_m']},Flat"
+    nlist = choose_nlist(ntotal, params)
+    pq = f"PQ{params['pq_m']}x{params['pq_nbits']}"
+    if index_type == 'ivf_flat':
+        return f'IVF{nlist},Flat'
+    if index_type == 'ivf_pq':
+        return f'IVF{nlist},{pq}'
+    if index_type == 'opq_ivf_pq':
+        return f"OPQ{params['pq_m']},IVF{nlist},{pq}"
+    raise ValueError(f'INDEX_TYPE không hợp lệ: {index_type}')
+
+
+def build_index(index_type, embedding_size, ntotal, params):
+    """Tạo index rỗng (chưa train) theo loại chỉ định, metric inner product, id của vector là image_id."""
+    index = faiss.index_factory(embedding_size, factory_string(index_type, ntotal, params),
+                                faiss.METRIC_INNER_PRODUCT)
+    if index_type == 'hnsw_flat':
+        faiss.downcast_index(index.index).hnsw.efConstruction = params['ef_construction']
+    elif index_type != 'flat':
+        # Direct map dạng hashtable: cho phép reconstruct(image_id) và remove_ids trên IVF
+        faiss.extract_index_ivf(index).set_direct_map_type(faiss.DirectMap.Hashtable)
+    apply_search_params(index, params)
+    return index
+
+
+def is_id_keyed(index):
+    """Index đã dùng image_id làm id (IDMap2 hoặc IVF); IndexFlatIP cũ lưu theo vị trí thì False."""
+    if isinstance(index, faiss.IndexIDMap2):
+        return True
+    try:
+        faiss.extract_index_ivf(index)
+        return True
+    except RuntimeError:
+        return False
+
+
+def train_index(index, embeddings, params, seed=1234):
+    """Train index (IVF/PQ/OPQ) trên một mẫu ngẫu nhiên từ ma trận embedding đang lưu."""
+    if index.is_trained:
+        return
+    n = embeddings.shape[0]
+    sample_size = min(n, params['train_sample_size'])
+    if sample_size < n:
+        rows = np.sort(np.random.default_rng(seed).choice(n, sample_size, replace=False))
+        sample = embeddings[rows]
+    else:
+        sample = embeddings
+    print(f'Train FAISS index trên {sample_size}/{n} embedding...')
+    index.train(np.ascontiguousarray(sample, dtype=np.float32))
+
+
+def apply_search_params(index, params):
+    """Đặt nprobe (IVF) hoặc efSearch (HNSW) cho index đã bọc IDMap2."""
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+    if isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = params['ef_search']
+        return
+    try:
+        faiss.extract_index_ivf(inner).nprobe = params['nprobe']
+    except RuntimeError:
+        pass
+
+
+def detect_index_type(index):
+    """Suy ra loại index từ index đọc lên từ file."""
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+    if isinstance(inner, faiss.IndexHNSW):
+        return 'hnsw_flat'
+    if isinstance(inner, faiss.IndexPreTransform):
+        return 'opq_ivf_pq'
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return 'ivf_pq'
+    if isinstance(inner, faiss.IndexIVF):
+        return 'ivf_flat'
+    return 'flat'
+
+
+def id_selector(index_type, ids):
+    """
+    IDSelector cho remove_ids. IndexIDMap2 dùng IDSelectorBatch (tra cứu hash, hợp với quét toàn bộ
+    id_map); direct map hashtable của IVF chỉ chấp nhận IDSelectorArray. `ids` phải là mảng int64
+    liên tục và còn sống đến khi remove_ids kết thúc.
+    """
+    if index_type in ('flat', 'hnsw_flat'):
+        return faiss.IDSelectorBatch(ids.size, faiss.swig_ptr(ids))
+    return faiss.IDSelectorArray(ids.size, faiss.swig_ptr(ids))
+
+
+def supports_remove(index_type):
+    """HNSW không hỗ trợ remove_ids, xóa/cập nhật phải dựng lại index."""
+    return index_type != 'hnsw_flat'
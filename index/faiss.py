@@ -1,10 +1,75 @@
+import contextlib
+import functools
 import numpy as np
 import faiss
 import os
-import pandas as pd
+import threading
+
+from index import backends
+from index.metadata import StringColumn, read_columnar, read_metadata, stage_metadata, publish_metadata
+from index.persistence import PersistenceWorker
+from index.generation import GenerationCounter
+from index.snapshot import SnapshotStore, INDEX_FILE, SHARED_WAL_FILE, WAL_SEQ_FILE, generation_name
+from index.wal import MutationLog, OP_ADD, OP_UPDATE_EMBEDDING, OP_UPDATE_PATH, OP_DELETE_IDS
+
+
+# Dung lượng tối thiểu (số dòng) khi cấp phát ma trận embedding lần đầu
+MIN_CAPACITY = 1024
+# Kích thước log mặc định (byte) trước khi compact thành snapshot mới
+WAL_COMPACT_BYTES = 64 * 1024 * 1024
+
+
+def _shared_write(method):
+    """
+    Thay đổi khi nhiều process cùng ghi một snapshot_dir (shared_writes): giữ khóa ghi liên process,
+    đọc thay đổi của worker khác (generation mới nhất + phần log dùng chung sau nó), áp dụng thay đổi,
+    fsync bản ghi log rồi publish seq mới, để không process nào ghi đè thay đổi của process khác.
+    Chỉ ghi generation đầy đủ khi log dùng chung vượt wal_compact_bytes.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self.shared_writes or self._replaying or self._in_shared_write:
+            return method(self, *args, **kwargs)
+        with self.shared_write_batch():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _index_path_into(path_to_row, duplicates, path, row):
+    # image_path trùng (dữ liệu cũ, hoặc update_image_path) hiếm gặp: dòng thứ hai trở đi nằm ở dict phụ
+    if path_to_row.setdefault(path, row) != row:
+        duplicates.setdefault(path, set()).add(row)
 
 
 class FaissIndexManager:
+    """
+    Quản lý FAISS index và metadata đi kèm.
+    - Embeddings được lưu trong MỘT ma trận float32 liên tục, cấp phát trước và tăng gấp đôi dung lượng khi đầy.
+    - image_ids và class_ids là các mảng NumPy int64 song song với ma trận embedding, image_paths là StringColumn
+      (heap offsets + bytes, xem index/metadata.py).
+    - FAISS index dùng image_id làm id (IndexIDMap2, hoặc id gốc của IVF), kèm dict image_id -> dòng,
+      nên xóa/tra cứu theo image_id không cần rebuild toàn bộ index.
+    - Loại index bên trong (flat, IVF-Flat, IVF-PQ, HNSW-Flat, OPQ+IVF-PQ) chọn qua index_type,
+      'auto' dùng flat cho gallery nhỏ và chuyển sang ANN khi vượt ngưỡng (xem index/backends.py).
+    - Các thuộc tính embeddings, image_ids, class_ids trả về view (không copy) trên phần dữ liệu đang dùng.
+    - Khi có embeddings_path, ma trận embedding được lưu thành file .npy float32 riêng; với use_mmap, load() mở
+      embedding bằng np.load(mmap_mode='r') và FAISS index bằng IO_FLAG_MMAP_IFC (không copy, các worker dùng chung
+      page cache). Lần thay đổi đầu tiên chuyển sang bản sở hữu trong RAM (_make_writable).
+    - Khi có wal_path, mọi thay đổi được ghi nối vào log (index/wal.py); commit() chỉ fsync phần log mới,
+      snapshot đầy đủ (index + metadata) được ghi nền khi log vượt wal_compact_bytes, load() replay phần log còn lại.
+    - Metadata lưu dạng cột (thư mục .npy int64 + heap chuỗi, không pickle) và được mmap khi load;
+      meta_path kết thúc bằng .npz thì vẫn dùng định dạng npz cũ.
+    - Sau start_persistence(lock), commit() chỉ báo cho thread nền (index/persistence.py): log được fsync theo lô
+      và snapshot được ghi ngoài lock, gộp nhiều thay đổi trong một lần ghi; flush() ép ghi ngay.
+    - shared_writes=True (nhiều uvicorn worker dùng chung snapshot_dir): thay đổi được nối vào log dùng chung
+      trong snapshot_dir và publish theo seq trong khóa liên process, generation mới chỉ được ghi khi compact log;
+      refresh() load generation mới / áp dụng phần log mới khi process khác publish.
+    - Tra cứu theo image_id, image_path và class_id dùng dict được cập nhật tăng dần khi add/xóa/swap-remove
+      (get_row, get_row_by_path, get_rows_by_class), không quét metadata trên mỗi request.
+    - Khi có snapshot_dir, mỗi snapshot là một thư mục generation bất biến (index + metadata + MANIFEST, xem
+      index/snapshot.py) được publish nguyên tử; load() đọc generation hoàn chỉnh mới nhất. index_path/meta_path
+      chỉ còn được đọc khi chưa có generation nào (dữ liệu cũ).
+    """
     def query_embeddings_by_string(self, query, page=1, page_size=15):
         """
         Truy vấn embedding chỉ theo class_id (không phân biệt hoa thường), hỗ trợ phân trang.
@@ -14,31 +79,18 @@ class FaissIndexManager:
         Trả về dict: { 'total': ..., 'total_pages': ..., 'page': ..., 'results': [...] }
         """
         query = str(query).strip().lower()
-        results = []
         if not query:
             # Trả về tất cả embedding nếu query rỗng
-            for idx, (img_id, img_path, cls_id) in enumerate(zip(self.image_ids, self.image_paths, self.class_ids)):
-                results.append({
-                    'image_id': img_id,
-                    'image_path': img_path,
-                    'class_id': cls_id,
-                    'faiss_index': idx
-                })
+            rows = np.arange(self._size)
         else:
-            for idx, (img_id, img_path, cls_id) in enumerate(zip(self.image_ids, self.image_paths, self.class_ids)):
-                if query == str(cls_id).strip().lower():
-                    results.append({
-                        'image_id': img_id,
-                        'image_path': img_path,
-                        'class_id': cls_id,
-                        'faiss_index': idx
-                    })
-        total = len(results)
+            rows = self.get_rows_by_class(query)
+        total = int(rows.size)
         total_pages = (total + page_size - 1) // page_size if page_size > 0 else 1
         page = max(1, min(page, total_pages))
         start = (page - 1) * page_size
         end = start + page_size
-        paged_results = results[start:end]
+        # Chỉ dựng dict cho các dòng thuộc trang hiện tại
+        paged_results = [self._row_to_dict(int(idx)) for idx in rows[start:end]]
         return {
             'total': total,
             'total_pages': total_pages,
@@ -46,134 +98,735 @@ class FaissIndexManager:
             'page_size': page_size,
             'results': paged_results
         }
+    @_shared_write
     def reset_index(self):
         """
         Xóa toàn bộ dữ liệu FAISS index và metadata
         """
-        self.index = faiss.IndexFlatIP(self.embedding_size)
-        self.image_ids = []
-        self.image_paths = []
-        self.class_ids = []
-        self.embeddings = []
-        # Làm trống file index và metadata, giữ cấu trúc file
-        if self.index_path:
-            faiss.write_index(self.index, self.index_path)
-        if self.meta_path:
-            np.savez(self.meta_path,
-                     image_ids=np.array([]),
-                     image_paths=np.array([]),
-                     class_ids=np.array([]),
-                     embeddings=np.array([], dtype=np.float32))
+        self.index = self._new_index()
+        self._index_mmapped = False
+        self._init_storage()
+        # Ghi snapshot rỗng trước (save() seal và xóa phần log đã nằm trong snapshot), rồi mới xóa log: crash giữa
+        # hai bước không đưa dữ liệu cũ trở lại, và worker khác không thấy log trống khi generation cũ vẫn còn hiệu lực
+        if self.snapshots is not None or (self.index_path and self.meta_path):
+            self.save()
+        if self.wal is not None:
+            self.wal.reset()
         print('Đã làm trống FAISS index và metadata, giữ cấu trúc file.')
-    def __init__(self, embedding_size, index_path=None, meta_path=None):
+    def __init__(self, embedding_size, index_path=None, meta_path=None, index_type='flat', index_params=None,
+                 wal_path=None, wal_compact_bytes=WAL_COMPACT_BYTES, embeddings_path=None, use_mmap=False,
+                 snapshot_dir=None, keep_generations=2, shared_writes=False):
         self.embedding_size = embedding_size
-        self.index = faiss.IndexFlatIP(embedding_size)
-        self.image_ids = []
-        self.image_paths = []
-        self.class_ids = []
-        self.embeddings = []
+        self.index_type = index_type
+        self.index_params = backends.merge_params(index_params)
+        self._active_index_type = None
+        self.index = self._new_index()
         self.index_path = index_path
         self.meta_path = meta_path
+        self.embeddings_path = embeddings_path
+        self.use_mmap = use_mmap
+        self._index_mmapped = False
+        self.snapshots = SnapshotStore(snapshot_dir, keep_generations) if snapshot_dir else None
+        self._loaded_stamp = None
+        if shared_writes and (self.snapshots is None or wal_path):
+            raise ValueError('shared_writes cần snapshot_dir và không dùng wal_path (log dùng chung nằm trong snapshot_dir)')
+        self.shared_writes = shared_writes
+        self._in_shared_write = False
+        if shared_writes:
+            self.wal = MutationLog(os.path.join(snapshot_dir, SHARED_WAL_FILE), embedding_size, shared=True)
+            self._log_counter = GenerationCounter(os.path.join(snapshot_dir, WAL_SEQ_FILE))
+        else:
+            self.wal = MutationLog(wal_path, embedding_size) if wal_path else None
+            self._log_counter = None
+        self.wal_compact_bytes = wal_compact_bytes
+        self._replaying = False
+        self._snapshot_version = 0
+        self._written_version = 0
+        self._snapshot_lock = threading.Lock()
+        self._compact_thread = None
+        self.persistence = None
+        self._init_storage()
+
+    def _init_storage(self, capacity=0):
+        """
+        Cấp phát lại bộ lưu trữ rỗng: ma trận embedding float32 và các mảng metadata song song.
+        """
+        self._size = 0
+        self._embeddings = np.empty((capacity, self.embedding_size), dtype=np.float32)
+        self._image_ids = np.empty(capacity, dtype=np.int64)
+        self._class_ids = np.empty(capacity, dtype=np.int64)
+        self.image_paths = StringColumn()
+        self._reset_lookups({})
+
+    def _reset_lookups(self, id_to_row):
+        """
+        Bảng tra cứu theo metadata: image_id -> dòng (dựng ngay), image_path -> dòng và class_id -> list dòng tăng dần
+        (dựng lần đầu cần đến, để load không phải giải mã toàn bộ heap chuỗi). Sau khi dựng được cập nhật tăng dần
+        khi add/xóa/sửa, nên kiểm tra tồn tại và tra theo class không phải quét cả gallery.
+        """
+        self._id_to_row = id_to_row
+        self._path_to_row = None
+        self._path_duplicates = {}
+        self._class_to_rows = None
+
+    def _path_lookup(self):
+        path_to_row = self._path_to_row
+        if path_to_row is None:
+            # Dựng vào dict cục bộ rồi mới gán: get_row_by_path chạy dưới read lock, nhiều thread có thể cùng dựng,
+            # không thread nào được thấy dict đang dựng dở
+            path_to_row, duplicates = {}, {}
+            for row, path in enumerate(self.image_paths):
+                _index_path_into(path_to_row, duplicates, path, row)
+            self._path_duplicates = duplicates
+            self._path_to_row = path_to_row
+        return path_to_row
+
+    def _index_path(self, path, row):
+        _index_path_into(self._path_to_row, self._path_duplicates, path, row)
+
+    def _class_lookup(self):
+        if self._class_to_rows is None:
+            order = np.argsort(self.class_ids, kind='stable')
+            class_ids, starts = np.unique(self.class_ids[order], return_index=True)
+            self._class_to_rows = {
+                class_id: rows.tolist()
+                for class_id, rows in zip(class_ids.tolist(), np.split(order, starts[1:]))
+            }
+        return self._class_to_rows
+
+    def _forget_path(self, path, row):
+        duplicates = self._path_duplicates.get(path)
+        if self._path_to_row.get(path) == row:
+            if duplicates:
+                self._path_to_row[path] = duplicates.pop()
+            else:
+                del self._path_to_row[path]
+        elif duplicates:
+            duplicates.discard(row)
+        if duplicates is not None and not duplicates:
+            del self._path_duplicates[path]
+
+    def _new_index(self, ntotal=0):
+        """
+        Tạo index rỗng (chưa train) phù hợp với gallery `ntotal` vector, id của vector chính là image_id.
+        """
+        self._active_index_type = backends.resolve_index_type(self.index_type, ntotal, self.index_params)
+        return backends.build_index(self._active_index_type, self.embedding_size, ntotal, self.index_params)
+
+    def _reserve(self, required):
+        """
+        Đảm bảo ma trận có đủ chỗ cho `required` dòng, tăng gấp đôi dung lượng nếu thiếu.
+        Chỉ copy phần dữ liệu đang dùng sang buffer mới.
+        """
+        capacity = self._embeddings.shape[0]
+        if required <= capacity:
+            return
+        new_capacity = max(required, capacity * 2, MIN_CAPACITY)
+        embeddings = np.empty((new_capacity, self.embedding_size), dtype=np.float32)
+        image_ids = np.empty(new_capacity, dtype=np.int64)
+        class_ids = np.empty(new_capacity, dtype=np.int64)
+        embeddings[:self._size] = self._embeddings[:self._size]
+        image_ids[:self._size] = self._image_ids[:self._size]
+        class_ids[:self._size] = self._class_ids[:self._size]
+        self._embeddings = embeddings
+        self._image_ids = image_ids
+        self._class_ids = class_ids
+
+    @property
+    def embeddings(self):
+        """View (N, d) float32 trên các embedding đang dùng, không copy."""
+        return self._embeddings[:self._size]
+
+    @property
+    def image_ids(self):
+        """View int64 trên image_id của các dòng đang dùng."""
+        return self._image_ids[:self._size]
+
+    @property
+    def class_ids(self):
+        """View int64 trên class_id của các dòng đang dùng."""
+        return self._class_ids[:self._size]
+
+    @property
+    def capacity(self):
+        return self._embeddings.shape[0]
 
+    def __len__(self):
+        return self._size
+
+    @staticmethod
+    def _to_int64(value):
+        """Chuyển image_id/class_id về int, trả về None nếu không hợp lệ."""
+        try:
+            return int(str(value).strip())
+        except (TypeError, ValueError):
+            return None
+
+    def _row_to_dict(self, idx):
+        return {
+            'image_id': int(self._image_ids[idx]),
+            'image_path': self.image_paths[idx],
+            'class_id': int(self._class_ids[idx]),
+            'faiss_index': idx
+        }
+
+    @_shared_write
     def add_embeddings(self, embeddings, image_ids, image_paths, class_ids):
-        embeddings_norm = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
-        self.index.add(embeddings_norm.astype(np.float32))
-        self.image_ids.extend(image_ids)
-        self.image_paths.extend(image_paths)
-        self.class_ids.extend(class_ids)
-        if len(self.embeddings) == 0:
-            self.embeddings = embeddings_norm.tolist()
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.embedding_size)
+        n = embeddings.shape[0]
+        if n == 0:
+            return
+        ids = np.asarray(image_ids, dtype=np.int64).reshape(-1)
+        self._make_writable()
+        # IndexIDMap2 yêu cầu id duy nhất
+        duplicated = [int(i) for i in ids if int(i) in self._id_to_row]
+        if duplicated or np.unique(ids).size != n:
+            raise ValueError(f'image_id đã tồn tại hoặc bị trùng: {duplicated or ids.tolist()}')
+        start, end = self._size, self._size + n
+        self._reserve(end)
+        # Chuẩn hóa L2 và ghi thẳng vào ma trận, không tạo list Python
+        rows = self._embeddings[start:end]
+        np.divide(embeddings, np.linalg.norm(embeddings, axis=1, keepdims=True), out=rows)
+        self.index.add_with_ids(rows, ids)
+        self._image_ids[start:end] = ids
+        self._class_ids[start:end] = np.asarray(class_ids, dtype=np.int64)
+        self.image_paths.extend(str(p) for p in image_paths)
+        self._id_to_row.update(zip(ids.tolist(), range(start, end)))
+        if self._path_to_row is not None:
+            for row in range(start, end):
+                self._index_path(self.image_paths[row], row)
+        if self._class_to_rows is not None:
+            # Dòng mới luôn lớn hơn mọi dòng cũ: nối vào cuối vẫn giữ thứ tự tăng dần
+            for row, class_id in enumerate(self._class_ids[start:end].tolist(), start):
+                self._class_to_rows.setdefault(class_id, []).append(row)
+        self._size = end
+        if self._logging:
+            self.wal.append_add(rows, ids, self.image_paths[start:end], self._class_ids[start:end])
+        self._ensure_index_type()
+
+    def _make_writable(self):
+        """
+        Index/embedding/metadata đang mmap là chỉ đọc (FAISS sẽ abort nếu add/remove trên vùng nhớ mmap):
+        copy sang bản sở hữu trong RAM trước thay đổi đầu tiên.
+        """
+        if self._index_mmapped:
+            print('Chuyển FAISS index từ mmap sang bộ nhớ riêng trước khi thay đổi...')
+            self.index = faiss.deserialize_index(faiss.serialize_index(self.index))
+            backends.apply_search_params(self.index, self.index_params)
+            self._index_mmapped = False
+        if not self._embeddings.flags.writeable:
+            self._embeddings = np.array(self._embeddings, dtype=np.float32)
+        if not self._image_ids.flags.writeable:
+            self._image_ids = np.array(self._image_ids, dtype=np.int64)
+            self._class_ids = np.array(self._class_ids, dtype=np.int64)
+
+    @property
+    def _logging(self):
+        return self.wal is not None and not self._replaying
+
+    def commit(self):
+        """
+        Ghi bền các thay đổi từ lần commit trước. Có persistence worker: chỉ báo dirty, việc ghi diễn ra ở nền.
+        Có log: một lần write + fsync phần log mới (O(số byte thay đổi)), và khởi động compact nền khi log
+        vượt ngưỡng. Không có log: save() toàn bộ. Gọi trong cùng lock với thao tác thay đổi.
+        """
+        if self.shared_writes:
+            # Đã fsync và publish log ngay trong thao tác thay đổi
+            return
+        if self.persistence is not None:
+            self.persistence.notify()
+            return
+        if self.wal is None:
+            self.save()
+            return
+        self.wal.sync()
+        if self.wal.size >= self.wal_compact_bytes:
+            self.compact_async()
+
+    def start_persistence(self, lock, interval=0.5, max_dirty=256):
+        """Chuyển việc ghi bền sang thread nền. `lock` là lock ghi mà các thao tác thay đổi đang dùng."""
+        if self.persistence is None:
+            self.persistence = PersistenceWorker(self, lock, interval, max_dirty).start()
+        return self.persistence
+
+    def persist_pending(self, lock, dirty=1):
+        """
+        Ghi bền các thay đổi đang chờ (gọi từ persistence worker, KHÔNG giữ lock).
+        Log chỉ cần fsync (MutationLog có lock riêng); snapshot được chụp trong lock rồi ghi ngoài lock,
+        nên truy vấn chỉ chờ phần copy trong RAM chứ không chờ I/O đĩa.
+        """
+        if self.wal is not None:
+            self.wal.sync()
+            if self.wal.size < self.wal_compact_bytes:
+                return
+        elif not dirty:
+            return
+        with lock:
+            snapshot = self._capture_snapshot()
+        self._write_snapshot(snapshot)
+
+    def flush(self, timeout=None):
+        """
+        Ghi bền ngay mọi thay đổi đã commit và chờ xong (test, shutdown). Không có worker: tương đương commit().
+        Không gọi khi đang giữ lock ghi: worker cần lock để chụp snapshot.
+        """
+        if self.persistence is not None:
+            return self.persistence.flush(timeout)
+        if self.shared_writes:
+            return True
+        if self.wal is not None:
+            self.wal.sync()
         else:
-            self.embeddings.extend(embeddings_norm.tolist())
+            self.save()
+        return True
+
+    def _capture_snapshot(self):
+        """
+        Chụp trạng thái hiện tại để ghi snapshot: serialize index, copy metadata/embedding,
+        và seal log để các thay đổi sau đó vào segment mới. Gọi khi đang giữ lock.
+        """
+        seq = self.wal.seal() if self.wal is not None else 0
+        self._snapshot_version += 1
+        return {
+            'version': self._snapshot_version,
+            'wal_seq': seq,
+            'index': faiss.serialize_index(self.index),
+            'image_ids': self.image_ids.copy(),
+            'image_paths': self.image_paths.copy(),
+            'class_ids': self.class_ids.copy(),
+            'embeddings': np.array(self.embeddings)
+        }
+
+    def _write_snapshot(self, snapshot):
+        """Ghi snapshot ra file tạm rồi os.replace; bỏ qua nếu đã có snapshot mới hơn được ghi."""
+        with self._snapshot_lock:
+            if snapshot['version'] <= self._written_version:
+                return
+            if self.snapshots is not None:
+                # Chính process này vừa ghi: đánh dấu đã load generation này trước khi publish, để
+                # snapshot_changed() của request khác trong process không load lại chính nó
+                self.snapshots.write(snapshot['index'].tobytes(), snapshot['embeddings'],
+                                     snapshot['image_ids'], snapshot['class_ids'],
+                                     snapshot['image_paths'], snapshot['wal_seq'],
+                                     extra={'index_type': self._active_index_type},
+                                     before_publish=self._mark_written_generation)
+            else:
+                self._write_legacy_files(snapshot)
+            self._written_version = snapshot['version']
+            if self.wal is not None:
+                self.wal.drop_sealed(snapshot['wal_seq'])
+
+    def _mark_written_generation(self, generation):
+        self._loaded_stamp = ('generation', generation)
+
+    def _write_legacy_files(self, snapshot):
+        """Ghi snapshot vào index_path/meta_path/embeddings_path: ghi hết file tạm rồi os.replace từng file."""
+        index_tmp = self.index_path + '.tmp'
+        with open(index_tmp, 'wb') as f:
+            f.write(snapshot['index'].tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        # Embedding: file .npy float32 riêng (mmap được) nếu có embeddings_path, ngược lại nằm cùng metadata
+        if self.embeddings_path:
+            embeddings_tmp = self.embeddings_path + '.tmp'
+            with open(embeddings_tmp, 'wb') as f:
+                np.save(f, snapshot['embeddings'])
+                f.flush()
+                os.fsync(f.fileno())
+        meta_tmp = stage_metadata(self.meta_path, snapshot['image_ids'], snapshot['class_ids'],
+                                  snapshot['image_paths'], snapshot['wal_seq'],
+                                  None if self.embeddings_path else snapshot['embeddings'])
+        os.replace(index_tmp, self.index_path)
+        if self.embeddings_path:
+            os.replace(embeddings_tmp, self.embeddings_path)
+        publish_metadata(self.meta_path, meta_tmp)
+
+    def compact_async(self):
+        """Ghi snapshot mới ở thread nền rồi xóa phần log đã nằm trong snapshot. Gọi khi đang giữ lock."""
+        if self._compact_thread is not None and self._compact_thread.is_alive():
+            return
+        snapshot = self._capture_snapshot()
+        print(f'Compact log FAISS: ghi snapshot nền tại seq {snapshot["wal_seq"]} ({self._size} vector)...')
+        self._compact_thread = threading.Thread(target=self._write_snapshot, args=(snapshot,),
+                                                name='faiss-compaction', daemon=True)
+        self._compact_thread.start()
+
+    def wait_for_compaction(self):
+        if self._compact_thread is not None:
+            self._compact_thread.join()
 
     def save(self):
-        faiss.write_index(self.index, self.index_path)
-        np.savez(self.meta_path,
-                 image_ids=np.array(self.image_ids),
-                 image_paths=np.array(self.image_paths),
-                 class_ids=np.array(self.class_ids),
-                 embeddings=np.array(self.embeddings, dtype=np.float32))
+        """Ghi đồng bộ snapshot đầy đủ (index + metadata) và xóa phần log đã nằm trong snapshot."""
+        self._write_snapshot(self._capture_snapshot())
 
     def load(self):
         """
-        Load lại FAISS index và metadata từ file nếu file thực sự thay đổi.
-        - Sử dụng timestamp (mtime) của file index và metadata để kiểm tra thay đổi.
-        - Nếu file không thay đổi kể từ lần load trước, bỏ qua việc load lại để tối ưu hiệu năng.
-        - Nếu file thay đổi, đọc lại index và metadata, đồng bộ các thuộc tính image_ids, image_paths, class_ids, embeddings.
+        Load lại FAISS index và metadata nếu snapshot thực sự thay đổi.
+        - Có snapshot_dir: đọc generation hoàn chỉnh mới nhất, bỏ qua nếu vẫn là generation đã load.
+        - Không có (hoặc chưa có generation nào): đọc index_path/meta_path, so mtime để bỏ qua khi không đổi.
         - Nếu embeddings trong metadata bị thiếu hoặc không khớp số lượng với image_ids, sẽ reconstruct lại embeddings từ FAISS index.
         """
-        # 1. Lấy thời gian sửa đổi cuối cùng (mtime) của file index và metadata
+        # 1-3. Tìm snapshot mới nhất, đọc FAISS index (mmap: không copy vector, dùng chung page cache giữa các worker)
+        #      và metadata (dạng cột thì mmap không copy)
+        stamp, idx, meta = self._open_snapshot()
+        if idx is None:
+            print('Index và metadata chưa thay đổi, không cần load lại.')
+            return
+        image_ids = meta['image_ids']
+        class_ids = meta['class_ids']
+        image_paths = meta['image_paths']
+        n = image_ids.shape[0]
+
+        # 5. Kiểm tra embeddings: nếu tồn tại và đủ số lượng thì dùng luôn, ngược lại reconstruct lại từ index
+        is_id_map = backends.is_id_keyed(idx)
+        stored = None
+        if meta['embeddings'] is not None:
+            stored = meta['embeddings']
+        if stored is not None and stored.shape[0] == n:
+            embeddings = stored.reshape(n, self.embedding_size)
+        elif n == 0:
+            embeddings = np.empty((0, self.embedding_size), dtype=np.float32)
+        else:
+            print('Embeddings bị thiếu hoặc không khớp, reconstruct lại từ FAISS index...')
+            if is_id_map:
+                embeddings = np.vstack([idx.reconstruct(int(i)) for i in image_ids])
+            else:
+                embeddings = idx.reconstruct_n(0, n)
+
+        self._size = n
+        self._embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self._image_ids = image_ids
+        self._class_ids = class_ids
+        self.image_paths = image_paths
+        self._reset_lookups(dict(zip(image_ids.tolist(), range(n))))
+        wal_seq = meta['wal_seq']
+
+        # Index cũ (IndexFlatIP theo vị trí) hoặc lệch số lượng: dựng lại IndexIDMap2 một lần từ ma trận
+        if is_id_map and idx.ntotal == n:
+            self.index = idx
+            self._index_mmapped = self.use_mmap
+            self._active_index_type = backends.detect_index_type(idx)
+            backends.apply_search_params(idx, self.index_params)
+            # Cấu hình INDEX_TYPE thay đổi so với file: dựng lại theo loại mới
+            self._ensure_index_type()
+        else:
+            print('Index không phải IndexIDMap2 hoặc không khớp metadata, dựng lại theo image_id...')
+            self._rebuild_index()
+
+        # 6. Áp dụng các thay đổi trong log sau snapshot
+        self._replay_log(wal_seq)
+
+        # 7. Lưu lại generation/mtime để lần sau kiểm tra
+        self._loaded_stamp = stamp
+        print(f'LOAD: số lượng embeddings : {self._size}')
+
+    @property
+    def loaded_generation(self):
+        """Generation snapshot đang nằm trong bộ nhớ (đã load hoặc do chính process này ghi), None nếu không có."""
+        stamp = self._loaded_stamp
+        return stamp[1] if stamp is not None and stamp[0] == 'generation' else None
+
+    def snapshot_changed(self):
+        """
+        Có process khác vừa publish generation hoặc bản ghi log dùng chung mới hơn không
+        (đọc mmap, đủ rẻ để gọi mỗi request).
+        """
+        if self.snapshots is None:
+            return False
+        if self.snapshots.published_generation() > (self.loaded_generation or 0):
+            return True
+        return self._log_counter is not None and self._log_counter.value > self.wal.last_seq
+
+    def refresh(self):
+        """Load thay đổi mới nhất nếu có process khác đã publish. Gọi khi đang giữ lock ghi. Trả về True nếu đã load lại."""
+        if not self.snapshot_changed():
+            return False
+        if self.shared_writes:
+            with self.snapshots.writer_lock():
+                self._catch_up()
+        else:
+            self.load()
+        return True
+
+    @contextlib.contextmanager
+    def shared_write_batch(self):
+        """
+        shared_writes: gom nhiều thay đổi vào một lần giữ khóa liên process, bắt kịp thay đổi của process khác
+        một lần ở đầu và fsync + publish log một lần ở cuối (process writer dùng cho cả lô lệnh).
+        Không bật shared_writes, hoặc đang ở trong một lô: không làm gì thêm.
+        """
+        if not self.shared_writes or self._in_shared_write:
+            yield
+            return
+        with self.snapshots.writer_lock():
+            self._in_shared_write = True
+            try:
+                self._catch_up()
+                yield
+                self._publish_shared_log()
+            finally:
+                self._in_shared_write = False
+
+    def _catch_up(self):
+        """
+        shared_writes, trong khóa liên process: load generation mới nếu có (kèm replay log sau nó), ngược lại chỉ
+        áp dụng các bản ghi process khác vừa nối vào log dùng chung. Luôn đọc log (không chỉ dựa vào seq đã publish)
+        để không bỏ sót bản ghi của process bị crash giữa fsync và publish.
+        """
+        if self.snapshots.published_generation() > (self.loaded_generation or 0):
+            self.load()
+        else:
+            self._apply_log_records(self.wal.replay_new())
+
+    def _publish_shared_log(self):
+        """fsync các bản ghi vừa nối vào log dùng chung và publish seq; log quá lớn thì compact thành generation mới."""
+        self.wal.sync()
+        self._log_counter.publish(self.wal.last_seq)
+        if self.wal.size >= self.wal_compact_bytes:
+            print(f'Compact log FAISS dùng chung: ghi generation mới ({self._size} vector)...')
+            self.save()
+
+    def _open_snapshot(self):
+        """
+        Trả về (stamp, index, metadata) của snapshot mới nhất; index và metadata là None nếu stamp
+        trùng với lần load trước (không có gì mới).
+        """
+        flags = faiss.IO_FLAG_MMAP_IFC if self.use_mmap else 0
+        if self.snapshots is not None:
+            latest = self.snapshots.latest()
+            if latest is not None:
+                generation, path, manifest = latest
+                stamp = ('generation', generation)
+                if stamp == self._loaded_stamp:
+                    return stamp, None, None
+                print(f'Đọc snapshot {generation_name(generation)} ({manifest["rows"]} dòng, wal_seq={manifest["wal_seq"]})')
+                return stamp, faiss.read_index(os.path.join(path, INDEX_FILE), flags), read_columnar(path, self.use_mmap)
+            print('Chưa có generation snapshot nào, đọc file index/metadata cũ...')
+
         index_mtime = os.path.getmtime(self.index_path) if self.index_path and os.path.exists(self.index_path) else None
         meta_mtime = os.path.getmtime(self.meta_path) if self.meta_path and os.path.exists(self.meta_path) else None
+        stamp = ('files', index_mtime, meta_mtime)
+        if stamp == self._loaded_stamp:
+            return stamp, None, None
+        idx = faiss.read_index(self.index_path, flags)
+        meta = read_metadata(self.meta_path, mmap=self.use_mmap)
+        if self.embeddings_path and os.path.exists(self.embeddings_path):
+            meta['embeddings'] = np.load(self.embeddings_path, mmap_mode='r' if self.use_mmap else None)
+        return stamp, idx, meta
 
-        # 2. Nếu đã từng load và mtime không đổi, bỏ qua việc load lại
-        if hasattr(self, '_last_index_mtime') and self._last_index_mtime == index_mtime and \
-           hasattr(self, '_last_meta_mtime') and self._last_meta_mtime == meta_mtime:
-            print('Index và metadata chưa thay đổi, không cần load lại.')
+    def _replay_log(self, after_seq):
+        """Áp dụng lại các bản ghi log có seq > after_seq (chưa nằm trong snapshot) mà không ghi log lần nữa."""
+        if self.wal is None:
             return
+        count = self._apply_log_records(self.wal.replay(after_seq))
+        if count:
+            print(f'Replay log FAISS: {count} thay đổi sau snapshot (seq > {after_seq})')
 
-        # 3. Đọc lại FAISS index từ file
-        idx = faiss.read_index(self.index_path)
-        self.index = idx
+    def _apply_log_records(self, records):
+        """Áp dụng các bản ghi (seq, op, args) theo thứ tự mà không ghi log lần nữa. Trả về số bản ghi."""
+        count = 0
+        self._replaying = True
+        try:
+            for seq, op, args in records:
+                if op == OP_ADD:
+                    embeddings, image_ids, image_paths, class_ids = args
+                    fresh = np.array([int(i) not in self._id_to_row for i in image_ids], dtype=bool)
+                    if fresh.any():
+                        self.add_embeddings(embeddings[fresh], image_ids[fresh],
+                                            [p for p, f in zip(image_paths, fresh) if f], class_ids[fresh])
+                elif op == OP_UPDATE_EMBEDDING:
+                    self.update_embedding(*args)
+                elif op == OP_UPDATE_PATH:
+                    self.update_image_path(*args)
+                elif op == OP_DELETE_IDS:
+                    rows = [self._id_to_row[i] for i in args[0].tolist() if i in self._id_to_row]
+                    if rows:
+                        self._delete_rows(rows)
+                count += 1
+        finally:
+            self._replaying = False
+        return count
 
-        # 4. Đọc lại metadata từ file (image_ids, image_paths, class_ids, embeddings)
-        meta = np.load(self.meta_path, allow_pickle=True)
-        self.image_ids = list(meta['image_ids']) if 'image_ids' in meta else []
-        self.image_paths = list(meta['image_paths']) if 'image_paths' in meta else []
-        self.class_ids = list(meta['class_ids']) if 'class_ids' in meta else []
+    def _remove_rows(self, rows):
+        """
+        Xóa các dòng chỉ định khỏi ma trận embedding và metadata.
+        Các dòng còn sống ở cuối ma trận được dời vào lỗ trống (swap-remove), nên chi phí
+        tỉ lệ với số dòng bị xóa chứ không phải kích thước gallery. Cập nhật luôn các bảng tra cứu.
+        """
+        rows = np.unique(np.asarray(rows, dtype=np.int64))
+        new_size = self._size - rows.size
+        # Lỗ trống nằm trong vùng giữ lại, và các dòng còn sống nằm ở phần đuôi cần dời vào
+        holes = rows[rows < new_size]
+        tail = np.arange(new_size, self._size)
+        movers = tail[~np.isin(tail, rows)]
+        for image_id in self._image_ids[rows].tolist():
+            del self._id_to_row[image_id]
+        if self._path_to_row is not None:
+            for row in rows.tolist():
+                self._forget_path(self.image_paths[row], row)
+            for hole, mover in zip(holes.tolist(), movers.tolist()):
+                path = self.image_paths[mover]
+                self._forget_path(path, mover)
+                self._index_path(path, hole)
+        if self._class_to_rows is not None:
+            self._move_class_rows(rows, holes, movers)
+        if holes.size:
+            self._embeddings[holes] = self._embeddings[movers]
+            self._image_ids[holes] = self._image_ids[movers]
+            self._class_ids[holes] = self._class_ids[movers]
+            for hole, mover in zip(holes.tolist(), movers.tolist()):
+                self.image_paths[hole] = self.image_paths.ref(mover)
+                self._id_to_row[int(self._image_ids[hole])] = hole
+        del self.image_paths[new_size:]
+        self._size = new_size
 
-        # 5. Kiểm tra embeddings: nếu tồn tại và đủ số lượng thì dùng luôn, ngược lại reconstruct lại từ index
-        if 'embeddings' in meta and meta['embeddings'].shape[0] == len(self.image_ids):
-            self.embeddings = meta['embeddings'].tolist()
+    def _move_class_rows(self, rows, holes, movers):
+        """Cập nhật class_id -> dòng khi xóa `rows` và dời `movers` vào `holes` (chỉ duyệt các class bị ảnh hưởng)."""
+        dropped = {}
+        for class_id, row in zip(self._class_ids[rows].tolist(), rows.tolist()):
+            dropped.setdefault(class_id, set()).add(row)
+        moved = {}
+        for class_id, hole, mover in zip(self._class_ids[movers].tolist(), holes.tolist(), movers.tolist()):
+            dropped.setdefault(class_id, set()).add(mover)
+            moved.setdefault(class_id, []).append(hole)
+        for class_id, gone in dropped.items():
+            kept = [row for row in self._class_to_rows.get(class_id, ()) if row not in gone]
+            if class_id in moved:
+                kept = sorted(kept + moved[class_id])
+            if kept:
+                self._class_to_rows[class_id] = kept
+            else:
+                self._class_to_rows.pop(class_id, None)
+
+    def _remove_ids_from_index(self, ids):
+        """Xóa vector khỏi FAISS index theo image_id, không rebuild."""
+        ids = np.ascontiguousarray(ids, dtype=np.int64)
+        return self.index.remove_ids(backends.id_selector(self._active_index_type, ids))
+
+    def _rebuild_index(self):
+        """
+        Dựng lại FAISS index từ ma trận embedding (không qua list Python).
+        Loại index được chọn lại theo kích thước gallery; IVF/PQ được train trên mẫu lấy từ ma trận.
+        """
+        index = self._new_index(self._size)
+        if self._size > 0:
+            backends.train_index(index, self.embeddings, self.index_params)
+            index.add_with_ids(self.embeddings, self.image_ids)
+        self.index = index
+        self._index_mmapped = False
+
+    def _ensure_index_type(self):
+        """Dựng lại index nếu loại index phù hợp với kích thước gallery hiện tại đã thay đổi (vd. vượt ngưỡng auto)."""
+        desired = backends.resolve_index_type(self.index_type, self._size, self.index_params)
+        if desired != self._active_index_type:
+            print(f'Chuyển FAISS index từ {self._active_index_type} sang {desired} ({self._size} vector)...')
+            self._rebuild_index()
+
+    def rebuild_index(self, index_type=None):
+        """Dựng lại index, có thể đổi loại index (vd. để benchmark hoặc sau khi gallery tăng mạnh)."""
+        if index_type is not None:
+            self.index_type = index_type
+        self._rebuild_index()
+
+    def _delete_rows(self, rows):
+        """Xóa các dòng khỏi metadata và khỏi index (remove_ids, hoặc dựng lại với HNSW)."""
+        ids = self._image_ids[np.asarray(rows, dtype=np.int64)].copy()
+        self._make_writable()
+        if self._logging:
+            self.wal.append_delete_ids(ids)
+        self._remove_rows(rows)
+        if backends.supports_remove(self._active_index_type):
+            self._remove_ids_from_index(ids)
         else:
-            print('Embeddings bị thiếu hoặc không khớp, reconstruct lại từ FAISS index...')
-            self.embeddings = []
-            for i in range(len(self.image_ids)):
-                self.embeddings.append(self.index.reconstruct(i).tolist())
-
-        # 6. Lưu lại mtime để lần sau kiểm tra
-        self._last_index_mtime = index_mtime
-        self._last_meta_mtime = meta_mtime
-        print(f'LOAD: số lượng embeddings : {len(self.embeddings)}')
+            self._rebuild_index()
+
+    def get_row(self, image_id):
+        """Trả về vị trí dòng của image_id trong ma trận embedding, None nếu không tồn tại."""
+        image_id_int = self._to_int64(image_id)
+        return self._id_to_row.get(image_id_int) if image_id_int is not None else None
+
+    def get_row_by_path(self, image_path):
+        """Vị trí dòng có image_path chỉ định, None nếu không tồn tại."""
+        return self._path_lookup().get(str(image_path))
+
+    def get_rows_by_class(self, class_id):
+        """Các dòng (int64, tăng dần) có class_id chỉ định, mảng rỗng nếu không có."""
+        class_id_int = self._to_int64(class_id)
+        rows = self._class_lookup().get(class_id_int, ()) if class_id_int is not None else ()
+        return np.asarray(rows, dtype=np.int64)
+
+    def has_class_id(self, class_id):
+        class_id_int = self._to_int64(class_id)
+        return class_id_int is not None and class_id_int in self._class_lookup()
+
+    def get_class_id(self, image_id):
+        """class_id của image_id, None nếu image_id không tồn tại."""
+        idx = self.get_row(image_id)
+        return int(self._class_ids[idx]) if idx is not None else None
+
+    @_shared_write
+    def update_embedding(self, image_id, embedding):
+        """
+        Thay thế embedding của một image_id tại chỗ: remove_ids + add_with_ids theo image_id,
+        ghi đè đúng một dòng trong ma trận. Chi phí O(d), không rebuild index (trừ HNSW).
+        Trả về False nếu image_id không tồn tại.
+        """
+        idx = self.get_row(image_id)
+        if idx is None:
+            print(f'image_id {image_id} không tồn tại!')
+            return False
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(1, self.embedding_size)
+        self._make_writable()
+        row = self._embeddings[idx:idx + 1]
+        np.divide(embedding, np.linalg.norm(embedding, axis=1, keepdims=True), out=row)
+        ids = self._image_ids[idx:idx + 1].copy()
+        if self._logging:
+            self.wal.append_update_embedding(ids[0], row[0])
+        if backends.supports_remove(self._active_index_type):
+            self._remove_ids_from_index(ids)
+            self.index.add_with_ids(row, ids)
+        else:
+            self._rebuild_index()
+        return True
+
+    @_shared_write
+    def update_image_path(self, image_id, image_path):
+        """Cập nhật image_path của một image_id, trả về False nếu image_id không tồn tại."""
+        idx = self.get_row(image_id)
+        if idx is None:
+            return False
+        if self._path_to_row is not None:
+            self._forget_path(self.image_paths[idx], idx)
+            self._index_path(str(image_path), idx)
+        self.image_paths[idx] = str(image_path)
+        if self._logging:
+            self.wal.append_update_path(self._image_ids[idx], image_path)
+        return True
+
+    @_shared_write
     def delete_by_image_id(self, image_id):
-        image_id = str(image_id)
-        if image_id not in [str(i) for i in self.image_ids]:
+        idx = self.get_row(image_id)
+        if idx is None:
             print(f'image_id {image_id} không tồn tại!')
             return False
-        idx = [str(i) for i in self.image_ids].index(str(image_id))
-        print(f"image_ids: {self.image_ids[:10]}")
-        print(f"idx: {idx}, len(image_ids): {len(self.image_ids)}, len(image_paths): {len(self.image_paths)}, len(class_ids): {len(self.class_ids)}, len(embeddings): {len(self.embeddings)}")
-        del self.image_ids[idx]
-        del self.image_paths[idx]
-        del self.class_ids[idx]
-        del self.embeddings[idx]
-        self.index = faiss.IndexFlatIP(self.embedding_size)
-        if len(self.embeddings) > 0:
-            self.index.add(np.array(self.embeddings, dtype=np.float32))
-        print(f'Đã xóa vector với image_id={image_id} tại vị trí {idx} và rebuild index.')
+        self._delete_rows([idx])
+        print(f'Đã xóa vector với image_id={image_id} tại vị trí {idx}.')
         return True
 
+    @_shared_write
     def delete_by_class_id(self, class_id):
         """
-        Xóa toàn bộ ảnh có class_id chỉ định và rebuild lại FAISS index
+        Xóa toàn bộ ảnh có class_id chỉ định bằng remove_ids (không rebuild FAISS index)
         """
-        class_id = str(class_id)
         # Lấy các chỉ số cần xóa
-        idxs_to_delete = [i for i, cls in enumerate(self.class_ids) if str(cls) == class_id]
-        if not idxs_to_delete:
+        idxs_to_delete = self.get_rows_by_class(class_id)
+        if len(idxs_to_delete) == 0:
             print(f'class_id {class_id} không tồn tại!')
             return False
         print(f'Số lượng ảnh sẽ xóa: {len(idxs_to_delete)}')
-        # Xóa các phần tử metadata tại các vị trí index
-        self.image_ids = [img_id for i, img_id in enumerate(self.image_ids) if i not in idxs_to_delete]
-        self.image_paths = [img_path for i, img_path in enumerate(self.image_paths) if i not in idxs_to_delete]
-        self.class_ids = [cls for i, cls in enumerate(self.class_ids) if i not in idxs_to_delete]
-        self.embeddings = [emb for i, emb in enumerate(self.embeddings) if i not in idxs_to_delete]
-        # Rebuild lại FAISS index từ embeddings còn lại
-        self.index = faiss.IndexFlatIP(self.embedding_size)
-        if len(self.embeddings) > 0:
-            self.index.add(np.array(self.embeddings, dtype=np.float32))
-        print(f'Đã xóa toàn bộ ảnh với class_id={class_id} và rebuild index.')
+        # Xóa vector khỏi index theo image_id và xóa metadata tại các vị trí tương ứng
+        self._delete_rows(idxs_to_delete)
+        print(f'Đã xóa toàn bộ ảnh với class_id={class_id}.')
         return True
     def query(self, query_emb, topk=5):
         import time
@@ -184,51 +837,79 @@ class FaissIndexManager:
         D, I = self.index.search(query_emb_norm.reshape(1, -1).astype(np.float32), topk)
         print(f'Thời gian search FAISS: {time.time() - start:.3f}s')
         results = []
-        for idx, dist in zip(I[0], D[0]):
-            if idx >= 0 and idx < len(self.image_ids):
+        # Index trả về image_id, ánh xạ sang dòng metadata qua dict
+        for image_id, dist in zip(I[0], D[0]):
+            idx = self._id_to_row.get(int(image_id)) if image_id >= 0 else None
+            if idx is not None:
                 results.append({
-                    'image_id': self.image_ids[idx],
+                    'image_id': self._image_ids[idx],
                     'image_path': self.image_paths[idx],
-                    'class_id': self.class_ids[idx],
+                    'class_id': self._class_ids[idx],
                     'score': dist,
                     'faiss_index': idx
                 })
         print(f'Kết quả truy vấn: {results}')
         return results
 
+    def query_batch(self, query_embs, topk=5):
+        """
+        Truy vấn nhiều embedding trong MỘT lần index.search trên ma trận (N, d).
+        Trả về list (theo thứ tự query) các list kết quả giống query().
+        """
+        query_embs = np.asarray(query_embs, dtype=np.float32).reshape(-1, self.embedding_size)
+        if query_embs.shape[0] == 0:
+            return []
+        query_norm = query_embs / np.linalg.norm(query_embs, axis=1, keepdims=True)
+        D, I = self.index.search(np.ascontiguousarray(query_norm), topk)
+        batch_results = []
+        for ids, dists in zip(I, D):
+            results = []
+            for image_id, dist in zip(ids, dists):
+                idx = self._id_to_row.get(int(image_id)) if image_id >= 0 else None
+                if idx is not None:
+                    results.append({
+                        'image_id': int(self._image_ids[idx]),
+                        'image_path': self.image_paths[idx],
+                        'class_id': int(self._class_ids[idx]),
+                        'score': float(dist),
+                        'faiss_index': idx
+                    })
+            batch_results.append(results)
+        return batch_results
+
     def print_example_vectors(self, n=5):
         print('Ví dụ một số vector trong FAISS index:')
-        for i in range(min(n, len(self.image_paths))):
-            vec = self.index.reconstruct(i)
-            image_id = self.image_ids[i] if i < len(self.image_ids) else None
+        for i in range(min(n, self._size)):
+            vec = self._embeddings[i]
+            image_id = self._image_ids[i]
             image_path = self.image_paths[i]
-            class_id = self.class_ids[i]
-            norm = np.linalg.norm(vec)
+            class_id = self._class_ids[i]
             print(f'Vector {i}:')
             print(f'  image_id: {image_id}')
             print(f'  image_path: {image_path}')
             print(f'  class_id: {class_id}')
-            # print(f'  norm: {norm:.4f}')
             print(f'  values[:10]: {vec[:10]} ...')
     def check_index_data(self):
         result = {
+            'index_type': self._active_index_type,
+            'configured_index_type': self.index_type,
             'num_vectors': self.index.ntotal,
-            'num_image_ids': len(self.image_ids),
+            'num_image_ids': int(self.image_ids.size),
             'num_image_paths': len(self.image_paths),
-            'num_class_ids': len(self.class_ids),
-            'num_embeddings': len(self.embeddings),
-            'num_unique_image_ids': len(set(self.image_ids)),
+            'num_class_ids': int(self.class_ids.size),
+            'num_embeddings': self._size,
+            'num_unique_image_ids': int(np.unique(self.image_ids).size),
             'num_unique_image_paths': len(set(self.image_paths)),
-            'num_unique_class_ids': len(set(self.class_ids)),
+            'num_unique_class_ids': int(np.unique(self.class_ids).size),
+            'embedding_capacity': self.capacity,
+            'embedding_bytes': int(self.embeddings.nbytes),
         }
-        # Kiểm tra vector NaN và min/max
-        if self.index.ntotal > 0:
-            vecs = np.zeros((self.index.ntotal, self.embedding_size), dtype=np.float32)
-            for i in range(self.index.ntotal):
-                vecs[i] = self.index.reconstruct(i)
+        # Kiểm tra vector NaN và min/max trực tiếp trên ma trận embedding
+        if self._size > 0:
+            vecs = self.embeddings
             result['num_nan_vectors'] = int(np.isnan(vecs).any(axis=1).sum())
-            result['min_vector_value'] = float(vecs.min())
-            result['max_vector_value'] = float(vecs.max())
+            result['min_vector_value'] = float(np.nanmin(vecs))
+            result['max_vector_value'] = float(np.nanmax(vecs))
         else:
             result['num_nan_vectors'] = 0
             result['min_vector_value'] = None
@@ -238,8 +919,5 @@ class FaissIndexManager:
         """
         Trả về danh sách image_id có class trùng với class_id được truy vấn
         """
-        class_id = str(class_id)
-        return [str(img_id) for img_id, cls in zip(self.image_ids, self.class_ids) if str(cls) == class_id]
+        return [str(img_id) for img_id in self._image_ids[self.get_rows_by_class(class_id)].tolist()]
 ## Module only: import and use FaissIndexManager from another file
-
-
@@ -0,0 +1,33 @@
+import mmap
+import os
+import struct
+
+COUNTER = struct.Struct('<Q')
+
+
+class GenerationCounter:
+    """
+    Số generation snapshot mới nhất, dùng chung giữa các process (uvicorn worker) qua một file 8 byte được mmap.
+    Đọc `value` chỉ là một lần đọc bộ nhớ, nên mỗi request có thể kiểm tra xem có snapshot mới để load lại không.
+    Chỉ ghi (publish) khi đang giữ khóa ghi snapshot.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(path) or os.path.getsize(path) < COUNTER.size:
+            with open(path, 'ab') as f:
+                f.write(b'\0' * (COUNTER.size - f.tell()))
+        self._file = open(path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), COUNTER.size)
+
+    @property
+    def value(self):
+        return COUNTER.unpack_from(self._map)[0]
+
+    def publish(self, generation):
+        if generation > self.value:
+            COUNTER.pack_into(self._map, 0, generation)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
@@ -0,0 +1,332 @@
+import json
+import os
+import shutil
+
+import numpy as np
+
+
+# Định dạng metadata dạng cột (thư mục), không dùng pickle:
+#   format.json                 {"format": FORMAT_NAME, "version": FORMAT_VERSION, "rows": N, "wal_seq": ...}
+#   image_ids.npy, class_ids.npy    int64 (N,)
+#   image_paths.offsets.npy     int64 (N + 1,), chuỗi thứ i là heap[offsets[i]:offsets[i + 1]] (utf-8)
+#   image_paths.heap            bytes utf-8 nối liền
+#   embeddings.npy              float32 (N, d), tùy chọn
+FORMAT_NAME = 'faiss-meta-columnar'
+FORMAT_VERSION = 1
+FORMAT_FILE = 'format.json'
+
+
+class StringColumn:
+    """
+    Cột chuỗi (image_paths) trên heap offsets + bytes, đọc lazy từ mmap, không tạo object Python cho từng dòng.
+    Hỗ trợ các thao tác FaissIndexManager cần như một list: len, [i], [i] = v, extend, del [n:], in, iter.
+    - Dòng logic i trỏ tới slot _slots[i]: slot < base_rows là chuỗi trong heap gốc, còn lại là chuỗi mới trong _extra.
+    - Chưa thay đổi thì không cấp phát _slots (dòng i chính là slot i), bộ nhớ không phụ thuộc số dòng.
+    """
+
+    def __init__(self, offsets=None, heap=None):
+        self._offsets = offsets if offsets is not None else np.zeros(1, dtype=np.int64)
+        self._heap = heap if heap is not None else np.empty(0, dtype=np.uint8)
+        self._base_rows = self._offsets.shape[0] - 1
+        self._len = self._base_rows
+        self._slots = None
+        self._extra = []
+
+    @classmethod
+    def from_strings(cls, strings):
+        column = cls()
+        column.extend(strings)
+        return column
+
+    def __len__(self):
+        return self._len
+
+    def _slot(self, row):
+        return row if self._slots is None else int(self._slots[row])
+
+    def _decode(self, slot):
+        if slot >= self._base_rows:
+            return self._extra[slot - self._base_rows]
+        return bytes(self._heap[self._offsets[slot]:self._offsets[slot + 1]]).decode('utf-8')
+
+    def _row_index(self, row):
+        row = int(row)
+        if row < 0:
+            row += self._len
+        if not 0 <= row < self._len:
+            raise IndexError('StringColumn index out of range')
+        return row
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self._decode(self._slot(i)) for i in range(*row.indices(self._len))]
+        return self._decode(self._slot(self._row_index(row)))
+
+    def _materialize_slots(self, capacity):
+        """Cấp phát bảng dòng -> slot (lần thay đổi đầu tiên) hoặc tăng gấp đôi khi đầy."""
+        if self._slots is None:
+            slots = np.empty(max(capacity, 16), dtype=np.int64)
+            slots[:self._len] = np.arange(self._len)
+            self._slots = slots
+        elif capacity > self._slots.shape[0]:
+            slots = np.empty(max(capacity, 2 * self._slots.shape[0]), dtype=np.int64)
+            slots[:self._len] = self._slots[:self._len]
+            self._slots = slots
+
+    def __setitem__(self, row, value):
+        row = self._row_index(row)
+        # Gán lại chuỗi đã có (swap-remove dời dòng): chỉ trỏ slot, không copy chuỗi
+        if isinstance(value, _SlotRef):
+            self._materialize_slots(self._len)
+            self._slots[row] = value.slot
+            return
+        self._materialize_slots(self._len)
+        self._extra.append(str(value))
+        self._slots[row] = self._base_rows + len(self._extra) - 1
+
+    def ref(self, row):
+        """Tham chiếu tới chuỗi của một dòng để gán sang dòng khác mà không decode."""
+        return _SlotRef(self._slot(self._row_index(row)))
+
+    def append(self, value):
+        self.extend([value])
+
+    def extend(self, values):
+        values = [str(v) for v in values]
+        if not values:
+            return
+        new_len = self._len + len(values)
+        self._materialize_slots(new_len)
+        first = self._base_rows + len(self._extra)
+        self._extra.extend(values)
+        self._slots[self._len:new_len] = np.arange(first, first + len(values))
+        self._len = new_len
+
+    def __delitem__(self, key):
+        """Chỉ hỗ trợ cắt phần đuôi: del column[n:]."""
+        if not isinstance(key, slice) or key.stop is not None or key.step not in (None, 1):
+            raise TypeError('StringColumn chỉ hỗ trợ del column[n:]')
+        start = key.start or 0
+        if start < 0:
+            start += self._len
+        start = max(0, min(start, self._len))
+        if self._slots is None and start < self._len:
+            self._materialize_slots(self._len)
+        self._len = start
+
+    def __iter__(self):
+        for row in range(self._len):
+            yield self._decode(self._slot(row))
+
+    def tolist(self):
+        return list(self)
+
+    def _row_slots(self):
+        return np.arange(self._len) if self._slots is None else self._slots[:self._len]
+
+    def find(self, value):
+        """Dòng đầu tiên có chuỗi bằng value, -1 nếu không có. So khớp vectorized trên heap."""
+        target = np.frombuffer(str(value).encode('utf-8'), dtype=np.uint8)
+        slots = self._row_slots()
+        in_base = slots < self._base_rows
+        base_rows = np.flatnonzero(in_base)
+        base_slots = slots[base_rows]
+        starts = self._offsets[base_slots]
+        lengths = self._offsets[base_slots + 1] - starts
+        candidates = np.flatnonzero(lengths == target.size)
+        hits = []
+        # So khớp theo từng khối để giới hạn bộ nhớ tạm
+        for chunk in range(0, candidates.size, 65536):
+            part = candidates[chunk:chunk + 65536]
+            if target.size == 0:
+                hits.append(base_rows[part])
+                break
+            window = self._heap[starts[part, None] + np.arange(target.size)]
+            matched = part[(window == target).all(axis=1)]
+            if matched.size:
+                hits.append(base_rows[matched])
+                break
+        first = int(hits[0][0]) if hits and hits[0].size else -1
+        for row in np.flatnonzero(~in_base).tolist():
+            if first != -1 and row > first:
+                break
+            if self._extra[int(slots[row]) - self._base_rows] == value:
+                return row
+        return first
+
+    def __contains__(self, value):
+        return self.find(value) != -1
+
+    def copy(self):
+        """Bản sao bất biến của các dòng hiện tại (heap mới, không còn overlay), dùng cho snapshot."""
+        return StringColumn(*self.to_arrays())
+
+    def to_arrays(self):
+        """Trả về (offsets int64 (N + 1,), heap uint8) của các dòng hiện tại, gom vectorized từ heap gốc."""
+        slots = self._row_slots()
+        in_base = slots < self._base_rows
+        lengths = np.empty(self._len, dtype=np.int64)
+        base_slots = slots[in_base]
+        lengths[in_base] = self._offsets[base_slots + 1] - self._offsets[base_slots]
+        extra_rows = np.flatnonzero(~in_base)
+        extra_bytes = [self._extra[int(slots[row]) - self._base_rows].encode('utf-8') for row in extra_rows.tolist()]
+        lengths[extra_rows] = [len(b) for b in extra_bytes]
+        offsets = np.zeros(self._len + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        heap = np.empty(int(offsets[-1]), dtype=np.uint8)
+        # Chuỗi từ heap gốc: gom tất cả byte bằng một lần fancy-indexing
+        base_rows = np.flatnonzero(in_base)
+        if base_rows.size:
+            base_lengths = lengths[base_rows]
+            total = int(base_lengths.sum())
+            if total:
+                src_starts = self._offsets[base_slots]
+                dst_starts = offsets[base_rows]
+                shift = np.repeat(src_starts - dst_starts, base_lengths)
+                dst = np.repeat(dst_starts, base_lengths) + _ranges(base_lengths)
+                heap[dst] = self._heap[dst + shift]
+        for row, data in zip(extra_rows.tolist(), extra_bytes):
+            heap[offsets[row]:offsets[row + 1]] = np.frombuffer(data, dtype=np.uint8)
+        return offsets, heap
+
+
+class _SlotRef:
+    __slots__ = ('slot',)
+
+    def __init__(self, slot):
+        self.slot = slot
+
+
+def _ranges(lengths):
+    """Nối các dãy arange(l) cho từng l trong lengths, vectorized."""
+    total = int(lengths.sum())
+    ends = np.cumsum(lengths)
+    return np.arange(total) - np.repeat(ends - lengths, lengths)
+
+
+def is_columnar(path):
+    return os.path.isfile(os.path.join(path, FORMAT_FILE))
+
+
+def _load_npy(path, mmap):
+    return np.load(path, mmap_mode='r' if mmap else None, allow_pickle=False)
+
+
+def read_columnar(path, mmap=True):
+    """
+    Đọc metadata dạng cột: các cột int64 và heap chuỗi được mmap (không copy, không pickle).
+    Trả về dict image_ids, class_ids, image_paths (StringColumn), embeddings (hoặc None), wal_seq.
+    """
+    with open(os.path.join(path, FORMAT_FILE), encoding='utf-8') as f:
+        header = json.load(f)
+    if header.get('format') != FORMAT_NAME or header.get('version', 0) > FORMAT_VERSION:
+        raise ValueError(f'Metadata {path}: định dạng không hỗ trợ {header}')
+    heap_path = os.path.join(path, 'image_paths.heap')
+    if os.path.getsize(heap_path) > 0:
+        heap = np.memmap(heap_path, dtype=np.uint8, mode='r') if mmap else np.fromfile(heap_path, dtype=np.uint8)
+    else:
+        heap = np.empty(0, dtype=np.uint8)
+    embeddings_path = os.path.join(path, 'embeddings.npy')
+    return {
+        'image_ids': _load_npy(os.path.join(path, 'image_ids.npy'), mmap),
+        'class_ids': _load_npy(os.path.join(path, 'class_ids.npy'), mmap),
+        'image_paths': StringColumn(_load_npy(os.path.join(path, 'image_paths.offsets.npy'), mmap), heap),
+        'embeddings': _load_npy(embeddings_path, mmap) if os.path.exists(embeddings_path) else None,
+        'wal_seq': int(header.get('wal_seq', 0))
+    }
+
+
+def read_npz(path):
+    """Đọc metadata .npz cũ (cần allow_pickle vì image_paths có thể là mảng object)."""
+    meta = np.load(path, allow_pickle=True)
+    return {
+        'image_ids': meta['image_ids'].astype(np.int64) if 'image_ids' in meta else np.empty(0, dtype=np.int64),
+        'class_ids': meta['class_ids'].astype(np.int64) if 'class_ids' in meta else np.empty(0, dtype=np.int64),
+        'image_paths': StringColumn.from_strings(str(p) for p in meta['image_paths']) if 'image_paths' in meta else StringColumn(),
+        'embeddings': meta['embeddings'] if 'embeddings' in meta else None,
+        'wal_seq': int(meta['wal_seq']) if 'wal_seq' in meta else 0
+    }
+
+
+def read_metadata(path, mmap=True):
+    """Đọc metadata, tự nhận dạng thư mục dạng cột hoặc file .npz cũ."""
+    if is_columnar(path):
+        return read_columnar(path, mmap)
+    if os.path.isfile(path):
+        return read_npz(path)
+    # Chưa migrate: file .npz cũ cùng tên, lần ghi snapshot tiếp theo sẽ chuyển sang dạng cột
+    if os.path.isfile(path + '.npz'):
+        print(f'⚠️ Metadata {path} chưa có, đọc tạm {path}.npz (chạy migrate_faiss_metadata.py để chuyển đổi)')
+        return read_npz(path + '.npz')
+    # Lần ghi trước bị ngắt giữa lúc đổi thư mục: bản cũ vẫn còn ở <path>.old
+    if is_columnar(path + '.old'):
+        return read_columnar(path + '.old', mmap)
+    raise FileNotFoundError(f'Không tìm thấy metadata: {path}')
+
+
+def _write_array(path, array):
+    with open(path, 'wb') as f:
+        np.save(f, array, allow_pickle=False)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def write_columnar_files(path, image_ids, class_ids, image_paths, wal_seq=0, embeddings=None):
+    """Ghi các file cột vào thư mục path (đã tồn tại, rỗng)."""
+    if not isinstance(image_paths, StringColumn):
+        image_paths = StringColumn.from_strings(image_paths)
+    offsets, heap = image_paths.to_arrays()
+    _write_array(os.path.join(path, 'image_ids.npy'), np.ascontiguousarray(image_ids, dtype=np.int64))
+    _write_array(os.path.join(path, 'class_ids.npy'), np.ascontiguousarray(class_ids, dtype=np.int64))
+    _write_array(os.path.join(path, 'image_paths.offsets.npy'), offsets)
+    with open(os.path.join(path, 'image_paths.heap'), 'wb') as f:
+        f.write(heap.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    if embeddings is not None:
+        _write_array(os.path.join(path, 'embeddings.npy'), np.ascontiguousarray(embeddings, dtype=np.float32))
+    header = {'format': FORMAT_NAME, 'version': FORMAT_VERSION, 'rows': int(offsets.shape[0] - 1), 'wal_seq': int(wal_seq)}
+    # format.json ghi cuối: thư mục chỉ được coi là hoàn chỉnh khi có file này
+    with open(os.path.join(path, FORMAT_FILE), 'w', encoding='utf-8') as f:
+        json.dump(header, f)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def stage_metadata(path, image_ids, class_ids, image_paths, wal_seq=0, embeddings=None):
+    """
+    Ghi metadata ra bản tạm cạnh path (chưa thay thế bản đang dùng), trả về đường dẫn bản tạm.
+    Đường dẫn .npz giữ định dạng cũ, còn lại ghi thư mục dạng cột.
+    """
+    tmp = path + '.tmp'
+    if not path.endswith('.npz'):
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        write_columnar_files(tmp, image_ids, class_ids, image_paths, wal_seq, embeddings)
+        return tmp
+    if isinstance(image_paths, StringColumn):
+        image_paths = image_paths.tolist()
+    columns = {'embeddings': embeddings} if embeddings is not None else {}
+    with open(tmp, 'wb') as f:
+        np.savez(f, image_ids=image_ids, image_paths=np.array(image_paths, dtype=str),
+                 class_ids=class_ids, wal_seq=np.int64(wal_seq), **columns)
+        f.flush()
+        os.fsync(f.fileno())
+    return tmp
+
+
+def publish_metadata(path, tmp):
+    """Thay bản đang dùng bằng bản tạm. Thư mục không ghi đè được bằng rename nên bản cũ được dời sang <path>.old trước."""
+    if not os.path.isdir(tmp):
+        os.replace(tmp, path)
+        return
+    old = path + '.old'
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old)
+    os.replace(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def write_metadata(path, image_ids, class_ids, image_paths, wal_seq=0, embeddings=None):
+    publish_metadata(path, stage_metadata(path, image_ids, class_ids, image_paths, wal_seq, embeddings))
@@ -0,0 +1,119 @@
+import threading
+import time
+
+
+class PersistenceWorker:
+    """
+    Thread nền ghi bền các thay đổi của FaissIndexManager, để request thay đổi chỉ tốn thời gian trong RAM.
+    - notify(): đánh dấu có thay đổi (gọi từ FaissIndexManager.commit(), đang giữ lock ghi).
+    - Các thông báo được gộp: worker ghi khi thay đổi đầu tiên chờ quá `interval` giây hoặc có `max_dirty` thay đổi.
+    - Mỗi lần ghi gọi manager.persist_pending(lock): fsync log (không cần lock), snapshot được chụp trong lock
+      (copy trong RAM) rồi ghi đĩa ngoài lock.
+    - flush(): ghi ngay và chờ xong (cho test, reset và lúc tắt ứng dụng).
+    """
+
+    def __init__(self, manager, lock, interval=0.5, max_dirty=256):
+        self.manager = manager
+        self.lock = lock
+        self.interval = interval
+        self.max_dirty = max_dirty
+        self.flushes = 0
+        self.coalesced = 0
+        self.last_flush_ms = 0.0
+        self.last_error = None
+        self._dirty = 0
+        self._dirty_since = None
+        self._requested = 0
+        self._completed = 0
+        self._stopping = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='faiss-persistence', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def notify(self, count=1):
+        with self._cond:
+            first = self._dirty_since is None
+            if first:
+                self._dirty_since = time.monotonic()
+            self._dirty += count
+            # Thay đổi đầu tiên: đánh thức worker để bắt đầu đếm interval; đủ max_dirty: ghi ngay
+            if first or self._dirty >= self.max_dirty:
+                self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Yêu cầu ghi ngay các thay đổi đang chờ và chờ tới khi xong. Trả về False nếu hết timeout."""
+        if not self._thread.is_alive():
+            self.manager.persist_pending(self.lock)
+            return True
+        with self._cond:
+            self._requested += 1
+            target = self._requested
+            self._cond.notify_all()
+            done = self._cond.wait_for(lambda: self._completed >= target, timeout)
+        return done and self.last_error is None
+
+    def stop(self, timeout=None):
+        """Ghi nốt thay đổi rồi dừng thread."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _wait_for_work(self):
+        """Chờ tới khi cần ghi. Trả về (số thay đổi được gộp, flush request đã phục vụ) hoặc None khi dừng."""
+        with self._cond:
+            while True:
+                if self._requested > self._completed or (self._stopping and self._dirty):
+                    break
+                if self._stopping:
+                    return None
+                if self._dirty:
+                    remaining = self._dirty_since + self.interval - time.monotonic()
+                    if remaining <= 0 or self._dirty >= self.max_dirty:
+                        break
+                    self._cond.wait(remaining)
+                else:
+                    self._cond.wait()
+            dirty, target = self._dirty, self._requested
+            self._dirty = 0
+            self._dirty_since = None
+            return dirty, target
+
+    def _run(self):
+        while True:
+            work = self._wait_for_work()
+            if work is None:
+                return
+            dirty, target = work
+            start = time.perf_counter()
+            try:
+                self.manager.persist_pending(self.lock, dirty)
+                self.last_error = None
+            except Exception as e:
+                # Giữ lại trạng thái dirty để lần sau ghi lại (trừ khi đang dừng)
+                print(f'❌ Lỗi ghi FAISS nền: {e}')
+                self.last_error = str(e)
+                if not self._stopping:
+                    self.notify(max(dirty, 1))
+            self.last_flush_ms = (time.perf_counter() - start) * 1000
+            with self._cond:
+                self.flushes += 1
+                self.coalesced += dirty
+                self._completed = max(self._completed, target)
+                self._cond.notify_all()
+
+    def get_stats(self):
+        with self._cond:
+            return {
+                'interval_s': self.interval,
+                'max_dirty': self.max_dirty,
+                'pending_changes': self._dirty,
+                'flushes': self.flushes,
+                'changes_persisted': self.coalesced,
+                'last_flush_ms': round(self.last_flush_ms, 2),
+                'last_error': self.last_error
+            }
@@ -0,0 +1,404 @@
+import bisect
+import contextlib
+import heapq
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from index.faiss import FaissIndexManager
+
+
+def shard_path(path, shard):
+    """Đường dẫn riêng của shard: index/faiss_db.index -> index/faiss_db.shard01.index (thư mục: thêm hậu tố)."""
+    if not path:
+        return path
+    root, ext = os.path.splitext(path.rstrip('/\\'))
+    return f'{root}.shard{shard:02d}{ext}'
+
+
+def create_faiss_manager(num_shards=1, **kwargs):
+    """FaissIndexManager khi num_shards <= 1, ngược lại ShardedFaissIndexManager với cùng tham số cho từng shard."""
+    if num_shards <= 1:
+        return FaissIndexManager(**kwargs)
+    return ShardedFaissIndexManager(num_shards=num_shards, **kwargs)
+
+
+class _ShardedColumn:
+    """View chỉ đọc nối cột image_paths của các shard theo thứ tự dòng toàn cục (không copy)."""
+
+    def __init__(self, manager):
+        self._manager = manager
+
+    def __len__(self):
+        return len(self._manager)
+
+    def __getitem__(self, row):
+        shard, local = self._manager._locate(row)
+        return shard.image_paths[local]
+
+    def __iter__(self):
+        for shard in self._manager.shards:
+            yield from shard.image_paths
+
+    def __contains__(self, path):
+        return self._manager.get_row_by_path(path) is not None
+
+    def tolist(self):
+        return list(self)
+
+
+class _ShardedIndex:
+    """Các thuộc tính của FAISS index mà code chẩn đoán dùng (ntotal, reconstruct theo image_id)."""
+
+    def __init__(self, manager):
+        self._manager = manager
+
+    @property
+    def ntotal(self):
+        return sum(shard.index.ntotal for shard in self._manager.shards)
+
+    def reconstruct(self, image_id):
+        shard = self._manager._shard_of_image(image_id)
+        if shard is None:
+            raise KeyError(f'image_id {image_id} không tồn tại')
+        return shard.index.reconstruct(int(image_id))
+
+
+class _ShardedPersistence:
+    """Gom persistence worker của các shard để shutdown/thống kê như một worker."""
+
+    def __init__(self, workers):
+        self.workers = workers
+
+    def notify(self, count=1):
+        for worker in self.workers:
+            worker.notify(count)
+
+    def flush(self, timeout=None):
+        return all([worker.flush(timeout) for worker in self.workers])
+
+    def stop(self, timeout=None):
+        for worker in self.workers:
+            worker.stop(timeout)
+
+    def get_stats(self):
+        shards = [worker.get_stats() for worker in self.workers]
+        return {
+            'pending_changes': sum(s['pending_changes'] for s in shards),
+            'flushes': sum(s['flushes'] for s in shards),
+            'changes_persisted': sum(s['changes_persisted'] for s in shards),
+            'shards': shards
+        }
+
+
+class ShardedFaissIndexManager:
+    """
+    FAISS index chia thành num_shards FaissIndexManager độc lập theo class_id (shard = class_id % num_shards):
+    - Mỗi shard có file index/metadata/log/snapshot riêng (shard_path), nên add/sửa/xóa chỉ chạm shard sở hữu
+      class đó: xóa một class chỉ remove_ids (hoặc dựng lại HNSW) trên 1/N dữ liệu, persist chỉ ghi shard đã đổi.
+    - Truy vấn được gửi song song tới các shard trên thread pool (FAISS nhả GIL khi search),
+      top-k của từng shard được gộp bằng heap.
+    - Cùng API với FaissIndexManager cho các service; dòng (faiss_index, get_row) là vị trí toàn cục
+      theo thứ tự shard 0, 1, ... Các thuộc tính image_ids/class_ids/embeddings là bản nối (copy).
+    Đổi num_shards cần chia lại dữ liệu (shard_faiss_index.py).
+    """
+
+    def __init__(self, embedding_size, num_shards, index_path=None, meta_path=None, wal_path=None,
+                 embeddings_path=None, snapshot_dir=None, search_workers=None, **kwargs):
+        if num_shards < 1:
+            raise ValueError('num_shards phải >= 1')
+        self.embedding_size = embedding_size
+        self.num_shards = num_shards
+        self.shards = [
+            FaissIndexManager(
+                embedding_size,
+                index_path=shard_path(index_path, i),
+                meta_path=shard_path(meta_path, i),
+                wal_path=shard_path(wal_path, i),
+                embeddings_path=shard_path(embeddings_path, i),
+                snapshot_dir=shard_path(snapshot_dir, i),
+                **kwargs
+            )
+            for i in range(num_shards)
+        ]
+        self.index = _ShardedIndex(self)
+        self.image_paths = _ShardedColumn(self)
+        self.persistence = None
+        self._pool = ThreadPoolExecutor(max_workers=search_workers or num_shards, thread_name_prefix='faiss-shard')
+        # Shard có thay đổi chưa commit
+        self._touched = set()
+
+    # ----- Phân shard -----
+    def shard_index(self, class_id):
+        return int(class_id) % self.num_shards
+
+    def shard_for_class(self, class_id):
+        class_id_int = FaissIndexManager._to_int64(class_id)
+        return self.shards[self.shard_index(class_id_int)] if class_id_int is not None else None
+
+    def _shard_of_image(self, image_id):
+        for shard in self.shards:
+            if shard.get_row(image_id) is not None:
+                return shard
+        return None
+
+    def _offsets(self):
+        offsets = [0]
+        for shard in self.shards:
+            offsets.append(offsets[-1] + len(shard))
+        return offsets
+
+    def _locate(self, row):
+        """(shard, dòng trong shard) của dòng toàn cục."""
+        offsets = self._offsets()
+        if row < 0:
+            row += offsets[-1]
+        if not 0 <= row < offsets[-1]:
+            raise IndexError(f'dòng {row} ngoài phạm vi')
+        i = bisect.bisect_right(offsets, row) - 1
+        return self.shards[i], row - offsets[i]
+
+    def _global_row(self, shard, local):
+        return self._offsets()[self.shards.index(shard)] + local if local is not None else None
+
+    def _touch(self, shard):
+        self._touched.add(self.shards.index(shard))
+
+    # ----- Kích thước và metadata -----
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    @property
+    def image_ids(self):
+        return np.concatenate([shard.image_ids for shard in self.shards])
+
+    @property
+    def class_ids(self):
+        return np.concatenate([shard.class_ids for shard in self.shards])
+
+    @property
+    def embeddings(self):
+        return np.concatenate([shard.embeddings for shard in self.shards])
+
+    def get_row(self, image_id):
+        for shard in self.shards:
+            local = shard.get_row(image_id)
+            if local is not None:
+                return self._global_row(shard, local)
+        return None
+
+    def get_row_by_path(self, image_path):
+        for shard in self.shards:
+            local = shard.get_row_by_path(image_path)
+            if local is not None:
+                return self._global_row(shard, local)
+        return None
+
+    def get_rows_by_class(self, class_id):
+        shard = self.shard_for_class(class_id)
+        if shard is None:
+            return np.empty(0, dtype=np.int64)
+        return shard.get_rows_by_class(class_id) + self._offsets()[self.shards.index(shard)]
+
+    def has_class_id(self, class_id):
+        shard = self.shard_for_class(class_id)
+        return shard is not None and shard.has_class_id(class_id)
+
+    def get_class_id(self, image_id):
+        shard = self._shard_of_image(image_id)
+        return shard.get_class_id(image_id) if shard is not None else None
+
+    def get_image_ids_by_class(self, class_id):
+        shard = self.shard_for_class(class_id)
+        return shard.get_image_ids_by_class(class_id) if shard is not None else []
+
+    def _row_to_dict(self, row):
+        shard, local = self._locate(row)
+        result = shard._row_to_dict(local)
+        result['faiss_index'] = row
+        return result
+
+    def query_embeddings_by_string(self, query, page=1, page_size=15):
+        query = str(query).strip().lower()
+        if query:
+            # Một class nằm trọn trong một shard
+            shard = self.shard_for_class(query)
+            if shard is None:
+                return {'total': 0, 'total_pages': 0, 'page': 1, 'page_size': page_size, 'results': []}
+            result = shard.query_embeddings_by_string(query, page, page_size)
+            offset = self._offsets()[self.shards.index(shard)]
+            for item in result['results']:
+                item['faiss_index'] += offset
+            return result
+        total = len(self)
+        total_pages = (total + page_size - 1) // page_size if page_size > 0 else 1
+        page = max(1, min(page, total_pages))
+        start = (page - 1) * page_size
+        rows = range(start, min(start + page_size, total))
+        return {
+            'total': total,
+            'total_pages': total_pages,
+            'page': page,
+            'page_size': page_size,
+            'results': [self._row_to_dict(row) for row in rows]
+        }
+
+    # ----- Truy vấn -----
+    def query_batch(self, query_embs, topk=5):
+        """Gửi cả lô query tới mọi shard có dữ liệu song song, gộp top-k từng query bằng heap theo score."""
+        query_embs = np.asarray(query_embs, dtype=np.float32).reshape(-1, self.embedding_size)
+        if query_embs.shape[0] == 0:
+            return []
+        offsets = self._offsets()
+        active = [(i, shard) for i, shard in enumerate(self.shards) if len(shard)]
+        futures = [(offsets[i], self._pool.submit(shard.query_batch, query_embs, topk)) for i, shard in active]
+        per_query = [[] for _ in range(query_embs.shape[0])]
+        for offset, future in futures:
+            for results, shard_results in zip(per_query, future.result()):
+                for item in shard_results:
+                    item['faiss_index'] += offset
+                results.extend(shard_results)
+        return [heapq.nlargest(topk, results, key=lambda item: item['score']) for results in per_query]
+
+    def query(self, query_emb, topk=5):
+        import time
+        print(f'--- FAISS query ({self.num_shards} shard) ---')
+        start = time.time()
+        results = self.query_batch(np.asarray(query_emb).reshape(1, -1), topk)[0]
+        print(f'Thời gian search FAISS: {time.time() - start:.3f}s')
+        print(f'Kết quả truy vấn: {results}')
+        return results
+
+    # ----- Thay đổi (chỉ chạm shard sở hữu) -----
+    def add_embeddings(self, embeddings, image_ids, image_paths, class_ids):
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.embedding_size)
+        ids = np.asarray(image_ids, dtype=np.int64).reshape(-1)
+        class_ids = np.asarray(class_ids, dtype=np.int64).reshape(-1)
+        if ids.size == 0:
+            return
+        # image_id phải duy nhất trên mọi shard, không chỉ trong shard nhận
+        duplicated = [int(i) for i in ids.tolist() if self.get_row(i) is not None]
+        if duplicated or np.unique(ids).size != ids.size:
+            raise ValueError(f'image_id đã tồn tại hoặc bị trùng: {duplicated or ids.tolist()}')
+        image_paths = [str(p) for p in image_paths]
+        owners = class_ids % self.num_shards
+        for i in np.unique(owners).tolist():
+            mask = owners == i
+            self.shards[i].add_embeddings(embeddings[mask], ids[mask],
+                                          [p for p, m in zip(image_paths, mask) if m], class_ids[mask])
+            self._touched.add(i)
+
+    def _apply_to_image(self, method, image_id, *args):
+        shard = self._shard_of_image(image_id)
+        if shard is None:
+            if method != 'update_image_path':
+                print(f'image_id {image_id} không tồn tại!')
+            return False
+        result = getattr(shard, method)(image_id, *args)
+        if result is not False:
+            self._touch(shard)
+        return result
+
+    def update_embedding(self, image_id, embedding):
+        return self._apply_to_image('update_embedding', image_id, embedding)
+
+    def update_image_path(self, image_id, image_path):
+        return self._apply_to_image('update_image_path', image_id, image_path)
+
+    def delete_by_image_id(self, image_id):
+        return self._apply_to_image('delete_by_image_id', image_id)
+
+    def delete_by_class_id(self, class_id):
+        shard = self.shard_for_class(class_id)
+        if shard is None:
+            print(f'class_id {class_id} không tồn tại!')
+            return False
+        result = shard.delete_by_class_id(class_id)
+        if result is not False:
+            self._touch(shard)
+        return result
+
+    def reset_index(self):
+        for shard in self.shards:
+            shard.reset_index()
+        self._touched.clear()
+
+    def rebuild_index(self, index_type=None):
+        list(self._pool.map(lambda shard: shard.rebuild_index(index_type), self.shards))
+
+    # ----- Ghi bền và load -----
+    def load(self):
+        list(self._pool.map(lambda shard: shard.load(), self.shards))
+
+    def save(self):
+        """Ghi snapshot các shard đã thay đổi chưa ghi; không có thay đổi nào đang chờ thì ghi tất cả."""
+        touched, self._touched = self._touched, set()
+        for i in sorted(touched) or range(self.num_shards):
+            self.shards[i].save()
+
+    def commit(self):
+        """Commit các shard đã thay đổi từ lần commit trước (shard không đổi không fsync/ghi snapshot)."""
+        touched, self._touched = self._touched, set()
+        for i in sorted(touched):
+            self.shards[i].commit()
+
+    def start_persistence(self, lock, interval=0.5, max_dirty=256):
+        if self.persistence is None:
+            self.persistence = _ShardedPersistence([
+                shard.start_persistence(lock, interval, max_dirty) for shard in self.shards
+            ])
+        return self.persistence
+
+    def flush(self, timeout=None):
+        return all([shard.flush(timeout) for shard in self.shards])
+
+    @property
+    def loaded_generation(self):
+        """Generation đang load của từng shard (tuple), None nếu không dùng snapshot_dir."""
+        generations = tuple(shard.loaded_generation for shard in self.shards)
+        return None if all(g is None for g in generations) else generations
+
+    def snapshot_changed(self):
+        return any(shard.snapshot_changed() for shard in self.shards)
+
+    @contextlib.contextmanager
+    def shared_write_batch(self):
+        """Giữ lô ghi của mọi shard (theo thứ tự shard, mọi process lấy khóa cùng thứ tự nên không deadlock)."""
+        with contextlib.ExitStack() as stack:
+            for shard in self.shards:
+                stack.enter_context(shard.shared_write_batch())
+            yield
+
+    def refresh(self):
+        return any([shard.refresh() for shard in self.shards])
+
+    def check_index_data(self):
+        """Cùng các khóa với FaissIndexManager.check_index_data (gộp trên mọi shard), kèm num_shards và chi tiết từng shard."""
+        shards = [shard.check_index_data() for shard in self.shards]
+        types = sorted({str(s['index_type']) for s in shards})
+        configured = sorted({str(s['configured_index_type']) for s in shards})
+        mins = [s['min_vector_value'] for s in shards if s['min_vector_value'] is not None]
+        maxs = [s['max_vector_value'] for s in shards if s['max_vector_value'] is not None]
+        total = lambda key: sum(s[key] for s in shards)
+        return {
+            # Các shard thường cùng loại index; khác nhau (auto theo kích thước shard) thì liệt kê các loại
+            'index_type': shards[0]['index_type'] if len(types) == 1 else ','.join(types),
+            'configured_index_type': shards[0]['configured_index_type'] if len(configured) == 1 else ','.join(configured),
+            'num_vectors': total('num_vectors'),
+            'num_image_ids': total('num_image_ids'),
+            'num_image_paths': total('num_image_paths'),
+            'num_class_ids': total('num_class_ids'),
+            'num_embeddings': total('num_embeddings'),
+            'num_unique_image_ids': int(np.unique(self.image_ids).size),
+            'num_unique_image_paths': len(set(self.image_paths)),
+            # Một class nằm trọn trong một shard
+            'num_unique_class_ids': total('num_unique_class_ids'),
+            'embedding_capacity': total('embedding_capacity'),
+            'embedding_bytes': total('embedding_bytes'),
+            'num_nan_vectors': total('num_nan_vectors'),
+            'min_vector_value': min(mins) if mins else None,
+            'max_vector_value': max(maxs) if maxs else None,
+            'num_shards': self.num_shards,
+            'shards': shards
+        }
@@ -0,0 +1,174 @@
+import json
+import os
+import shutil
+
+from fixes.atomic_operations import InterProcessLock, atomic_write_bytes, file_crc32, fsync_dir, write_file
+from index.generation import GenerationCounter
+from index.metadata import write_columnar_files
+
+
+# Mỗi snapshot là một thư mục gen-<N> bất biến trong snapshot_dir:
+#   index.faiss                      FAISS index (faiss.serialize_index)
+#   embeddings.npy, image_ids.npy, class_ids.npy, image_paths.*, format.json   metadata dạng cột (index/metadata.py)
+#   MANIFEST.json                    generation, format_version, rows, wal_seq, kích thước + CRC32 từng file
+# File CURRENT trỏ tới generation mới nhất. Generation được ghi vào gen-<N>.tmp rồi os.replace thành gen-<N>,
+# nên người đọc không bao giờ thấy snapshot dở dang, và snapshot mới không ghi đè file đang được mmap.
+# shared_writes (nhiều process cùng ghi): thay đổi sau generation mới nhất nằm trong log dùng chung wal.log
+# (index/wal.py), seq của bản ghi cuối đã fsync được publish vào file WAL_SEQ mmap.
+SNAPSHOT_FORMAT_VERSION = 1
+GENERATION_PREFIX = 'gen-'
+MANIFEST_FILE = 'MANIFEST.json'
+CURRENT_FILE = 'CURRENT'
+GENERATION_FILE = 'GENERATION'
+LOCK_FILE = 'LOCK'
+INDEX_FILE = 'index.faiss'
+SHARED_WAL_FILE = 'wal.log'
+WAL_SEQ_FILE = 'WAL_SEQ'
+
+
+def generation_name(generation):
+    return f'{GENERATION_PREFIX}{generation:08d}'
+
+
+class SnapshotStore:
+    """
+    Các generation snapshot của FaissIndexManager trong một thư mục.
+    - write(): ghi generation mới (số lớn hơn mọi generation đã có) rồi cập nhật CURRENT và dọn generation cũ.
+    - latest(): generation hoàn chỉnh mới nhất (theo CURRENT, nếu hỏng thì quét các gen-* còn lại).
+    - Giữ lại `keep` generation gần nhất để worker đang mmap generation trước vẫn đọc được.
+    - Nhiều process dùng chung thư mục: ghi được tuần tự hóa bằng file LOCK (writer_lock()), và số generation
+      mới nhất được publish vào file GENERATION mmap (published_generation() để kiểm tra rẻ trên mỗi request).
+    """
+
+    def __init__(self, root, keep=2):
+        self.root = root
+        self.keep = max(1, keep)
+        os.makedirs(root, exist_ok=True)
+        self._writer_lock = InterProcessLock(os.path.join(root, LOCK_FILE))
+        self._counter = GenerationCounter(os.path.join(root, GENERATION_FILE))
+        # Snapshot có từ trước khi có file GENERATION: publish generation hiện tại
+        with self._writer_lock:
+            self._counter.publish(self._current() or 0)
+
+    def writer_lock(self):
+        """Khóa ghi snapshot dùng chung giữa các process (reentrant trong cùng process)."""
+        return self._writer_lock
+
+    def published_generation(self):
+        """Generation mới nhất đã publish bởi bất kỳ process nào (một lần đọc mmap)."""
+        return self._counter.value
+
+    def _path(self, generation):
+        return os.path.join(self.root, generation_name(generation))
+
+    def generations(self):
+        """Các generation đã publish (có thể chưa kiểm tra), tăng dần."""
+        if not os.path.isdir(self.root):
+            return []
+        found = []
+        for name in os.listdir(self.root):
+            suffix = name[len(GENERATION_PREFIX):]
+            if name.startswith(GENERATION_PREFIX) and suffix.isdigit():
+                found.append(int(suffix))
+        return sorted(found)
+
+    def read_manifest(self, generation, verify_checksums=False):
+        """MANIFEST của generation nếu đầy đủ và khớp kích thước (và CRC32 khi verify_checksums), ngược lại None."""
+        path = self._path(generation)
+        try:
+            with open(os.path.join(path, MANIFEST_FILE), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get('format_version', 0) > SNAPSHOT_FORMAT_VERSION or manifest.get('generation') != generation:
+            return None
+        for name, info in manifest.get('files', {}).items():
+            file_path = os.path.join(path, name)
+            if not os.path.isfile(file_path) or os.path.getsize(file_path) != info['size']:
+                return None
+            if verify_checksums and file_crc32(file_path) != info['crc32']:
+                return None
+        return manifest
+
+    def _current(self):
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE), encoding='utf-8') as f:
+                name = f.read().strip()
+        except OSError:
+            return None
+        suffix = name[len(GENERATION_PREFIX):]
+        return int(suffix) if name.startswith(GENERATION_PREFIX) and suffix.isdigit() else None
+
+    def latest(self, verify_checksums=False):
+        """Trả về (generation, đường dẫn thư mục, manifest) của generation hoàn chỉnh mới nhất, None nếu chưa có."""
+        current = self._current()
+        candidates = self.generations()
+        if current is not None:
+            candidates = [current] + [g for g in reversed(candidates) if g != current]
+        else:
+            candidates = list(reversed(candidates))
+        for generation in candidates:
+            manifest = self.read_manifest(generation, verify_checksums)
+            if manifest is not None:
+                if generation != current:
+                    print(f'⚠️ Snapshot CURRENT không hợp lệ, dùng {generation_name(generation)}')
+                return generation, self._path(generation), manifest
+            print(f'⚠️ Bỏ qua snapshot {generation_name(generation)}: thiếu hoặc sai MANIFEST')
+        return None
+
+    def write(self, index_bytes, embeddings, image_ids, class_ids, image_paths, wal_seq=0, extra=None,
+              before_publish=None):
+        """
+        Ghi generation mới và publish nguyên tử. Trả về số generation.
+        before_publish(generation) được gọi sau khi CURRENT trỏ tới generation mới nhưng trước khi publish số
+        generation và dọn generation cũ, để người ghi đánh dấu generation đó là của mình trước khi ai đó thấy nó.
+        """
+        with self._writer_lock:
+            return self._write(index_bytes, embeddings, image_ids, class_ids, image_paths, wal_seq, extra,
+                               before_publish)
+
+    def _write(self, index_bytes, embeddings, image_ids, class_ids, image_paths, wal_seq, extra,
+               before_publish=None):
+        generation = max(self.generations() + [self._current() or 0]) + 1
+        final = self._path(generation)
+        tmp = final + '.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+
+        write_file(os.path.join(tmp, INDEX_FILE), index_bytes)
+        write_columnar_files(tmp, image_ids, class_ids, image_paths, wal_seq, embeddings)
+        manifest = {
+            'generation': generation,
+            'format_version': SNAPSHOT_FORMAT_VERSION,
+            'rows': int(len(image_ids)),
+            'wal_seq': int(wal_seq),
+            'files': {
+                name: {'size': os.path.getsize(os.path.join(tmp, name)), 'crc32': file_crc32(os.path.join(tmp, name))}
+                for name in sorted(os.listdir(tmp))
+            }
+        }
+        manifest.update(extra or {})
+        write_file(os.path.join(tmp, MANIFEST_FILE), json.dumps(manifest, indent=2).encode('utf-8'))
+        fsync_dir(tmp)
+
+        os.replace(tmp, final)
+        fsync_dir(self.root)
+        atomic_write_bytes(os.path.join(self.root, CURRENT_FILE), generation_name(generation).encode('utf-8'))
+        if before_publish is not None:
+            before_publish(generation)
+        self._counter.publish(generation)
+        self.gc()
+        return generation
+
+    def gc(self):
+        """
+        Xóa generation cũ ngoài `keep` generation mới nhất và thư mục tạm còn sót lại sau crash.
+        Trên Windows file đang mmap không xóa được: bỏ qua, lần gc sau sẽ thử lại.
+        """
+        if not os.path.isdir(self.root):
+            return
+        for name in os.listdir(self.root):
+            if name.startswith(GENERATION_PREFIX) and name.endswith('.tmp'):
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+        for generation in self.generations()[:-self.keep]:
+            shutil.rmtree(self._path(generation), ignore_errors=True)
@@ -0,0 +1,251 @@
+import glob
+import os
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+
+# Loại bản ghi trong log
+OP_ADD = 1
+OP_UPDATE_EMBEDDING = 2
+OP_UPDATE_PATH = 3
+OP_DELETE_IDS = 4
+
+# Khung mỗi bản ghi: [độ dài payload u32][crc32 payload u32][payload]
+# payload: [seq u64][op u8][body]
+FRAME = struct.Struct('<II')
+RECORD_HEADER = struct.Struct('<QB')
+
+
+class MutationLog:
+    """
+    Write-ahead log chỉ ghi nối (append-only) cho các thay đổi trên FaissIndexManager.
+    - Mỗi bản ghi có số thứ tự (seq) tăng dần và checksum CRC32, bản ghi cuối bị ghi dở (crash) được cắt bỏ khi replay.
+    - append() chỉ mã hóa vào bộ đệm; sync() ghi cả lô một lần rồi fsync.
+    - seal() đóng file log hiện tại thành segment `<path>.<seq cuối>` và mở log mới, để snapshot
+      được ghi nền trong khi thay đổi mới tiếp tục vào log mới; drop_sealed() xóa segment đã nằm trong snapshot.
+    - shared=True: nhiều process cùng ghi một log (luôn trong khóa liên process của SnapshotStore). File được mở
+      lại cho mỗi lần sync() (process khác có thể đã seal/xóa file), và replay_new() đọc tiếp từ vị trí đã đọc
+      để áp dụng bản ghi của process khác trước khi ghi tiếp.
+    """
+
+    def __init__(self, path, embedding_size, shared=False):
+        self.path = path
+        self.embedding_size = embedding_size
+        self.shared = shared
+        self.last_seq = 0
+        self._pending = []
+        self._file = None
+        # Vị trí đã đọc/ghi tới trong log hiện tại (file nào: st_ino), dùng cho replay_new()
+        self._read_offset = 0
+        self._read_inode = None
+        self._lock = threading.Lock()
+
+    # ----- Ghi -----
+
+    def _open(self):
+        if self._file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._file = open(self.path, 'ab')
+        return self._file
+
+    def _append(self, op, body):
+        with self._lock:
+            self.last_seq += 1
+            payload = RECORD_HEADER.pack(self.last_seq, op) + body
+            self._pending.append(FRAME.pack(len(payload), zlib.crc32(payload)) + payload)
+            return self.last_seq
+
+    def append_add(self, embeddings, image_ids, image_paths, class_ids):
+        paths = [str(p).encode('utf-8') for p in image_paths]
+        body = b''.join([
+            struct.pack('<I', len(paths)),
+            np.ascontiguousarray(image_ids, dtype='<i8').tobytes(),
+            np.ascontiguousarray(class_ids, dtype='<i8').tobytes(),
+            np.array([len(p) for p in paths], dtype='<u4').tobytes(),
+            b''.join(paths),
+            np.ascontiguousarray(embeddings, dtype='<f4').tobytes()
+        ])
+        return self._append(OP_ADD, body)
+
+    def append_update_embedding(self, image_id, embedding):
+        body = struct.pack('<q', int(image_id)) + np.ascontiguousarray(embedding, dtype='<f4').tobytes()
+        return self._append(OP_UPDATE_EMBEDDING, body)
+
+    def append_update_path(self, image_id, image_path):
+        return self._append(OP_UPDATE_PATH, struct.pack('<q', int(image_id)) + str(image_path).encode('utf-8'))
+
+    def append_delete_ids(self, image_ids):
+        ids = np.ascontiguousarray(image_ids, dtype='<i8')
+        return self._append(OP_DELETE_IDS, struct.pack('<I', ids.size) + ids.tobytes())
+
+    def sync(self):
+        """Ghi toàn bộ bản ghi đang chờ trong một lần write + fsync. Trả về số byte đã ghi."""
+        with self._lock:
+            if not self._pending:
+                return 0
+            data = b''.join(self._pending)
+            f = self._open()
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            self._pending = []
+            if self.shared:
+                # Bản ghi của chính mình đã được áp dụng: replay_new() bắt đầu sau chúng
+                self._read_offset = f.tell()
+                self._read_inode = os.fstat(f.fileno()).st_ino
+                f.close()
+                self._file = None
+            return len(data)
+
+    @property
+    def size(self):
+        """Kích thước log hiện tại (byte), dùng để quyết định khi nào compact."""
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def seal(self):
+        """Đóng log hiện tại thành segment bất biến, các bản ghi sau đó vào log mới. Trả về seq cuối của segment."""
+        self.sync()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+                os.replace(self.path, f'{self.path}.{self.last_seq:020d}')
+            self._read_offset, self._read_inode = 0, None
+            return self.last_seq
+
+    def drop_sealed(self, upto_seq):
+        """Xóa các segment có seq cuối <= upto_seq (đã nằm trọn trong snapshot)."""
+        for path, last_seq in self._sealed_segments():
+            if last_seq <= upto_seq:
+                os.remove(path)
+
+    def close(self):
+        self.sync()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # ----- Đọc / replay -----
+
+    def _sealed_segments(self):
+        segments = []
+        for path in glob.glob(glob.escape(self.path) + '.*'):
+            suffix = path[len(self.path) + 1:]
+            if suffix.isdigit():
+                segments.append((path, int(suffix)))
+        return sorted(segments, key=lambda s: s[1])
+
+    def _read_file(self, path, truncate_torn_tail, base=0):
+        """
+        Các payload hợp lệ của một file log từ byte `base`, và vị trí kết thúc bản ghi hợp lệ cuối cùng;
+        cắt phần đuôi ghi dở nếu truncate_torn_tail. Gọi khi giữ _lock.
+        """
+        with open(path, 'rb') as f:
+            f.seek(base)
+            data = f.read()
+        payloads = []
+        offset = 0
+        while offset + FRAME.size <= len(data):
+            length, crc = FRAME.unpack_from(data, offset)
+            start, end = offset + FRAME.size, offset + FRAME.size + length
+            payload = data[start:end]
+            if end > len(data) or zlib.crc32(payload) != crc:
+                break
+            payloads.append(payload)
+            offset = end
+        if offset < len(data):
+            print(f'⚠️ Log {path}: bỏ {len(data) - offset} byte cuối bị ghi dở hoặc sai checksum')
+            if truncate_torn_tail:
+                with open(path, 'r+b') as f:
+                    f.truncate(base + offset)
+        return payloads, base + offset
+
+    def _decode(self, payload):
+        seq, op = RECORD_HEADER.unpack_from(payload)
+        body = memoryview(payload)[RECORD_HEADER.size:]
+        d = self.embedding_size
+        if op == OP_ADD:
+            n = struct.unpack_from('<I', body)[0]
+            pos = 4
+            image_ids = np.frombuffer(body, '<i8', n, pos); pos += 8 * n
+            class_ids = np.frombuffer(body, '<i8', n, pos); pos += 8 * n
+            lengths = np.frombuffer(body, '<u4', n, pos); pos += 4 * n
+            image_paths = []
+            for length in lengths.tolist():
+                image_paths.append(bytes(body[pos:pos + length]).decode('utf-8'))
+                pos += length
+            embeddings = np.frombuffer(body, '<f4', n * d, pos).reshape(n, d)
+            return seq, op, (embeddings, image_ids, image_paths, class_ids)
+        if op == OP_UPDATE_EMBEDDING:
+            image_id = struct.unpack_from('<q', body)[0]
+            return seq, op, (image_id, np.frombuffer(body, '<f4', d, 8))
+        if op == OP_UPDATE_PATH:
+            image_id = struct.unpack_from('<q', body)[0]
+            return seq, op, (image_id, bytes(body[8:]).decode('utf-8'))
+        if op == OP_DELETE_IDS:
+            n = struct.unpack_from('<I', body)[0]
+            return seq, op, (np.frombuffer(body, '<i8', n, 4),)
+        raise ValueError(f'Loại bản ghi log không hợp lệ: {op}')
+
+    def replay(self, after_seq=0):
+        """
+        Duyệt (seq, op, args) của các bản ghi có seq > after_seq, theo thứ tự: các segment đã seal rồi log hiện tại.
+        Cập nhật last_seq để bản ghi mới tiếp nối sau bản ghi cuối cùng trên đĩa.
+        Đọc file và cắt đuôi ghi dở trong _lock, để không chạy song song với sync()/seal() đang ghi vào log.
+        """
+        with self._lock:
+            self.last_seq = max(self.last_seq, after_seq)
+            payloads = []
+            for path, _ in self._sealed_segments():
+                payloads += self._read_file(path, truncate_torn_tail=False)[0]
+            self._read_offset, self._read_inode = 0, None
+            if os.path.exists(self.path):
+                active, self._read_offset = self._read_file(self.path, truncate_torn_tail=True)
+                self._read_inode = os.stat(self.path).st_ino
+                payloads += active
+            records = self._decode_all(payloads)
+        for seq, op, args in records:
+            if seq > after_seq:
+                yield seq, op, args
+
+    def replay_new(self):
+        """
+        Chế độ shared: các bản ghi process khác đã nối vào log hiện tại kể từ lần đọc/ghi trước, theo thứ tự.
+        Log đã được seal/tạo lại (khác file) thì đọc từ đầu, bỏ các bản ghi đã áp dụng (seq <= last_seq).
+        Gọi trong khóa liên process, khi generation đang load không đổi.
+        """
+        with self._lock:
+            if not os.path.exists(self.path):
+                return []
+            after_seq = self.last_seq
+            if os.stat(self.path).st_ino != self._read_inode:
+                self._read_offset = 0
+            payloads, self._read_offset = self._read_file(self.path, truncate_torn_tail=True, base=self._read_offset)
+            self._read_inode = os.stat(self.path).st_ino
+            records = self._decode_all(payloads)
+        return [(seq, op, args) for seq, op, args in records if seq > after_seq]
+
+    def _decode_all(self, payloads):
+        """Giải mã payload và cập nhật last_seq để bản ghi mới tiếp nối sau bản ghi cuối cùng trên đĩa."""
+        records = [self._decode(payload) for payload in payloads]
+        if records:
+            self.last_seq = max(self.last_seq, max(seq for seq, _, _ in records))
+        return records
+
+    def reset(self):
+        """Xóa toàn bộ log (sau reset_index, khi snapshot rỗng đã được ghi). last_seq vẫn tăng tiếp."""
+        with self._lock:
+            self._pending = []
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            for path, _ in self._sealed_segments():
+                os.remove(path)
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self._read_offset, self._read_inode = 0, None
@@ -0,0 +1,290 @@
+import inspect
+import os
+import queue
+import socket
+import stat
+import threading
+import time
+from multiprocessing.connection import Client, Listener, address_type
+
+import numpy as np
+
+
+MIN_AUTHKEY_BYTES = 16
+
+# Các thao tác thay đổi mà process ghi nhận từ API worker (tên method của FaissIndexManager)
+MUTATIONS = frozenset({
+    'add_embeddings', 'update_embedding', 'update_image_path',
+    'delete_by_image_id', 'delete_by_class_id', 'reset_index'
+})
+
+
+def read_authkey(env_var, secret_path=None):
+    """
+    authkey của kết nối writer: nội dung file secret_path (nếu cấu hình), ngược lại biến môi trường env_var.
+    Không có hoặc quá ngắn thì RuntimeError: writer và API worker không chạy với authkey mặc định/đoán được.
+    """
+    if secret_path:
+        with open(secret_path, 'rb') as f:
+            authkey = f.read().strip()
+        source = secret_path
+    else:
+        authkey = os.environ.get(env_var, '').strip().encode('utf-8')
+        source = f'biến môi trường {env_var}'
+    if len(authkey) < MIN_AUTHKEY_BYTES:
+        raise RuntimeError(f'Thiếu authkey FAISS writer (cần >= {MIN_AUTHKEY_BYTES} byte) trong {source}')
+    return authkey
+
+
+def _check_authkey(authkey):
+    if not isinstance(authkey, bytes) or len(authkey) < MIN_AUTHKEY_BYTES:
+        raise ValueError(f'authkey FAISS writer phải là bytes >= {MIN_AUTHKEY_BYTES} byte (xem read_authkey)')
+
+
+def _remove_stale_socket(path):
+    """Xóa file Unix socket còn sót sau khi writer trước bị kill; từ chối nếu đang có writer khác lắng nghe."""
+    if not os.path.lexists(path):
+        return
+    if not stat.S_ISSOCK(os.lstat(path).st_mode):
+        raise RuntimeError(f'{path} đã tồn tại và không phải Unix socket')
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.remove(path)
+        return
+    finally:
+        probe.close()
+    raise RuntimeError(f'Đã có FAISS writer khác lắng nghe tại {path}')
+
+
+def validate_ops(manager, ops):
+    """
+    Kiểm tra cả lệnh trước khi áp dụng thao tác nào: tên thao tác, tham số, và image_id thêm mới không trùng
+    với index hiện tại hay với thao tác add khác trong cùng lệnh (trừ image_id vừa bị xóa trước đó trong lệnh).
+    Lệnh không hợp lệ bị từ chối nguyên vẹn (ValueError), không để lại nửa lệnh đã áp dụng.
+    """
+    added, deleted = set(), set()
+    for op, args in ops:
+        if op not in MUTATIONS:
+            raise ValueError(f'Thao tác không hợp lệ: {op}')
+        try:
+            inspect.signature(getattr(manager, op)).bind(*args)
+        except TypeError as e:
+            raise ValueError(f'Tham số không hợp lệ cho {op}: {e}') from None
+        if op == 'delete_by_image_id':
+            deleted.add(int(args[0]))
+        elif op == 'add_embeddings':
+            embeddings, image_ids, image_paths, class_ids = args
+            ids = [int(i) for i in np.asarray(image_ids).reshape(-1)]
+            n = len(ids)
+            if (np.asarray(embeddings).size != n * manager.embedding_size or len(image_paths) != n
+                    or np.asarray(class_ids).size != n):
+                raise ValueError(f'add_embeddings: số embedding, image_path, class_id không khớp {n} image_id')
+            duplicated = [i for i in ids if i in added or (manager.get_row(i) is not None and i not in deleted)]
+            if duplicated or len(set(ids)) != n:
+                raise ValueError(f'image_id đã tồn tại hoặc bị trùng: {duplicated or ids}')
+            added.update(ids)
+
+
+class IndexWriterServer:
+    """
+    Process duy nhất được thay đổi FAISS index (single writer). API worker gửi lệnh qua kết nối local
+    (multiprocessing.connection: TCP localhost hoặc Unix socket, có authkey):
+    - Mỗi kết nối có một thread nhận lệnh và đưa vào hàng đợi chung.
+    - Vòng lặp chính gom các lệnh đến trong max_wait_ms (tối đa max_batch lệnh), kiểm tra rồi áp dụng lần lượt
+      trong một lô ghi (manager tạo với shared_writes: log dùng chung trong snapshot_dir là cơ chế ghi bền duy nhất),
+      fsync + publish log một lần cho cả lô, sau đó mới trả kết quả cho từng lệnh (worker refresh là thấy thay đổi).
+      Generation snapshot chỉ được ghi khi log vượt wal_compact_bytes.
+    - Mỗi lệnh được validate_ops trước: lệnh sai bị từ chối mà không áp dụng thao tác nào. Nếu một thao tác vẫn lỗi
+      khi áp dụng, trả lời ghi rõ số thao tác đầu tiên đã áp dụng kèm kết quả của chúng.
+    Không còn nhiều process cùng ghi một file, và chi phí fsync được chia cho cả lô.
+    """
+
+    def __init__(self, manager, address, authkey, max_batch=256, max_wait_ms=5):
+        _check_authkey(authkey)
+        self.manager = manager
+        self.address = address
+        self.authkey = authkey
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.commands = 0
+        self._queue = queue.Queue()
+        self._listener = None
+        self._stopping = threading.Event()
+
+    def serve_forever(self):
+        self._listener = self._listen()
+        print(f'✅ FAISS writer lắng nghe tại {self._listener.address}')
+        threading.Thread(target=self._accept_loop, name='faiss-writer-accept', daemon=True).start()
+        try:
+            while not self._stopping.is_set():
+                batch = self._collect()
+                if batch:
+                    self._apply(batch)
+        finally:
+            self._listener.close()
+            self.manager.flush()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _listen(self):
+        # backlog mặc định của Listener là 1: nhiều worker kết nối cùng lúc sẽ bị treo ở bước bắt tay
+        if address_type(self.address) != 'AF_UNIX':
+            return Listener(self.address, backlog=64, authkey=self.authkey)
+        _remove_stale_socket(self.address)
+        os.makedirs(os.path.dirname(os.path.abspath(self.address)), exist_ok=True)
+        # Socket được tạo với quyền 0600 ngay khi bind (umask), không có khoảng hở trước chmod
+        old_umask = os.umask(0o177)
+        try:
+            listener = Listener(self.address, backlog=64, authkey=self.authkey)
+        finally:
+            os.umask(old_umask)
+        os.chmod(self.address, 0o600)
+        return listener
+
+    def _accept_loop(self):
+        while not self._stopping.is_set():
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                return
+            except Exception as e:
+                # Sai authkey hoặc client ngắt giữa lúc bắt tay: bỏ qua kết nối này
+                print(f'⚠️ FAISS writer từ chối kết nối: {e}')
+                continue
+            threading.Thread(target=self._serve_connection, args=(conn,), name='faiss-writer-conn', daemon=True).start()
+
+    def _serve_connection(self, conn):
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+                reply = {}
+                done = threading.Event()
+                self._queue.put((request, reply, done))
+                done.wait()
+                try:
+                    conn.send(reply)
+                except OSError:
+                    return
+
+    def _collect(self):
+        """Lấy lệnh đầu tiên (chờ tối đa 0.5s để còn kiểm tra stop), rồi gom thêm trong max_wait."""
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _apply_request(self, request, reply):
+        ops = request.get('ops', [])
+        results = []
+        try:
+            validate_ops(self.manager, ops)
+        except Exception as e:
+            print(f'❌ FAISS writer: từ chối lệnh {ops!r:.200}: {e}')
+            reply['error'] = str(e)
+            reply['results'] = results
+            return
+        try:
+            for op, args in ops:
+                results.append(getattr(self.manager, op)(*args))
+        except Exception as e:
+            print(f'❌ FAISS writer: lỗi áp dụng {ops!r:.200}: {e}')
+            reply['error'] = f'{e} (đã áp dụng {len(results)}/{len(ops)} thao tác đầu)'
+        reply['results'] = results
+
+    def _apply(self, batch):
+        error = None
+        try:
+            # Một lô ghi cho cả lô lệnh: fsync + publish log dùng chung một lần
+            with self.manager.shared_write_batch():
+                for request, reply, _ in batch:
+                    self._apply_request(request, reply)
+            # Manager không bật shared_writes (test): ghi bền theo cơ chế riêng của nó, với shared_writes là no-op
+            self.manager.commit()
+        except Exception as e:
+            print(f'❌ FAISS writer: lỗi ghi log: {e}')
+            error = str(e)
+        generation = self.manager.loaded_generation
+        self.batches += 1
+        self.commands += len(batch)
+        for _, reply, done in batch:
+            if error is not None:
+                reply.setdefault('error', error)
+            reply['generation'] = generation
+            done.set()
+
+
+class IndexWriterClient:
+    """
+    Kết nối từ API worker tới IndexWriterServer. Mỗi thread một kết nối (service chạy trên threadpool),
+    tự kết nối lại một lần nếu writer khởi động lại.
+    """
+
+    def __init__(self, address, authkey, timeout=30.0):
+        _check_authkey(authkey)
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = Client(self.address, authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def apply(self, ops):
+        """
+        Gửi danh sách (tên thao tác, args) để áp dụng theo thứ tự trong một lệnh.
+        Trả về (list kết quả, generation chứa thay đổi). Lỗi phía writer được ném lại dạng RuntimeError.
+        """
+        request = {'ops': [(op, tuple(args)) for op, args in ops]}
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.send(request)
+                break
+            except OSError:
+                # Kết nối cũ đã hỏng (writer khởi động lại): lệnh chưa được gửi nên kết nối lại và gửi lại một lần
+                self._drop_connection()
+                if attempt:
+                    raise
+        # Đã gửi: không gửi lại nữa (writer có thể đã áp dụng), lỗi từ đây được ném ra cho service
+        try:
+            ready = conn.poll(self.timeout)
+            reply = conn.recv() if ready else None
+        except (EOFError, OSError) as e:
+            self._drop_connection()
+            raise ConnectionError(f'FAISS writer ngắt kết nối khi đang xử lý lệnh: {e}')
+        if reply is None:
+            self._drop_connection()
+            raise TimeoutError(f'FAISS writer không phản hồi sau {self.timeout}s')
+        if 'error' in reply:
+            raise RuntimeError(f"FAISS writer: {reply['error']}")
+        return reply['results'], reply['generation']
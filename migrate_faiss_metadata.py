@@ -0,0 +1,58 @@
+"""
+Chuyển metadata FAISS từ file .npz cũ (image_paths dạng mảng chuỗi, cần pickle) sang định dạng cột
+(index/metadata.py): image_ids.npy, class_ids.npy int64 và image_paths dạng offsets + heap bytes.
+
+Cách dùng:
+    python migrate_faiss_metadata.py                       # index/faiss_db_r18_meta.npz -> index/faiss_db_r18_meta/
+    python migrate_faiss_metadata.py --src a.npz --dst b   # đường dẫn tùy chọn
+
+Embedding nằm trong .npz được tách ra FAISS_EMBEDDINGS_PATH nếu file đó chưa có, wal_seq được giữ nguyên
+để phần log sau snapshot vẫn replay đúng. File .npz cũ được giữ lại (xóa tay sau khi kiểm tra).
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import FAISS_META_PATH, FAISS_EMBEDDINGS_PATH
+from index.metadata import read_npz, read_columnar, write_metadata
+
+
+def migrate(src, dst, embeddings_path=None):
+    meta = read_npz(src)
+    n = meta['image_ids'].shape[0]
+    if len(meta['image_paths']) != n or meta['class_ids'].shape[0] != n:
+        raise ValueError(f'{src}: số dòng image_ids/image_paths/class_ids không khớp')
+
+    embeddings = meta['embeddings']
+    if embeddings is not None and embeddings_path:
+        if os.path.exists(embeddings_path):
+            print(f'ℹ️ {embeddings_path} đã tồn tại, bỏ embeddings trong {src}')
+        else:
+            with open(embeddings_path, 'wb') as f:
+                np.save(f, np.ascontiguousarray(embeddings, dtype=np.float32))
+            print(f'✅ Đã tách embeddings ({embeddings.shape[0]} x {embeddings.shape[1]}) ra {embeddings_path}')
+        embeddings = None
+
+    write_metadata(dst, meta['image_ids'], meta['class_ids'], meta['image_paths'], meta['wal_seq'], embeddings)
+
+    # Kiểm tra lại bản vừa ghi
+    check = read_columnar(dst)
+    assert np.array_equal(check['image_ids'], meta['image_ids'])
+    assert np.array_equal(check['class_ids'], meta['class_ids'])
+    assert check['image_paths'].tolist() == meta['image_paths'].tolist()
+    print(f'✅ Đã chuyển {n} dòng metadata: {src} -> {dst} (wal_seq={meta["wal_seq"]})')
+
+
+if __name__ == '__main__':
+    default_dst = FAISS_META_PATH[:-4] if FAISS_META_PATH.endswith('.npz') else FAISS_META_PATH
+    parser = argparse.ArgumentParser(description='Chuyển metadata FAISS .npz sang định dạng cột')
+    parser.add_argument('--src', default=default_dst + '.npz', help='File .npz cũ')
+    parser.add_argument('--dst', default=default_dst, help='Thư mục metadata dạng cột')
+    parser.add_argument('--embeddings-path', default=FAISS_EMBEDDINGS_PATH,
+                        help="File .npy nhận embeddings tách từ .npz ('' để giữ trong thư mục metadata)")
+    args = parser.parse_args()
+    migrate(args.src, args.dst, args.embeddings_path or None)
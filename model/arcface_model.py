@@ -1,15 +1,13 @@
 import torch
 import numpy as np
-import cv2
-from albumentations.pytorch import ToTensorV2
-import albumentations as A
 import sys
+from model.preprocess import BatchPreprocessor
 # sys.path.append('/home/intern1/lab/face_recognition/casia-webface/insightface/recognition/arcface_torch')
 sys.path.append('C:/Users/DELL/Downloads/archive/face_api/insightface/recognition/arcface_torch')
 from backbones import get_model
 
 class ArcFaceFeatureExtractor:
-    def __init__(self, model_path='ms1mv3_arcface_r18_fp16.pth', model_version='r18', device=None, img_size=112):
+    def __init__(self, model_path='ms1mv3_arcface_r18_fp16.pth', model_version='r18', device=None, img_size=112, to_rgb=False):
         self.model_path = model_path
         self.model_version = model_version
         self.img_size = img_size
@@ -20,11 +18,9 @@ class ArcFaceFeatureExtractor:
         else:
             self.device = device
         self.model = self._load_model()
-        self.val_aug = A.Compose([
-            A.Resize(self.img_size, self.img_size),
-            A.Normalize(mean=(0.5,0.5,0.5), std=(0.5,0.5,0.5)),
-            ToTensorV2()
-        ])
+        # Resize + normalize (x/127.5 - 1) + NCHW vào buffer float32 dùng lại, thay cho albumentations.
+        # to_rgb=False giữ thứ tự kênh BGR như pipeline cũ để embedding khớp với index đã lưu.
+        self.preprocess = BatchPreprocessor(img_size=self.img_size, to_rgb=to_rgb)
 
     def _load_model(self):
         model = get_model(self.model_version, fp16=True)
@@ -34,17 +30,19 @@ class ArcFaceFeatureExtractor:
         return model
 
     @torch.no_grad()
+    def extract_batch(self, imgs):
+        """
+        Trích xuất embedding cho nhiều ảnh trong MỘT lần forward.
+        imgs: list đường dẫn hoặc numpy array BGR. Trả về numpy array (N, 512).
+        """
+        if len(imgs) == 0:
+            return np.empty((0, 512), dtype=np.float32)
+        # torch.from_numpy dùng chung bộ nhớ với buffer, không copy thêm trên CPU
+        batch = torch.from_numpy(self.preprocess(imgs)).to(self.device)
+        return self.model(batch).float().cpu().numpy()
+
     def extract(self, img):
-        # img: đường dẫn hoặc numpy array
-        if isinstance(img, str):
-            img = cv2.imread(img)
-        if img is None or len(img.shape) != 3 or img.shape[2] != 3:
-            img = np.zeros((self.img_size, self.img_size, 3), dtype=np.uint8)
-        else:
-            img = cv2.resize(img, (self.img_size, self.img_size))
-        img = self.val_aug(image=img)['image'].unsqueeze(0).to(self.device)
-        emb = self.model(img).cpu().numpy()[0]
-        return emb
+        return self.extract_batch([img])[0]
 
 # Example usage:
 # extractor = ArcFaceFeatureExtractor('ms1mv3_arcface_r18_fp16.pth', model_version='r18')
@@ -0,0 +1,56 @@
+import importlib.util
+import os
+
+import numpy as np
+
+# Dùng trực tiếp source InsightFace tích hợp sẵn (giống arcface_torch trong arcface_model.py).
+# Nạp từng file thay vì `import insightface` vì __init__ của package kéo theo nhiều module nặng.
+INSIGHTFACE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               'insightface', 'python-package', 'insightface')
+
+
+def _load_module(name, relative_path):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(INSIGHTFACE_DIR, relative_path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FaceDetector:
+    """
+    Phát hiện khuôn mặt bằng SCRFD (ONNX, CPU) và căn chỉnh 5 điểm về crop 112x112 chuẩn ArcFace.
+    Cần model SCRFD có landmark (vd. scrfd_10g_bnkps.onnx).
+    """
+
+    def __init__(self, model_path, det_size=(640, 640), det_thresh=0.5, nms_thresh=0.4, num_threads=0):
+        import onnxruntime
+        scrfd = _load_module('scrfd', os.path.join('model_zoo', 'scrfd.py'))
+        self._face_align = _load_module('face_align', os.path.join('utils', 'face_align.py'))
+
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        session = onnxruntime.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.model = scrfd.SCRFD(model_file=model_path, session=session)
+        if not self.model.use_kps:
+            raise ValueError(f'Model SCRFD {model_path} không có landmark 5 điểm, không căn chỉnh được khuôn mặt')
+        self.det_size = tuple(det_size)
+        self.model.prepare(-1, det_thresh=det_thresh, nms_thresh=nms_thresh, input_size=self.det_size)
+
+    def detect(self, img, max_num=0):
+        """
+        img: numpy array BGR. Trả về (bboxes (N, 5) [x1, y1, x2, y2, score], kpss (N, 5, 2)),
+        sắp theo score giảm dần (hoặc theo kích thước/độ gần tâm khi max_num > 0).
+        """
+        bboxes, kpss = self.model.detect(img, input_size=self.det_size, max_num=max_num)
+        return bboxes, kpss
+
+    def align(self, img, kps, image_size=112):
+        """Căn chỉnh khuôn mặt theo 5 landmark về crop image_size x image_size (BGR)."""
+        return self._face_align.norm_crop(img, landmark=np.asarray(kps, dtype=np.float32), image_size=image_size)
+
+    def detect_and_align(self, img, max_num=0, image_size=112):
+        """Trả về (bboxes, kpss, list crop đã căn chỉnh) cho mọi khuôn mặt trong ảnh."""
+        bboxes, kpss = self.detect(img, max_num=max_num)
+        crops = [self.align(img, kps, image_size) for kps in kpss]
+        return bboxes, kpss, crops
@@ -0,0 +1,51 @@
+import threading
+
+import numpy as np
+import cv2
+
+
+class BatchPreprocessor:
+    """
+    Tiền xử lý ảnh BGR (numpy) cho ArcFace thẳng vào một buffer float32 NCHW dùng lại giữa các lần gọi:
+    resize -> (BGR->RGB tùy chọn) -> (x/127.5 - 1) -> NCHW, không tạo mảng trung gian cho từng ảnh.
+    Buffer riêng cho mỗi thread nên có thể gọi đồng thời từ nhiều thread.
+    """
+
+    def __init__(self, img_size=112, to_rgb=False):
+        self.img_size = img_size
+        self.to_rgb = to_rgb
+        self._local = threading.local()
+
+    def _buffers(self, n):
+        local = self._local
+        batch = getattr(local, 'batch', None)
+        if batch is None or batch.shape[0] < n:
+            capacity = max(n, 2 * batch.shape[0] if batch is not None else 16)
+            local.batch = batch = np.empty((capacity, 3, self.img_size, self.img_size), dtype=np.float32)
+            local.resized = np.empty((self.img_size, self.img_size, 3), dtype=np.uint8)
+        return batch, local.resized
+
+    def __call__(self, imgs):
+        """
+        imgs: list đường dẫn hoặc numpy array BGR (H, W, 3) uint8.
+        Trả về view (N, 3, img_size, img_size) float32 trên buffer dùng chung của thread,
+        chỉ hợp lệ tới lần gọi tiếp theo trên cùng thread.
+        """
+        n = len(imgs)
+        batch, resized = self._buffers(n)
+        size = (self.img_size, self.img_size)
+        for i, img in enumerate(imgs):
+            if isinstance(img, str):
+                img = cv2.imread(img)
+            if img is None or img.ndim != 3 or img.shape[2] != 3:
+                # Ảnh lỗi: giống pipeline cũ, dùng ảnh đen (0 -> -1 sau normalize)
+                batch[i].fill(-1.0)
+                continue
+            if img.shape[:2] != size:
+                img = cv2.resize(img, size, dst=resized)
+            if self.to_rgb:
+                img = img[..., ::-1]
+            # HWC uint8 -> CHW float32 và chia 127.5 trong một lần ghi vào buffer
+            np.multiply(img.transpose(2, 0, 1), np.float32(1 / 127.5), out=batch[i], dtype=np.float32)
+            batch[i] -= 1.0
+        return batch[:n]
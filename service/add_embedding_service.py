@@ -2,7 +2,8 @@ from fastapi import APIRouter, File, UploadFile, Form, Depends
 from fastapi.responses import JSONResponse
 import numpy as np
 import cv2
-from service.shared_instances import get_extractor, get_faiss_manager, get_faiss_lock
+from service.shared_instances import get_extractor, get_faiss_manager, get_faiss_lock, apply_faiss_mutation
+from service.face_pipeline import enroll_crop
 from db.nguoi_repository import NguoiRepository
 from db.models import Nguoi
 from Depend.depend import AddEmbeddingInput
@@ -27,17 +28,17 @@ def add_embedding_service(
     file: UploadFile = File(...)
 ):
     # ✅ Kiểm tra kết nối FAISS - không load lại
-    with faiss_lock:
+    with faiss_lock.read():
         try:
             _ = faiss_manager.image_ids
         except Exception as e:
             return {"message": f"Không thể kết nối FAISS: {e}", "status_code": 500}
-    
-    # Kiểm tra tồn tại image_id hoặc image_path
-    if str(input.image_id) in [str(id) for id in faiss_manager.image_ids]:
-        return {"message": f"image_id {input.image_id} đã tồn tại!", "status_code": 400}
-    if input.image_path in faiss_manager.image_paths:
-        return {"message": f"image_path {input.image_path} đã tồn tại!", "status_code": 400}
+
+        # Kiểm tra tồn tại image_id hoặc image_path qua bảng tra cứu (trong read lock: không đọc lúc writer đang sửa metadata)
+        if faiss_manager.get_row(input.image_id) is not None:
+            return {"message": f"image_id {input.image_id} đã tồn tại!", "status_code": 400}
+        if faiss_manager.get_row_by_path(input.image_path) is not None:
+            return {"message": f"image_path {input.image_path} đã tồn tại!", "status_code": 400}
     # Đọc ảnh từ file upload
     try:
         image_bytes = file.file.read()
@@ -45,9 +46,18 @@ def add_embedding_service(
         img = cv2.imdecode(np_img, cv2.IMREAD_COLOR)
     except Exception as e:
         return {"message": f"Lỗi đọc ảnh: {e}", "status_code": 400}
+    if img is None:
+        return {"message": "Không thể decode ảnh!", "status_code": 400}
+    # Phát hiện + căn chỉnh khuôn mặt như các API truy vấn
+    try:
+        face = enroll_crop(img)
+    except Exception as e:
+        return {"message": f"Lỗi phát hiện khuôn mặt: {e}", "status_code": 500}
+    if face is None:
+        return {"message": "Không tìm thấy khuôn mặt trong ảnh!", "status_code": 400}
     # Tiền xử lý và trích xuất embedding
     try:
-        embedding = extractor.extract(img)
+        embedding = extractor.extract(face)
     except Exception as e:
         return {"message": f"Lỗi trích xuất embedding: {e}", "status_code": 500}
     # Kiểm tra kết nối MySQL trước khi thêm vào FAISS
@@ -57,15 +67,14 @@ def add_embedding_service(
         return {"message": f"Không thể kết nối MySQL: {e}", "status_code": 500}
 
     try:
-        # ✅ Thread-safe FAISS operations
-        with faiss_lock:
-            faiss_manager.add_embeddings(
-                np.array([embedding]),
-                [input.image_id],
-                [input.image_path],
-                [input.class_id]
-            )
-            faiss_manager.save()
+        # ✅ Thread-safe FAISS operations (write lock cục bộ hoặc gửi sang process writer)
+        apply_faiss_mutation(
+            'add_embeddings',
+            np.array([embedding]),
+            [input.image_id],
+            [input.image_path],
+            [input.class_id]
+        )
         
         if not nguoi_exist:
             gioitinh_str = "Nam" if input.gioitinh else "Nữ"
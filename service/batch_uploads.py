@@ -0,0 +1,65 @@
+# ===== BATCH UPLOADS =====
+# File: face_api/service/batch_uploads.py
+# Mục đích: Gom ảnh từ các file upload của /query_batch (ảnh rời hoặc file zip), kiểm tra số ảnh và dung lượng
+#           trước khi đọc/giải nén, để một request không chiếm bộ nhớ/CPU của worker.
+
+import io
+import zipfile
+
+from config import BATCH_QUERY_MAX_IMAGES, BATCH_QUERY_MAX_ZIP_ENTRIES, BATCH_QUERY_MAX_UNZIPPED_BYTES, MAX_IMAGE_SIZE
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+
+
+class UploadLimitError(ValueError):
+    """Request vượt giới hạn số ảnh / dung lượng (kiểm tra trước khi giải nén)."""
+
+
+def is_zip(filename, data):
+    return (filename or '').lower().endswith('.zip') or zipfile.is_zipfile(io.BytesIO(data))
+
+
+def expand_uploads(uploads):
+    """
+    Gom (tên file, bytes) từ các file upload; file zip được giải nén thành từng ảnh.
+    Mỗi ảnh (ảnh rời, hoặc mục trong zip theo ZipInfo.file_size) tối đa MAX_IMAGE_SIZE byte. Số mục, số ảnh và
+    dung lượng sau giải nén (zipfile không đọc quá file_size) được kiểm tra trên central directory trước khi đọc
+    bất kỳ mục nào, nên zip bomb / zip hàng trăm nghìn mục bị từ chối ngay.
+    """
+    items = []
+    pending = []
+    total_images = 0
+    total_bytes = 0
+    for filename, data in uploads:
+        if not is_zip(filename, data):
+            if len(data) > MAX_IMAGE_SIZE:
+                raise UploadLimitError(f'Ảnh {filename} vượt quá {MAX_IMAGE_SIZE} byte')
+            total_images += 1
+            total_bytes += len(data)
+            pending.append((filename, data, None))
+            continue
+        zf = zipfile.ZipFile(io.BytesIO(data))
+        infos = zf.infolist()
+        if len(infos) > BATCH_QUERY_MAX_ZIP_ENTRIES:
+            raise UploadLimitError(f'File zip {filename} có {len(infos)} mục, tối đa {BATCH_QUERY_MAX_ZIP_ENTRIES}')
+        members = [info for info in infos
+                   if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS)]
+        for info in members:
+            if info.file_size > MAX_IMAGE_SIZE:
+                raise UploadLimitError(f'Ảnh {filename}/{info.filename} vượt quá {MAX_IMAGE_SIZE} byte sau giải nén')
+        total_images += len(members)
+        total_bytes += sum(info.file_size for info in members)
+        pending.append((filename, zf, members))
+    if total_images > BATCH_QUERY_MAX_IMAGES:
+        raise UploadLimitError(f'Tối đa {BATCH_QUERY_MAX_IMAGES} ảnh mỗi request, nhận được {total_images}')
+    if total_bytes > BATCH_QUERY_MAX_UNZIPPED_BYTES:
+        raise UploadLimitError(f'Tổng dung lượng ảnh {total_bytes} byte vượt quá {BATCH_QUERY_MAX_UNZIPPED_BYTES} byte')
+
+    for filename, source, members in pending:
+        if members is None:
+            items.append((filename, source))
+            continue
+        with source:
+            for info in members:
+                items.append((f'{filename}/{info.filename}', source.read(info)))
+    return items
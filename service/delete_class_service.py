@@ -2,7 +2,7 @@ from fastapi import APIRouter, Query, Form, Depends
 from fastapi.responses import JSONResponse
 import numpy as np
 
-from service.shared_instances import get_faiss_manager, get_faiss_lock
+from service.shared_instances import get_faiss_manager, get_faiss_lock, apply_faiss_mutation
 from service.performance_monitor import track_operation
 from db.nguoi_repository import NguoiRepository
 from Depend.depend import DeleteClassInput
@@ -20,7 +20,7 @@ def delete_class_service(
     input: DeleteClassInput = Depends(DeleteClassInput.as_form)
                  ):
     # ✅ Kiểm tra kết nối FAISS - không load lại
-    with faiss_lock:
+    with faiss_lock.read():
         try:
             _ = faiss_manager.class_ids
         except Exception as e:
@@ -42,20 +42,14 @@ def delete_class_service(
     #     print(f'Không reconstruct được embedding image-id={image_id_check} trước khi xóa: {e}')
 
     # Kiểm tra class_id có tồn tại trong metadata không
-    class_ids_set = set([int(cid) for cid in faiss_manager.class_ids])
-    if int(input.class_id) not in class_ids_set:
+    with faiss_lock.read():
+        class_exists = faiss_manager.has_class_id(input.class_id)
+    if not class_exists:
         print(f'class_id={input.class_id} không tồn tại trong không gian embedding.')
         return {"message": f"class_id={input.class_id} không tồn tại trong không gian embedding.", "status_code": 404}
-    # Lấy các image_id cần xóa
-    idx_to_delete = [int(faiss_manager.image_ids[i]) for i, cid in enumerate(faiss_manager.class_ids) if int(cid) == int(input.class_id)]
-    if not idx_to_delete:
-        print(f'Không tìm thấy vector với class_id={input.class_id}')
     
     # ✅ Thread-safe delete operation
-    with faiss_lock:
-        success = faiss_manager.delete_by_class_id(input.class_id)
-        if success:
-            faiss_manager.save()
+    success = apply_faiss_mutation('delete_by_class_id', input.class_id)
     
     if success:
         # Xóa trường người có class_id tương ứng trong bảng nguoi
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Form, Depends
 from fastapi.responses import JSONResponse
 
-from service.shared_instances import get_faiss_manager, get_faiss_lock
+from service.shared_instances import get_faiss_manager, get_faiss_lock, apply_faiss_mutation
 from service.performance_monitor import track_operation
 from db.nguoi_repository import NguoiRepository
 from Depend.depend import DeleteImageInput
@@ -19,7 +19,7 @@ def delete_image_service(
     input: DeleteImageInput = Depends(DeleteImageInput.as_form)
     ):
     # ✅ Kiểm tra kết nối FAISS - không load lại
-    with faiss_lock:
+    with faiss_lock.read():
         try:
             _ = faiss_manager.image_ids
         except Exception as e:
@@ -33,22 +33,18 @@ def delete_image_service(
     
     try:
         # Lấy class_id trước khi xóa
-        idxs = [i for i, img_id in enumerate(faiss_manager.image_ids) if str(img_id) == str(input.image_id)]
-        class_id = None
-        if idxs:
-            class_id = int(faiss_manager.class_ids[idxs[0]])
+        with faiss_lock.read():
+            class_id = faiss_manager.get_class_id(input.image_id)
         
-        # ✅ Thread-safe delete operation
-        with faiss_lock:
-            result = faiss_manager.delete_by_image_id(input.image_id)
-            if result:
-                faiss_manager.save()
+        # ✅ Thread-safe delete operation (write lock cục bộ hoặc gửi sang process writer)
+        result = apply_faiss_mutation('delete_by_image_id', input.image_id)
         
         if result:
             # Kiểm tra còn ảnh nào thuộc class_id không
             if class_id is not None:
-                ids_left = faiss_manager.get_image_ids_by_class(class_id)
-                if not ids_left:
+                with faiss_lock.read():
+                    class_left = faiss_manager.has_class_id(class_id)
+                if not class_left:
                     nguoi_repo.delete_by_class_id(class_id)
                     return {"message": f"Đã xóa embedding cho image_id={input.image_id} và xóa luôn người class_id={class_id} vì không còn ảnh nào."}
             return {"message": f"Đã xóa embedding cho image_id={input.image_id}"}
@@ -3,10 +3,12 @@ from fastapi.responses import JSONResponse
 
 from service.shared_instances import get_faiss_manager, get_faiss_lock
 from service.performance_monitor import track_operation
+from db.nguoi_repository import NguoiRepository
 
 # ✅ Sử dụng shared instances
 faiss_manager = get_faiss_manager()
 faiss_lock = get_faiss_lock()
+nguoi_repo = NguoiRepository()
 
 router = APIRouter()
 
@@ -18,6 +20,15 @@ def search_embeddings_api(
     page_size: int = Query(15, ge=1, le=15, description='Số kết quả mỗi trang')
 ):
     # ✅ Thread-safe query operation - không load lại
-    with faiss_lock:
+    with faiss_lock.read():
         result = faiss_manager.query_embeddings_by_string(query, page, page_size)
+    # Thông tin người của cả trang trong một truy vấn MySQL (ngoài FAISS lock)
+    try:
+        nguoi_by_class = nguoi_repo.get_by_class_ids(item['class_id'] for item in result['results'])
+    except Exception as e:
+        print(f"Lỗi truy vấn MySQL: {e}")
+        nguoi_by_class = {}
+    for item in result['results']:
+        nguoi = nguoi_by_class.get(str(item['class_id']))
+        item['nguoi'] = nguoi.to_dict() if nguoi else None
     return result
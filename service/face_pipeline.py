@@ -0,0 +1,64 @@
+# ===== FACE PIPELINE: DETECT -> ALIGN -> EMBED =====
+# File: face_api/service/face_pipeline.py
+# Mục đích: Phát hiện mọi khuôn mặt trong ảnh (SCRFD), căn chỉnh 5 điểm về 112x112 và trích xuất
+#           embedding cho tất cả khuôn mặt trong một lần forward qua micro-batcher.
+
+from service.shared_instances import get_inference_batcher, get_face_detector
+from service.stage_executor import run_in_stage
+from config import DET_MAX_FACES
+
+inference_batcher = get_inference_batcher()
+face_detector = get_face_detector()
+
+
+def detection_enabled():
+    return face_detector is not None
+
+
+async def detect_faces(image, max_num=DET_MAX_FACES):
+    """Trả về (bboxes (N, 5), kpss (N, 5, 2), list crop 112x112 đã căn chỉnh)."""
+    return await run_in_stage('detect', face_detector.detect_and_align, image, max_num)
+
+
+async def embed_faces(image, max_num=DET_MAX_FACES):
+    """
+    Detect -> align -> embed cho mọi khuôn mặt trong ảnh.
+    Trả về list dict {bbox, det_score, kps, embedding}; list rỗng nếu không thấy khuôn mặt.
+    """
+    bboxes, kpss, crops = await detect_faces(image, max_num)
+    if not crops:
+        return []
+    embs = await inference_batcher.extract_batch(crops)
+    return [
+        {
+            'bbox': [round(float(v), 1) for v in bbox[:4]],
+            'det_score': round(float(bbox[4]), 4),
+            'kps': [[round(float(x), 1), round(float(y), 1)] for x, y in kps],
+            'embedding': emb
+        }
+        for bbox, kps, emb in zip(bboxes, kpss, embs)
+    ]
+
+
+async def face_crop(image):
+    """
+    Ảnh đưa vào ArcFace cho các API một khuôn mặt (/query, /query_top5, /query_batch):
+    khuôn mặt chính (lớn, gần tâm) đã căn chỉnh khi bật detection, nếu không thấy khuôn mặt
+    hoặc tắt detection thì dùng cả ảnh như trước.
+    """
+    if not detection_enabled():
+        return image
+    _, _, crops = await detect_faces(image, max_num=1)
+    return crops[0] if crops else image
+
+
+def enroll_crop(image):
+    """
+    Bản đồng bộ của face_crop cho các API ghi (/add_embedding, /edit_embedding): embedding lưu vào FAISS
+    phải cùng không gian với embedding truy vấn. Khi bật detection trả về khuôn mặt chính đã căn chỉnh,
+    None nếu không thấy khuôn mặt (không lưu embedding của cả khung hình); tắt detection thì dùng cả ảnh.
+    """
+    if not detection_enabled():
+        return image
+    _, _, crops = face_detector.detect_and_align(image, max_num=1)
+    return crops[0] if crops else None
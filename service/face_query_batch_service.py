@@ -0,0 +1,104 @@
+from fastapi import APIRouter, File, UploadFile
+import asyncio
+import numpy as np
+import cv2
+import time
+import zipfile
+
+from service.shared_instances import get_inference_batcher, get_faiss_manager, get_faiss_lock
+from service.performance_monitor import track_operation
+from service.stage_executor import run_in_stage
+from service.face_pipeline import face_crop
+from db.nguoi_repository import NguoiRepository
+from db.async_repository import AsyncNguoiRepository
+from db.mysql_conn import MYSQL_ASYNC_ENABLED
+from service.batch_uploads import expand_uploads, UploadLimitError
+
+# ✅ Sử dụng shared instances
+inference_batcher = get_inference_batcher()
+faiss_manager = get_faiss_manager()
+faiss_lock = get_faiss_lock()
+nguoi_repo = NguoiRepository()
+async_nguoi_repo = AsyncNguoiRepository()
+
+face_query_batch_router = APIRouter()
+
+# Cùng ngưỡng với /query: score trên 0.45 được xem là khớp
+MATCH_THRESHOLD = 0.45
+
+
+def _decode_all(items):
+    return [cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR) for _, data in items]
+
+
+def _search_batch(embs, topk):
+    with faiss_lock.read():
+        return faiss_manager.query_batch(embs, topk=topk)
+
+
+def _lookup_nguoi(class_ids):
+    """Tra cứu thông tin người của mọi class_id khác nhau trong một truy vấn MySQL."""
+    try:
+        found = nguoi_repo.get_by_class_ids(class_ids)
+    except Exception as e:
+        print(f"Lỗi truy vấn MySQL: {e}")
+        return {}
+    return {class_id: found[str(class_id)].to_dict() for class_id in class_ids if str(class_id) in found}
+
+
+async def _lookup_nguoi_async(class_ids):
+    """Như _lookup_nguoi nhưng await aiomysql trên event loop (MYSQL_ASYNC_ENABLED)."""
+    try:
+        found = await async_nguoi_repo.get_by_class_ids(class_ids)
+    except Exception as e:
+        print(f"Lỗi truy vấn MySQL: {e}")
+        return {}
+    return {class_id: found[str(class_id)].to_dict() for class_id in class_ids if str(class_id) in found}
+
+
+@track_operation("face_query_batch")
+async def query_face_batch_service(files, topk=1):
+    start_total = time.time()
+    uploads = [(f.filename, await f.read()) for f in files]
+    try:
+        items = await run_in_stage('decode', expand_uploads, uploads)
+    except zipfile.BadZipFile as e:
+        return {"error": f"File zip không hợp lệ: {e}", "status_code": 400}
+    except UploadLimitError as e:
+        return {"error": str(e), "status_code": 400}
+    if not items:
+        return {"error": "Không có ảnh nào trong request!", "status_code": 400}
+
+    images = await run_in_stage('decode', _decode_all, items)
+    valid = [i for i, img in enumerate(images) if img is not None]
+
+    # Ảnh được gom batch qua micro-batcher, sau đó một lần search trên ma trận (N, 512)
+    crops = await asyncio.gather(*(face_crop(images[i]) for i in valid))
+    embs = await inference_batcher.extract_batch(crops)
+    batch_results = await run_in_stage('index', _search_batch, embs, topk)
+
+    matched_class_ids = {r['class_id'] for results in batch_results for r in results if r['score'] > MATCH_THRESHOLD}
+    if MYSQL_ASYNC_ENABLED:
+        nguoi_by_class = await _lookup_nguoi_async(matched_class_ids)
+    else:
+        nguoi_by_class = await run_in_stage('db', _lookup_nguoi, matched_class_ids)
+
+    resp = [{'filename': filename, 'error': 'Lỗi: Không decode được ảnh!'} for filename, _ in items]
+    for i, results in zip(valid, batch_results):
+        matches = []
+        for r in results:
+            if r['score'] <= MATCH_THRESHOLD:
+                continue
+            item = {
+                'image_id': r['image_id'],
+                'image_path': str(r['image_path']),
+                'class_id': str(r['class_id']),
+                'score': r['score']
+            }
+            if r['class_id'] in nguoi_by_class:
+                item['nguoi'] = nguoi_by_class[r['class_id']]
+            matches.append(item)
+        resp[i] = {'filename': items[i][0], 'results': matches}
+
+    print(f'Batch query: {len(items)} ảnh, {len(valid)} hợp lệ, tổng thời gian {time.time() - start_total:.3f}s')
+    return {"results": resp, "total_images": len(items), "total_time": round(time.time() - start_total, 3)}
@@ -0,0 +1,88 @@
+from fastapi import UploadFile, File
+import time
+
+from service.shared_instances import get_faiss_manager, get_faiss_lock
+from service.performance_monitor import track_operation
+from service.stage_executor import run_in_stage
+from service.face_query_service import decode_image
+from service.face_pipeline import detection_enabled, embed_faces
+from db.nguoi_repository import NguoiRepository
+from db.async_repository import AsyncNguoiRepository
+from db.mysql_conn import MYSQL_ASYNC_ENABLED
+
+# ✅ Sử dụng shared instances
+faiss_manager = get_faiss_manager()
+faiss_lock = get_faiss_lock()
+nguoi_repo = NguoiRepository()
+async_nguoi_repo = AsyncNguoiRepository()
+
+# Cùng ngưỡng với /query: score trên 0.45 được xem là khớp
+MATCH_THRESHOLD = 0.45
+
+
+def _search_batch(embs, topk):
+    with faiss_lock.read():
+        return faiss_manager.query_batch(embs, topk=topk)
+
+
+def _lookup_nguoi(class_ids):
+    """Một truy vấn MySQL cho mọi class_id khớp trong ảnh."""
+    try:
+        return nguoi_repo.get_by_class_ids(class_ids)
+    except Exception as e:
+        print(f"Lỗi truy vấn MySQL: {e}")
+        return {}
+
+
+async def _lookup_nguoi_async(class_ids):
+    """Như _lookup_nguoi nhưng await aiomysql trên event loop (MYSQL_ASYNC_ENABLED)."""
+    try:
+        return await async_nguoi_repo.get_by_class_ids(class_ids)
+    except Exception as e:
+        print(f"Lỗi truy vấn MySQL: {e}")
+        return {}
+
+
+@track_operation("face_query_faces")
+async def query_faces_service(file: UploadFile = File(...), topk=1):
+    start_total = time.time()
+    if not detection_enabled():
+        return {"error": "Face detection chưa được bật (FACE_DETECTION_ENABLED) hoặc không load được detector", "status_code": 503}
+
+    image_bytes = await file.read()
+    image = await run_in_stage('decode', decode_image, image_bytes)
+    if image is None:
+        return {"error": "Lỗi: Không decode được ảnh!", "status_code": 400}
+
+    # Detect -> align -> một lần forward cho mọi khuôn mặt -> một lần search FAISS
+    faces = await embed_faces(image)
+    if not faces:
+        return {"faces": [], "total_faces": 0, "total_time": round(time.time() - start_total, 3)}
+    embs = [face.pop('embedding') for face in faces]
+    batch_results = await run_in_stage('index', _search_batch, embs, topk)
+
+    matched_class_ids = {r['class_id'] for results in batch_results for r in results if r['score'] > MATCH_THRESHOLD}
+    if MYSQL_ASYNC_ENABLED:
+        nguoi_by_class = await _lookup_nguoi_async(matched_class_ids)
+    else:
+        nguoi_by_class = await run_in_stage('db', _lookup_nguoi, matched_class_ids)
+
+    for face, results in zip(faces, batch_results):
+        matches = []
+        for r in results:
+            if r['score'] <= MATCH_THRESHOLD:
+                continue
+            class_id = str(r['class_id'])
+            item = {
+                'image_id': r['image_id'],
+                'image_path': str(r['image_path']),
+                'class_id': class_id,
+                'score': r['score']
+            }
+            if class_id in nguoi_by_class:
+                item['nguoi'] = nguoi_by_class[class_id].to_dict()
+            matches.append(item)
+        face['results'] = matches
+
+    print(f'Query faces: {len(faces)} khuôn mặt, {len(matched_class_ids)} danh tính, tổng thời gian {time.time() - start_total:.3f}s')
+    return {"faces": faces, "total_faces": len(faces), "total_time": round(time.time() - start_total, 3)}
@@ -5,34 +5,48 @@ import cv2
 import time
 
 
-from service.shared_instances import get_extractor, get_faiss_manager, get_faiss_lock
+from service.shared_instances import get_inference_batcher, get_faiss_manager, get_faiss_lock
+from service.stage_executor import run_in_stage, StageOverloadedError
+from service.face_pipeline import face_crop
 from db.nguoi_repository import NguoiRepository
+from db.async_repository import AsyncNguoiRepository
+from db.mysql_conn import MYSQL_ASYNC_ENABLED
 
 
 # ✅ Sử dụng shared instances thay vì tạo mới
-extractor = get_extractor()
+inference_batcher = get_inference_batcher()
 faiss_manager = get_faiss_manager()
 faiss_lock = get_faiss_lock()
 nguoi_repo = NguoiRepository()
+async_nguoi_repo = AsyncNguoiRepository()
 print('✅ Shared instances initialized for face_query_service')
 
 router = APIRouter()
 
+
+def decode_image(image_bytes):
+    return cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+
+
+def search_faiss(emb, topk):
+    # ✅ Thread-safe FAISS query
+    with faiss_lock.read():
+        return faiss_manager.query(emb, topk=topk)
+
 async def query_face_service(file: UploadFile = File(...)):
     # ✅ Không load lại FAISS mỗi request - sử dụng thread-safe access
     start_total = time.time()
     
     image_bytes = await file.read()
-    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    # Decode, model, FAISS và MySQL chạy trên thread pool riêng, không chặn event loop
+    image = await run_in_stage('decode', decode_image, image_bytes)
     if image is None:
         print('Lỗi: Không decode được ảnh!')
         return {"error": "Lỗi: Không decode được ảnh!", "status_code": 400}
     
-    emb = extractor.extract(image)
+    emb = await inference_batcher.extract(await face_crop(image))
     
-    # ✅ Thread-safe FAISS query
-    with faiss_lock:
-        results = faiss_manager.query(emb, topk=1)
+    results = await run_in_stage('index', search_faiss, emb, 1)
     
     print(f'Results: {results}')
     print(f'Tổng thời gian xử lý: {time.time() - start_total:.3f}s')
@@ -41,7 +55,13 @@ async def query_face_service(file: UploadFile = File(...)):
         print('Trả về thông tin top1')
         class_id = str(results[0]['class_id'])
         try:
-            nguoi = nguoi_repo.get_by_class_id(class_id)
+            if MYSQL_ASYNC_ENABLED:
+                # aiomysql: chờ MySQL ngay trên event loop, không chiếm thread của stage 'db'
+                nguoi = await async_nguoi_repo.get_by_class_id(class_id)
+            else:
+                nguoi = await run_in_stage('db', nguoi_repo.get_by_class_id, class_id)
+        except StageOverloadedError:
+            raise
         except Exception as e:
             print(f"Lỗi truy vấn MySQL: {e}")
             nguoi = None
@@ -4,49 +4,75 @@ import numpy as np
 import cv2
 import time
 
-from service.shared_instances import get_extractor, get_faiss_manager, get_faiss_lock
+from service.shared_instances import get_inference_batcher, get_faiss_manager, get_faiss_lock
 from service.performance_monitor import track_operation
+from service.stage_executor import run_in_stage
+from service.face_pipeline import face_crop
+from service.face_query_service import decode_image, search_faiss
 from db.nguoi_repository import NguoiRepository
+from db.async_repository import AsyncNguoiRepository
+from db.mysql_conn import MYSQL_ASYNC_ENABLED
 
 # ✅ Sử dụng shared instances
-extractor = get_extractor()
+inference_batcher = get_inference_batcher()
 faiss_manager = get_faiss_manager()
 faiss_lock = get_faiss_lock()
 nguoi_repo = NguoiRepository()
+async_nguoi_repo = AsyncNguoiRepository()
 
 face_query_top5_router = APIRouter()
 
+def build_top5_response(results):
+    """Ghép kết quả FAISS với thông tin người từ MySQL (chạy trên thread pool stage 'db'), một truy vấn cho cả top-k."""
+    results = [r for r in results if r['score'] > 0]
+    try:
+        nguoi_by_class = nguoi_repo.get_by_class_ids(int(r['class_id']) for r in results)
+    except Exception:
+        nguoi_by_class = {}
+    return format_top5_response(results, nguoi_by_class)
+
+
+async def build_top5_response_async(results):
+    """Như build_top5_response nhưng await truy vấn MySQL qua aiomysql (MYSQL_ASYNC_ENABLED)."""
+    results = [r for r in results if r['score'] > 0]
+    try:
+        nguoi_by_class = await async_nguoi_repo.get_by_class_ids(int(r['class_id']) for r in results)
+    except Exception:
+        nguoi_by_class = {}
+    return format_top5_response(results, nguoi_by_class)
+
+
+def format_top5_response(results, nguoi_by_class):
+    resp = []
+    for r in results:
+        class_id = int(r['class_id'])
+        item = {
+            'image_id': int(r['image_id']),
+            'image_path': str(r['image_path']),
+            'class_id': class_id,
+            'score': float(r['score'])
+        }
+        nguoi = nguoi_by_class.get(str(class_id))
+        if nguoi:
+            item['nguoi'] = nguoi.to_dict()
+        resp.append(item)
+    return resp
+
+
 @track_operation("face_query_top5")
 async def query_face_top5_service(file: UploadFile = File(...)):
     # ✅ Thread-safe FAISS access
     start_total = time.time()
     image_bytes = await file.read()
-    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    image = await run_in_stage('decode', decode_image, image_bytes)
     if image is None:
         return {"error": "Lỗi: Không decode được ảnh!", "status_code": 400}
     
-    emb = extractor.extract(image)
+    emb = await inference_batcher.extract(await face_crop(image))
     
-    with faiss_lock:
-        results = faiss_manager.query(emb, topk=5)
-    resp = []
-    mysql_error = False
-    for r in results:
-        if r['score'] > 0:
-            class_id = int(r['class_id'])
-            nguoi = None
-            if not mysql_error:
-                try:
-                    nguoi = nguoi_repo.get_by_class_id(class_id)
-                except Exception:
-                    mysql_error = True
-            item = {
-                'image_id': int(r['image_id']),
-                'image_path': str(r['image_path']),
-                'class_id': class_id,
-                'score': float(r['score'])
-            }
-            if nguoi:
-                item['nguoi'] = nguoi.to_dict()
-            resp.append(item)
+    results = await run_in_stage('index', search_faiss, emb, 5)
+    if MYSQL_ASYNC_ENABLED:
+        resp = await build_top5_response_async(results)
+    else:
+        resp = await run_in_stage('db', build_top5_response, results)
     return {"results": resp, "total_time": round(time.time() - start_total, 3)}
@@ -15,7 +15,7 @@ nguoi_repo = NguoiRepository()
 @track_operation("get_image_ids_by_class")
 def get_image_ids_by_class_api_service(class_id: str = Query(..., description="Class ID cần truy vấn")):
     # ✅ Thread-safe query operation - không load lại
-    with faiss_lock:
+    with faiss_lock.read():
         image_ids = faiss_manager.get_image_ids_by_class(class_id)
     nguoi = None
     try:
@@ -0,0 +1,141 @@
+# ===== DYNAMIC MICRO-BATCHING =====
+# File: face_api/service/inference_batcher.py
+# Mục đích: Gom các request trích xuất embedding đồng thời thành một batch,
+#           chạy một lần forward trên thread inference riêng, không chặn event loop.
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from service.performance_monitor import Histogram
+from service.stage_executor import StageOverloadedError
+
+QUEUE_DEPTH_BUCKETS = [0, 1, 2, 4, 8, 16, 32, 64, 128]
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64]
+
+
+class InferenceBatcher:
+    """
+    Micro-batcher asyncio đặt trước ArcFaceFeatureExtractor.
+    - Mỗi caller `await extract(img)` nhận một future.
+    - Vòng lặp gom request tới khi đủ `max_batch` hoặc hết `max_wait_ms`, rồi chạy
+      extractor.extract_batch trên thread inference riêng và trả kết quả cho từng future.
+    - Trong lúc một batch đang chạy, request mới tiếp tục xếp hàng và tạo thành batch kế tiếp,
+      nên batch tự lớn lên khi tải tăng.
+    - `await extract_batch(imgs)` (request nhiều ảnh) không qua hàng đợi: chạy thẳng trên cùng thread inference
+      theo chunk `explicit_max_batch`, không bị cắt thành các batch `max_batch`.
+    """
+
+    def __init__(self, extractor, max_batch=16, max_wait_ms=5, max_queue=None, executor=None,
+                 explicit_max_batch=64):
+        self.extractor = extractor
+        self.max_queue = max_queue
+        self.max_batch = max_batch
+        self.explicit_max_batch = max(explicit_max_batch, 1)
+        self.max_wait = max_wait_ms / 1000.0
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix='arcface-inference')
+        self.queue_depth = Histogram(QUEUE_DEPTH_BUCKETS)
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self._queue = None
+        self._loop = None
+        self._task = None
+        self.rejected = 0
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        """Khởi động vòng lặp gom batch trên event loop hiện tại (lần đầu được gọi)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._task is not None and not self._task.done():
+            return
+        with self._start_lock:
+            if self._loop is not loop or self._task is None or self._task.done():
+                self._loop = loop
+                self._queue = asyncio.Queue()
+                self._task = loop.create_task(self._run())
+
+    async def extract(self, img):
+        """Trích xuất embedding cho một ảnh, được gom batch cùng các request đồng thời khác."""
+        self._ensure_started()
+        depth = self._queue.qsize()
+        self.queue_depth.observe(depth)
+        if self.max_queue is not None and depth >= self.max_queue:
+            # Backpressure: hàng đợi model đã đầy, từ chối thay vì để độ trễ tăng vô hạn
+            self.rejected += 1
+            raise StageOverloadedError('model')
+        future = self._loop.create_future()
+        self._queue.put_nowait((img, future))
+        return await future
+
+    async def extract_batch(self, imgs):
+        """
+        Trích xuất embedding cho nhiều ảnh của một request, trả về numpy array (N, 512).
+        Một ảnh thì gom batch như extract(); nhiều ảnh đã là một batch nên chạy thẳng extractor.extract_batch
+        trên thread inference (xen kẽ với các micro-batch), mỗi lần forward tối đa explicit_max_batch ảnh.
+        """
+        if len(imgs) == 0:
+            return np.empty((0, 512), dtype=np.float32)
+        if len(imgs) == 1:
+            return np.stack([await self.extract(imgs[0])])
+        depth = self._queue.qsize() if self._queue is not None else 0
+        if self.max_queue is not None and depth >= self.max_queue:
+            self.rejected += 1
+            raise StageOverloadedError('model')
+        loop = asyncio.get_running_loop()
+        embs = []
+        for start in range(0, len(imgs), self.explicit_max_batch):
+            chunk = list(imgs[start:start + self.explicit_max_batch])
+            self.batch_size.observe(len(chunk))
+            embs.append(await loop.run_in_executor(self.executor, self.extractor.extract_batch, chunk))
+        return np.concatenate(embs)
+
+    async def _collect(self):
+        """Lấy một batch: chờ request đầu tiên, sau đó gom thêm tới max_batch hoặc hết max_wait."""
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Bỏ qua request đã bị hủy (client ngắt kết nối)
+            batch = [(img, fut) for img, fut in batch if not fut.done()]
+            if not batch:
+                continue
+            self.batch_size.observe(len(batch))
+            try:
+                embs = await self._loop.run_in_executor(
+                    self.executor, self.extractor.extract_batch, [img for img, _ in batch]
+                )
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            for (_, fut), emb in zip(batch, embs):
+                if not fut.done():
+                    fut.set_result(emb)
+
+    def get_stats(self):
+        return {
+            'max_batch': self.max_batch,
+            'explicit_max_batch': self.explicit_max_batch,
+            'max_wait_ms': self.max_wait * 1000,
+            'max_queue': self.max_queue,
+            'pending': self._queue.qsize() if self._queue is not None else 0,
+            'rejected': self.rejected,
+            'queue_depth': self.queue_depth.snapshot(),
+            'batch_size': self.batch_size.snapshot()
+        }
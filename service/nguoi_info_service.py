@@ -16,3 +16,11 @@ def get_nguoi_info_service(
         }
     except Exception as e:
         return {"error": str(e)}
+
+
+def warm_up_nguoi_search():
+    """Dựng sẵn index tìm kiếm người khi khởi động để request /list_nguoi đầu tiên không phải chờ."""
+    try:
+        nguoi_repository.search_nguoi_paged("", 1, 1)
+    except Exception as e:
+        print(f"⚠️ Chưa dựng được index tìm kiếm người: {e}")
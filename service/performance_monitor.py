@@ -2,8 +2,10 @@
 # File: face_api/service/performance_monitor.py
 # Mục đích: Theo dõi hiệu suất FAISS operations
 
+import asyncio
 import time
 import functools
+import bisect
 import threading
 from typing import Dict, List
 from collections import defaultdict, deque
@@ -25,6 +27,16 @@ class PerformanceMonitor:
     def track_operation(self, operation_name: str):
         """Decorator để track thời gian operation"""
         def decorator(func):
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    start_time = time.time()
+                    try:
+                        return await func(*args, **kwargs)
+                    finally:
+                        self._record_stats(operation_name, time.time() - start_time)
+                return async_wrapper
+
             @functools.wraps(func)
             def wrapper(*args, **kwargs):
                 start_time = time.time()
@@ -78,6 +90,37 @@ class PerformanceMonitor:
         
         return "\n".join(summary)
 
+class Histogram:
+    """Histogram đơn giản với các bucket cố định (giá trị <= cận trên của bucket)"""
+
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # bucket cuối: lớn hơn mọi cận trên
+        self.count = 0
+        self.total = 0.0
+        self.max_value = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        """Ghi nhận một giá trị"""
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.count += 1
+            self.total += value
+            self.max_value = max(self.max_value, value)
+
+    def snapshot(self) -> Dict:
+        """Lấy số liệu hiện tại của histogram"""
+        with self._lock:
+            labels = [f'<={b}' for b in self.buckets] + [f'>{self.buckets[-1]}']
+            return {
+                'count': self.count,
+                'mean': round(self.total / self.count, 3) if self.count else 0,
+                'max': self.max_value,
+                'buckets': dict(zip(labels, self.counts))
+            }
+
 # Global monitor instance
 performance_monitor = PerformanceMonitor()
 
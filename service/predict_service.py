@@ -5,6 +5,7 @@ from torchvision import transforms, models
 from PIL import Image
 import io
 from config import *
+from service.stage_executor import run_in_stage
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
@@ -45,22 +46,30 @@ except Exception as e:
     model_gender = None
     print(f"Error loading models: {e}")
 
-# Service function giống face_query_service
-async def predict_service(file):
-    if model_age is None or model_gender is None:
-        return {"error": "Model not loaded", "status_code": 500}
-    # Đọc file bytes
+def _decode(contents):
     try:
-        contents = await file.read()
-        img = Image.open(io.BytesIO(contents)).convert("RGB")
+        return Image.open(io.BytesIO(contents)).convert("RGB")
     except Exception:
-        return {"error": "Invalid image file", "status_code": 400}
-    # Dự đoán
+        return None
+
+def _predict(img):
     img_tensor = transform(img).unsqueeze(0).to(device)
     with torch.no_grad():
         age_pred = max(0, int(model_age(img_tensor).item()))
         gender_logits = model_gender(img_tensor)
         gender_pred = torch.argmax(gender_logits, dim=1).item()
+    return age_pred, gender_pred
+
+# Service function giống face_query_service
+async def predict_service(file):
+    if model_age is None or model_gender is None:
+        return {"error": "Model not loaded", "status_code": 500}
+    # Đọc file bytes, decode và dự đoán trên thread pool riêng (không chặn event loop)
+    contents = await file.read()
+    img = await run_in_stage('decode', _decode, contents)
+    if img is None:
+        return {"error": "Invalid image file", "status_code": 400}
+    age_pred, gender_pred = await run_in_stage('model', _predict, img)
     return {
         "pred_age": age_pred,
         "pred_gender": gender_labels[gender_pred]
@@ -1,7 +1,7 @@
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 
-from service.shared_instances import get_faiss_manager, get_faiss_lock
+from service.shared_instances import get_faiss_manager, get_faiss_lock, apply_faiss_mutation
 from service.performance_monitor import track_operation
 from db.nguoi_repository import NguoiRepository
 
@@ -15,7 +15,7 @@ nguoi_repo = NguoiRepository()
 @track_operation("reset_index")
 def reset_index_api_service():
     # ✅ Thread-safe reset operation
-    with faiss_lock:
+    with faiss_lock.read():
         try:
             _ = faiss_manager.image_ids
         except Exception as e:
@@ -27,8 +27,7 @@ def reset_index_api_service():
         return {"message": f"Không thể kết nối MySQL: {e}", "status_code": 500}
     
     # ✅ Thread-safe reset operation
-    with faiss_lock:
-        faiss_manager.reset_index()
+    apply_faiss_mutation('reset_index')
     
     # Xóa toàn bộ dữ liệu bảng nguoi, giữ lại cấu trúc
     try:
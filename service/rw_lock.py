@@ -0,0 +1,105 @@
+# ===== READER-WRITER LOCK =====
+# File: face_api/service/rw_lock.py
+# Mục đích: Lock cho FAISS index: nhiều truy vấn (index.search nhả GIL) chạy song song với nhau,
+#           thay đổi (add/edit/delete/reset) độc quyền. Ưu tiên writer: khi có writer đang chờ,
+#           reader mới phải chờ để writer không bị đói giữa luồng truy vấn liên tục.
+
+import threading
+import time
+
+
+class _LockView:
+    """Context manager cho một chế độ của ReadWriteLock (dùng được với `with` và acquire/release)."""
+
+    __slots__ = ('acquire', 'release')
+
+    def __init__(self, acquire, release):
+        self.acquire = acquire
+        self.release = release
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+class ReadWriteLock:
+    """
+    - `with lock.read():`  truy vấn chỉ đọc (search, liệt kê, thống kê), chạy song song.
+    - `with lock.write():` thay đổi index/metadata, độc quyền.
+    - `with lock:` tương đương write(), giữ tương thích với code cũ dùng threading.Lock.
+    Không reentrant: không lấy read() lồng trong read()/write() trên cùng thread.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+        self._read_view = _LockView(self.acquire_read, self.release_read)
+        self._write_view = _LockView(self.acquire_write, self.release_write)
+        self.reads = 0
+        self.writes = 0
+        self.max_readers = 0
+        self.write_wait_ms_max = 0.0
+
+    def acquire_read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+            self.reads += 1
+            self.max_readers = max(self.max_readers, self._readers)
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        start = time.perf_counter()
+        with self._cond:
+            self._writers_waiting += 1
+            try:
+                while self._writer or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
+            self.writes += 1
+            self.write_wait_ms_max = max(self.write_wait_ms_max, (time.perf_counter() - start) * 1000)
+
+    def release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+    def read(self):
+        return self._read_view
+
+    def write(self):
+        return self._write_view
+
+    def __enter__(self):
+        self.acquire_write()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release_write()
+        return False
+
+    def get_stats(self):
+        with self._cond:
+            return {
+                'active_readers': self._readers,
+                'writer_active': self._writer,
+                'writers_waiting': self._writers_waiting,
+                'reads': self.reads,
+                'writes': self.writes,
+                'max_concurrent_readers': self.max_readers,
+                'write_wait_ms_max': round(self.write_wait_ms_max, 2)
+            }
@@ -4,7 +4,12 @@
 
 import threading
 from model.arcface_model import ArcFaceFeatureExtractor
-from index.faiss import FaissIndexManager
+from model.face_detector import FaceDetector
+from index.sharded import create_faiss_manager
+from index.writer import IndexWriterClient, read_authkey
+from service.inference_batcher import InferenceBatcher
+from service.stage_executor import get_stage
+from service.rw_lock import ReadWriteLock
 from config import *
 
 class SharedInstances:
@@ -27,21 +32,70 @@ class SharedInstances:
             # Feature Extractor - chỉ tạo 1 lần
             self.extractor = ArcFaceFeatureExtractor(
                 model_path=MODEL_PATH, 
-                device=None
+                device=None,
+                to_rgb=ARCFACE_INPUT_RGB
             )
             
-            # FAISS Manager - chỉ tạo 1 lần
-            self.faiss_manager = FaissIndexManager(
+            # Micro-batcher gom các request đồng thời vào một lần forward
+            self.inference_batcher = InferenceBatcher(
+                self.extractor,
+                max_batch=INFERENCE_MAX_BATCH,
+                max_wait_ms=INFERENCE_MAX_WAIT_MS,
+                max_queue=INFERENCE_MAX_QUEUE,
+                explicit_max_batch=INFERENCE_EXPLICIT_MAX_BATCH,
+                executor=get_stage('model').executor
+            )
+            
+            # Face detector (SCRFD) - tùy chọn, lỗi khi load thì quay về embed cả ảnh
+            self.face_detector = None
+            if FACE_DETECTION_ENABLED:
+                try:
+                    self.face_detector = FaceDetector(
+                        DETECTOR_MODEL_PATH,
+                        det_size=DET_SIZE,
+                        det_thresh=DET_THRESH,
+                        nms_thresh=DET_NMS_THRESH
+                    )
+                except Exception as e:
+                    print(f"⚠️ Không load được face detector: {e}")
+            
+            # FAISS Manager - chỉ tạo 1 lần / process.
+            # - Có process writer riêng (FAISS_WRITER_ENABLED): thay đổi gửi sang writer, worker chỉ đọc generation
+            #   và log dùng chung writer ghi (shared_writes để đọc log, worker không tự ghi).
+            # - Nhiều worker, không có writer: mỗi thay đổi được nối vào log dùng chung trong FAISS_SNAPSHOT_DIR
+            #   và publish seq trong khóa liên process để các worker khác thấy (FAISS_WAL_PATH chỉ dành cho một process)
+            use_writer = FAISS_WRITER_ENABLED
+            multi_worker = SERVER_WORKERS > 1 and not use_writer
+            self.faiss_manager = create_faiss_manager(
+                num_shards=FAISS_NUM_SHARDS,
                 embedding_size=512,
                 index_path=FAISS_INDEX_PATH,
-                meta_path=FAISS_META_PATH
+                meta_path=FAISS_META_PATH,
+                index_type=INDEX_TYPE,
+                index_params=INDEX_PARAMS,
+                wal_path=None if multi_worker or use_writer else FAISS_WAL_PATH,
+                wal_compact_bytes=FAISS_WAL_COMPACT_BYTES,
+                embeddings_path=FAISS_EMBEDDINGS_PATH,
+                use_mmap=FAISS_MMAP,
+                snapshot_dir=FAISS_SNAPSHOT_DIR,
+                keep_generations=FAISS_KEEP_GENERATIONS,
+                shared_writes=multi_worker or use_writer
             )
             
             # Load initial data
             self.faiss_manager.load()
             
-            # Thread lock cho FAISS operations
-            self.faiss_lock = threading.Lock()
+            # Reader-writer lock cho FAISS: truy vấn dùng read() song song, thay đổi dùng write() độc quyền
+            self.faiss_lock = ReadWriteLock()
+            
+            # Ghi bền FAISS ở thread nền, gộp nhiều thay đổi trong một lần fsync/snapshot.
+            # Chụp snapshot chỉ đọc trạng thái nên chỉ cần read lock, truy vấn không bị chặn
+            self.index_writer = None
+            if use_writer:
+                self.index_writer = IndexWriterClient(
+                    FAISS_WRITER_ADDRESS, read_authkey(FAISS_WRITER_AUTHKEY_ENV, FAISS_WRITER_AUTHKEY_FILE))
+            elif not multi_worker:
+                self.faiss_manager.start_persistence(self.faiss_lock.read(), FAISS_FLUSH_INTERVAL_S, FAISS_FLUSH_MAX_DIRTY)
             
             self._initialized = True
             print("✅ Shared instances initialized successfully!")
@@ -50,22 +104,47 @@ class SharedInstances:
         """Lấy feature extractor (thread-safe)"""
         return self.extractor
     
+    def get_inference_batcher(self):
+        """Lấy micro-batcher cho các service async"""
+        return self.inference_batcher
+    
+    def get_face_detector(self):
+        """Lấy face detector, None nếu tắt FACE_DETECTION_ENABLED hoặc load lỗi"""
+        return self.face_detector
+    
     def get_faiss_manager(self):
         """Lấy FAISS manager (thread-safe)"""
         return self.faiss_manager
     
     def get_faiss_lock(self):
-        """Lấy lock cho FAISS operations"""
+        """Lấy ReadWriteLock cho FAISS operations (read() cho truy vấn, write() cho thay đổi)"""
         return self.faiss_lock
     
+    def apply_faiss_mutations(self, ops):
+        """
+        Áp dụng các thay đổi FAISS [(tên method, args), ...] theo thứ tự, trả về list kết quả.
+        - Có writer: gửi một lệnh sang process writer, rồi load generation vừa publish (đọc được ngay thay đổi của mình).
+        - Không có: áp dụng trong write lock rồi commit nếu có thay đổi.
+        """
+        if self.index_writer is not None:
+            results, _ = self.index_writer.apply(ops)
+            self.reload_faiss_if_needed()
+            return results
+        with self.faiss_lock.write():
+            results = [getattr(self.faiss_manager, op)(*args) for op, args in ops]
+            if any(result is not False for result in results):
+                self.faiss_manager.commit()
+        return results
+
     def reload_faiss_if_needed(self):
-        """Reload FAISS chỉ khi cần thiết"""
-        with self.faiss_lock:
-            # Chỉ reload nếu có thay đổi
-            if hasattr(self.faiss_manager, '_needs_reload') and self.faiss_manager._needs_reload:
-                print("🔄 Reloading FAISS index...")
-                self.faiss_manager.load()
-                self.faiss_manager._needs_reload = False
+        """Reload FAISS khi worker khác đã publish generation / bản ghi log mới (kiểm tra mmap rẻ trước, chỉ lấy lock khi cần)"""
+        if not self.faiss_manager.snapshot_changed():
+            return False
+        with self.faiss_lock.write():
+            if self.faiss_manager.refresh():
+                print(f"🔄 Đã load FAISS generation {self.faiss_manager.loaded_generation} do worker khác publish")
+                return True
+        return False
 
 # Global instance
 shared = SharedInstances()
@@ -74,6 +153,12 @@ shared = SharedInstances()
 def get_extractor():
     return shared.get_extractor()
 
+def get_inference_batcher():
+    return shared.get_inference_batcher()
+
+def get_face_detector():
+    return shared.get_face_detector()
+
 def get_faiss_manager():
     return shared.get_faiss_manager()
 
@@ -82,3 +167,10 @@ def get_faiss_lock():
 
 def reload_faiss_if_needed():
     return shared.reload_faiss_if_needed()
+
+def apply_faiss_mutations(ops):
+    return shared.apply_faiss_mutations(ops)
+
+def apply_faiss_mutation(op, *args):
+    """Một thay đổi FAISS (vd. apply_faiss_mutation('delete_by_image_id', image_id)), trả về kết quả của method"""
+    return shared.apply_faiss_mutations([(op, args)])[0]
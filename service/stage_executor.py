@@ -0,0 +1,106 @@
+# ===== STAGE EXECUTORS =====
+# File: face_api/service/stage_executor.py
+# Mục đích: Chạy các bước CPU-bound / blocking (decode ảnh, detect, model, FAISS, MySQL) trên thread pool
+#           riêng cho từng stage, để event loop của uvicorn không bị chặn.
+#           Mỗi stage có giới hạn số việc đang chờ (backpressure): khi đầy, request chờ tối đa
+#           `queue_timeout` giây rồi bị từ chối với 503 thay vì xếp hàng vô hạn.
+
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import STAGE_WORKERS, STAGE_MAX_PENDING, STAGE_QUEUE_TIMEOUT
+from service.performance_monitor import Histogram
+
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+
+class StageOverloadedError(Exception):
+    """Stage đã đủ số việc đang chờ và không còn chỗ trong thời gian cho phép."""
+
+    def __init__(self, stage):
+        super().__init__(f"Hệ thống đang quá tải (stage '{stage}'), vui lòng thử lại sau")
+        self.stage = stage
+
+
+class StageExecutor:
+    """
+    Thread pool cho một stage + giới hạn số việc đang chờ/chạy (max_pending).
+    - `await run(func, *args)`: chờ slot (tối đa queue_timeout), chạy func trên pool của stage.
+    - Histogram thời gian chờ slot và thời gian chạy để theo dõi stage nào là nút thắt.
+    """
+
+    def __init__(self, name, max_workers, max_pending, queue_timeout):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'stage-{name}')
+        self.wait_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.run_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.rejected = 0
+        self.in_flight = 0
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, loop):
+        # asyncio.Semaphore gắn với event loop, mỗi loop (mỗi worker/test) có semaphore riêng
+        sem = self._semaphores.get(loop)
+        if sem is None:
+            with self._lock:
+                sem = self._semaphores.setdefault(loop, asyncio.Semaphore(self.max_pending))
+        return sem
+
+    async def run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        sem = self._semaphore(loop)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(sem.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.rejected += 1
+            raise StageOverloadedError(self.name)
+        acquired = time.perf_counter()
+        self.wait_ms.observe((acquired - start) * 1000)
+        with self._lock:
+            self.in_flight += 1
+        try:
+            return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+        finally:
+            self.run_ms.observe((time.perf_counter() - acquired) * 1000)
+            with self._lock:
+                self.in_flight -= 1
+            sem.release()
+
+    def get_stats(self):
+        return {
+            'workers': self.max_workers,
+            'max_pending': self.max_pending,
+            'in_flight': self.in_flight,
+            'rejected': self.rejected,
+            'wait_ms': self.wait_ms.snapshot(),
+            'run_ms': self.run_ms.snapshot()
+        }
+
+
+# Các stage dùng chung toàn ứng dụng
+stages = {
+    name: StageExecutor(name, STAGE_WORKERS[name], STAGE_MAX_PENDING[name], STAGE_QUEUE_TIMEOUT)
+    for name in ('decode', 'detect', 'model', 'index', 'db')
+}
+
+
+def get_stage(name):
+    return stages[name]
+
+
+async def run_in_stage(name, func, *args, **kwargs):
+    """Chạy func(*args, **kwargs) trên thread pool của stage `name` (decode/detect/model/index/db)."""
+    return await stages[name].run(func, *args, **kwargs)
+
+
+def get_stage_stats():
+    return {name: stage.get_stats() for name, stage in stages.items()}
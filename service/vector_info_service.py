@@ -13,9 +13,12 @@ faiss_lock = get_faiss_lock()
 def get_vector_info_service():
     # ✅ Thread-safe vector info query - không load lại
     
-    with faiss_lock:
+    with faiss_lock.read():
         n = 10
-        total = len(faiss_manager.image_ids)
+        # Lấy mảng một lần (index chia shard trả về bản nối, không đọc lại cho từng dòng)
+        image_ids = faiss_manager.image_ids
+        class_ids = faiss_manager.class_ids
+        total = len(image_ids)
         if total == 0:
             return {"message": "Không có vector nào trong FAISS index.", "status_code": 404}
         
@@ -24,9 +27,9 @@ def get_vector_info_service():
         for i in range(min(n, total)):
             first_vectors.append({
                 'faiss_index': int(i),
-                'image_id': int(faiss_manager.image_ids[i]),
+                'image_id': int(image_ids[i]),
                 'image_path': str(faiss_manager.image_paths[i]),
-                'class_id': int(faiss_manager.class_ids[i]),
+                'class_id': int(class_ids[i]),
                 # 'embedding': faiss_manager.embeddings[i]
             })
         
@@ -35,9 +38,9 @@ def get_vector_info_service():
         for i in range(max(0, total-n), total):
             last_vectors.append({
             'faiss_index': int(i),
-            'image_id': int(faiss_manager.image_ids[i]),
+            'image_id': int(image_ids[i]),
             'image_path': str(faiss_manager.image_paths[i]),
-            'class_id': int(faiss_manager.class_ids[i]),
+            'class_id': int(class_ids[i]),
             # 'embedding': faiss_manager.embeddings[i]
         })
     faiss_manager.check_index_data()
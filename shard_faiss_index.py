@@ -0,0 +1,73 @@
+"""
+Chia lại FAISS index theo số shard mới (FAISS_NUM_SHARDS), shard = class_id % số shard.
+
+Cách dùng (tắt server và faiss_writer.py trước):
+    python shard_faiss_index.py --from-shards 1 --to-shards 4   # index hiện tại -> 4 shard
+    python shard_faiss_index.py --from-shards 4 --to-shards 1   # gộp lại thành một index
+
+Dữ liệu nguồn được load đầy đủ (kể cả replay log), ghi sang các shard đích thành snapshot mới rồi kiểm tra
+số dòng và image_id. Dữ liệu nguồn được giữ nguyên (xóa tay sau khi kiểm tra), sau đó đặt FAISS_NUM_SHARDS
+trong config.py bằng --to-shards.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import *
+from index.sharded import create_faiss_manager
+
+
+def build(num_shards):
+    return create_faiss_manager(
+        num_shards=num_shards,
+        embedding_size=512,
+        index_path=FAISS_INDEX_PATH,
+        meta_path=FAISS_META_PATH,
+        index_type=INDEX_TYPE,
+        index_params=INDEX_PARAMS,
+        wal_path=FAISS_WAL_PATH,
+        wal_compact_bytes=FAISS_WAL_COMPACT_BYTES,
+        embeddings_path=FAISS_EMBEDDINGS_PATH,
+        use_mmap=False,
+        snapshot_dir=FAISS_SNAPSHOT_DIR,
+        keep_generations=FAISS_KEEP_GENERATIONS
+    )
+
+
+def reshard(from_shards, to_shards, chunk=50_000):
+    if from_shards == to_shards:
+        raise ValueError('--from-shards và --to-shards giống nhau')
+    source = build(from_shards)
+    source.load()
+    image_ids = source.image_ids
+    class_ids = source.class_ids
+    image_paths = list(source.image_paths)
+    embeddings = source.embeddings
+    n = image_ids.shape[0]
+
+    # reset_index xóa cả log của bố cục đích (đường dẫn shard có thể trùng bố cục cũ), để không replay thay đổi cũ
+    target = build(to_shards)
+    target.reset_index()
+    for start in range(0, n, chunk):
+        end = min(start + chunk, n)
+        target.add_embeddings(embeddings[start:end], image_ids[start:end], image_paths[start:end], class_ids[start:end])
+    target.save()
+
+    # Kiểm tra lại bằng một lần load mới
+    check = build(to_shards)
+    check.load()
+    assert len(check) == n, f'{len(check)} != {n}'
+    assert np.array_equal(np.sort(check.image_ids), np.sort(image_ids))
+    print(f'✅ Đã chia lại {n} vector: {from_shards} -> {to_shards} shard. Đặt FAISS_NUM_SHARDS = {to_shards} trong config.py')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Chia lại FAISS index theo số shard mới')
+    parser.add_argument('--from-shards', type=int, default=1, help='Số shard hiện tại')
+    parser.add_argument('--to-shards', type=int, default=FAISS_NUM_SHARDS, help='Số shard mới')
+    args = parser.parse_args()
+    reshard(args.from_shards, args.to_shards)
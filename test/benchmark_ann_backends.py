@@ -0,0 +1,104 @@
+# ===== BENCHMARK: CÁC LOẠI FAISS INDEX =====
+# File: face_api/test/benchmark_ann_backends.py
+# Mục đích: Đo thời gian build, độ trễ truy vấn đơn (giống /query, topk=1), recall@1 so với flat và độ trễ
+#           update_embedding (giống /edit_embedding; HNSW không remove được nên mỗi lần là một lần rebuild)
+#           cho từng INDEX_TYPE, trên gallery tổng hợp có cấu trúc danh tính (nhiều ảnh mỗi người).
+# Chạy: python test/benchmark_ann_backends.py [số_vector] [số_truy_vấn] [loại1,loại2,...] [số_update]
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from index.faiss import FaissIndexManager
+from index.backends import INDEX_TYPES
+from config import INDEX_PARAMS
+
+
+def make_gallery(n, d, images_per_class=10, noise=0.35, seed=0):
+    """Mỗi class là một tâm ngẫu nhiên, ảnh của class = tâm + nhiễu (mô phỏng embedding ArcFace)."""
+    rng = np.random.default_rng(seed)
+    n_classes = max(1, n // images_per_class)
+    centers = rng.standard_normal((n_classes, d), dtype=np.float32)
+    class_ids = np.arange(n, dtype=np.int64) % n_classes
+    embeddings = np.empty((n, d), dtype=np.float32)
+    for start in range(0, n, 100_000):
+        end = min(n, start + 100_000)
+        embeddings[start:end] = centers[class_ids[start:end]]
+        embeddings[start:end] += noise * rng.standard_normal((end - start, d), dtype=np.float32)
+    return embeddings, class_ids, centers
+
+
+def make_queries(centers, n_queries, noise=0.35, seed=1):
+    rng = np.random.default_rng(seed)
+    picked = rng.integers(0, centers.shape[0], n_queries)
+    queries = centers[picked] + noise * rng.standard_normal((n_queries, centers.shape[1]), dtype=np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def run_queries(manager, queries):
+    latencies = np.empty(len(queries))
+    top1 = np.empty(len(queries), dtype=np.int64)
+    for i, q in enumerate(queries):
+        start = time.perf_counter()
+        _, I = manager.index.search(q.reshape(1, -1), 1)
+        latencies[i] = time.perf_counter() - start
+        top1[i] = I[0, 0]
+    return latencies, top1
+
+
+def run_updates(manager, n, n_updates, budget_s=60, seed=2):
+    """
+    Đo update_embedding trên các image_id ngẫu nhiên, dừng sớm khi vượt budget_s (HNSW rebuild mỗi lần).
+    Ghi lại chính embedding đang lưu, nên gallery không đổi cho các loại index đo sau.
+    """
+    rng = np.random.default_rng(seed)
+    latencies = []
+    deadline = time.perf_counter() + budget_s
+    for image_id in rng.integers(0, n, n_updates):
+        emb = manager.embeddings[manager.get_row(int(image_id))].copy()
+        start = time.perf_counter()
+        manager.update_embedding(int(image_id), emb)
+        latencies.append(time.perf_counter() - start)
+        if time.perf_counter() > deadline:
+            break
+    return np.asarray(latencies)
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    index_types = sys.argv[3].split(',') if len(sys.argv) > 3 else list(INDEX_TYPES)
+    n_updates = int(sys.argv[4]) if len(sys.argv) > 4 else 20
+    d = 512
+    print(f'Benchmark FAISS backends: {n} vector x {d} chiều, {n_queries} truy vấn topk=1')
+
+    embeddings, class_ids, centers = make_gallery(n, d)
+    queries = make_queries(centers, n_queries)
+    manager = FaissIndexManager(embedding_size=d, index_type='flat',
+                                index_params=dict(INDEX_PARAMS, auto_threshold=0))
+    start = time.perf_counter()
+    manager.add_embeddings(embeddings, np.arange(n), [''] * n, class_ids)
+    print(f'Nạp gallery: {time.perf_counter() - start:.1f}s')
+    del embeddings
+
+    ground_truth = None
+    # recall@1: trùng image_id top1 của flat; class@1: trùng danh tính (class_id) top1 của flat
+    # update (ms): độ trễ trung bình một update_embedding (giống /edit_embedding)
+    print(f'{"index":<12}{"build (s)":>12}{"avg (ms)":>12}{"p99 (ms)":>12}{"recall@1":>12}{"class@1":>12}'
+          f'{"update (ms)":>14}')
+    for index_type in ['flat'] + [t for t in index_types if t != 'flat']:
+        start = time.perf_counter()
+        manager.rebuild_index(index_type)
+        build = time.perf_counter() - start
+        latencies, top1 = run_queries(manager, queries)
+        if ground_truth is None:
+            ground_truth = top1
+        recall = float((top1 == ground_truth).mean())
+        class_recall = float((class_ids[top1] == class_ids[ground_truth]).mean())
+        updates = run_updates(manager, n, n_updates)
+        print(f'{manager._active_index_type:<12}{build:>12.1f}{latencies.mean() * 1e3:>12.2f}'
+              f'{np.percentile(latencies, 99) * 1e3:>12.2f}{recall:>12.3f}{class_recall:>12.3f}'
+              f'{updates.mean() * 1e3:>14.2f}')
@@ -0,0 +1,77 @@
+# ===== BENCHMARK: THỜI GIAN KHỞI ĐỘNG (LOAD) FAISS =====
+# File: face_api/test/benchmark_cold_start.py
+# Mục đích: So sánh thời gian load() và bộ nhớ riêng (RssAnon) tăng thêm khi load gallery: đọc toàn bộ vào RAM (cũ)
+#           và mmap (embedding .npy + FAISS IO_FLAG_MMAP_IFC). Mỗi lần load chạy trong process mới,
+#           giống một uvicorn worker vừa khởi động (page cache đã ấm do worker khác).
+#           Metadata đo cả hai định dạng: .npz cũ (image_paths phải decode thành list) và dạng cột (mmap).
+# Chạy: python test/benchmark_cold_start.py [số_vector] [thư_mục_tạm]
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from index.faiss import FaissIndexManager
+
+
+def private_rss_mb():
+    """RSS riêng của process (RssAnon), không tính page cache dùng chung của file mmap."""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('RssAnon'):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+
+def paths(workdir, meta_format='columnar'):
+    return dict(index_path=os.path.join(workdir, 'bench.index'),
+                meta_path=os.path.join(workdir, 'bench_meta.npz' if meta_format == 'npz' else 'bench_meta'),
+                embeddings_path=os.path.join(workdir, 'bench_embeddings.npy'))
+
+
+def build(n, workdir, d=512):
+    manager = FaissIndexManager(d, index_type='flat', **paths(workdir))
+    rng = np.random.default_rng(0)
+    for start in range(0, n, 100_000):
+        end = min(n, start + 100_000)
+        manager.add_embeddings(rng.standard_normal((end - start, d), dtype=np.float32),
+                               np.arange(start, end), [f'casia-webface/{i // 50:06d}/{i % 50:03d}.jpg' for i in range(start, end)],
+                               np.arange(start, end) // 50)
+    manager.save()
+    # Cùng dữ liệu ở định dạng .npz cũ (index/embedding giống hệt, chỉ ghi lại metadata)
+    manager.meta_path = paths(workdir, 'npz')['meta_path']
+    manager.save()
+
+
+def measure(workdir, use_mmap, meta_format):
+    """Chạy trong process con: load() và in thời gian, RSS tăng thêm."""
+    before = private_rss_mb()
+    manager = FaissIndexManager(512, index_type='flat', use_mmap=use_mmap, **paths(workdir, meta_format))
+    start = time.perf_counter()
+    manager.load()
+    elapsed = time.perf_counter() - start
+    manager.query_batch(np.ones((1, 512), dtype=np.float32), 1)
+    print(f'RESULT {elapsed:.3f} {private_rss_mb() - before:.0f}')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--measure':
+        measure(sys.argv[2], sys.argv[3] == '1', sys.argv[4])
+        sys.exit(0)
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    workdir = sys.argv[2] if len(sys.argv) > 2 else tempfile.mkdtemp(prefix='faiss_cold_start_')
+    os.makedirs(workdir, exist_ok=True)
+    print(f'Tạo gallery {n} vector x 512 tại {workdir}...')
+    build(n, workdir)
+    print(f'{"chế độ":<16}{"load (s)":>12}{"RSS riêng (MB)":>16}')
+    for label, use_mmap, meta_format in (('copy + npz', False, 'npz'), ('mmap + npz', True, 'npz'),
+                                         ('mmap + cột', True, 'columnar')):
+        out = subprocess.run([sys.executable, __file__, '--measure', workdir, '1' if use_mmap else '0', meta_format],
+                             capture_output=True, text=True, cwd=ROOT).stdout
+        elapsed, rss = out.split('RESULT')[-1].split()
+        print(f'{label:<16}{float(elapsed):>12.3f}{float(rss):>16.0f}')
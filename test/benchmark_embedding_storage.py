@@ -0,0 +1,72 @@
+# ===== BENCHMARK: LƯU TRỮ EMBEDDING =====
+# File: face_api/test/benchmark_embedding_storage.py
+# Mục đích: So sánh bộ nhớ và thời gian rebuild giữa cách lưu cũ (list các list Python)
+#           và ma trận float32 liên tục trong FaissIndexManager.
+# Chạy: python test/benchmark_embedding_storage.py [số_vector] [số_chiều]
+
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import faiss
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from index.faiss import FaissIndexManager
+
+
+def make_data(n, d, seed=0):
+    rng = np.random.default_rng(seed)
+    embeddings = rng.standard_normal((n, d), dtype=np.float32)
+    image_ids = np.arange(n, dtype=np.int64)
+    class_ids = image_ids // 10
+    image_paths = [f'images/{i}.jpg' for i in range(n)]
+    return embeddings, image_ids, image_paths, class_ids
+
+
+def bench_legacy(embeddings, d):
+    """Mô phỏng cách cũ: embeddings_norm.tolist() rồi np.array(...) mỗi lần rebuild."""
+    tracemalloc.start()
+    norm = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    stored = norm.tolist()
+    del norm
+    mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    index = faiss.IndexFlatIP(d)
+    index.add(np.array(stored, dtype=np.float32))
+    rebuild = time.perf_counter() - start
+    return mem, rebuild
+
+
+def bench_matrix(embeddings, image_ids, image_paths, class_ids, d):
+    manager = FaissIndexManager(embedding_size=d)
+    tracemalloc.start()
+    manager.add_embeddings(embeddings, image_ids, [], class_ids)
+    mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # image_paths giống nhau ở cả hai cách nên không tính vào so sánh
+    manager.image_paths = list(image_paths)
+
+    start = time.perf_counter()
+    manager._rebuild_index()
+    rebuild = time.perf_counter() - start
+    return mem, rebuild
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    d = int(sys.argv[2]) if len(sys.argv) > 2 else 512
+    print(f'Benchmark lưu trữ embedding: {n} vector x {d} chiều')
+    embeddings, image_ids, image_paths, class_ids = make_data(n, d)
+
+    legacy_mem, legacy_rebuild = bench_legacy(embeddings, d)
+    matrix_mem, matrix_rebuild = bench_matrix(embeddings, image_ids, image_paths, class_ids, d)
+
+    print(f'{"":<20}{"bộ nhớ (MB)":>15}{"rebuild (s)":>15}')
+    print(f'{"list[list[float]]":<20}{legacy_mem / 2**20:>15.1f}{legacy_rebuild:>15.3f}')
+    print(f'{"ma trận float32":<20}{matrix_mem / 2**20:>15.1f}{matrix_rebuild:>15.3f}')
+    print(f'Giảm bộ nhớ: {legacy_mem / max(matrix_mem, 1):.1f}x, '
+          f'rebuild nhanh hơn: {legacy_rebuild / max(matrix_rebuild, 1e-9):.1f}x')
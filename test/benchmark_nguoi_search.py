@@ -0,0 +1,64 @@
+# ===== BENCHMARK: TÌM KIẾM NGƯỜI KHÔNG DẤU (/list_nguoi) =====
+# File: face_api/test/benchmark_nguoi_search.py
+# Mục đích: Dựng NguoiSearchIndex từ bảng nguoi giả lập (tên/nơi ở tiếng Việt có dấu), đo thời gian dựng,
+#           bộ nhớ và độ trễ một trang kết quả (page_size=15) với các từ khóa ngắn/dài, phổ biến/hiếm;
+#           so với quét tuyến tính cột đã chuẩn hóa và kiểm tra total + trang đầu trùng khớp.
+# Chạy: python test/benchmark_nguoi_search.py [số_người] [số_lần_lặp]
+
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db.nguoi_search_index import NguoiSearchIndex, nguoi_haystack, normalize_text
+
+HO = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Vũ', 'Võ', 'Đặng', 'Bùi', 'Đỗ', 'Hồ', 'Ngô', 'Dương', 'Lý']
+DEM = ['Văn', 'Thị', 'Hữu', 'Minh', 'Ngọc', 'Quốc', 'Thu', 'Đức', 'Thanh', 'Gia', 'Xuân', 'Hoài']
+TEN = ['An', 'Bình', 'Châu', 'Dũng', 'Giang', 'Hà', 'Khánh', 'Lan', 'Long', 'Mai', 'Nam', 'Nghĩa', 'Phúc',
+       'Quân', 'Sơn', 'Trang', 'Tuấn', 'Vy', 'Yến', 'Đạt', 'Thảo', 'Hưng', 'Linh', 'Nhung']
+NOI_O = ['Hà Nội', 'TP. Hồ Chí Minh', 'Đà Nẵng', 'Hải Phòng', 'Cần Thơ', 'Huế', 'Nha Trang', 'Vũng Tàu',
+         'Quảng Ninh', 'Nghệ An', 'Thanh Hóa', 'Bình Dương', 'Đồng Nai', 'Lâm Đồng']
+QUERIES = ['', 'a', 'ha', 'nguyen', 'Nguyễn Văn', 'nguyen van an', 'HÀ NỘI', 'tuan', 'dang thu vy', 'nữ', '45', 'xyz']
+
+
+def make_rows(n, seed=0):
+    rng = random.Random(seed)
+    return [{
+        'class_id': i,
+        'ten': f'{rng.choice(HO)} {rng.choice(DEM)} {rng.choice(TEN)}',
+        'tuoi': rng.randint(18, 80),
+        'gioitinh': rng.choice(['Nam', 'Nữ']),
+        'noio': rng.choice(NOI_O)
+    } for i in range(n)]
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    rows = make_rows(n)
+    print(f'Benchmark tìm kiếm người: {n} người, trang 15 kết quả, {repeats} lần lặp')
+
+    index = NguoiSearchIndex(refresh_s=0)
+    start = time.perf_counter()
+    index.search('', 0, 1, lambda: rows)
+    print(f'Dựng index: {time.perf_counter() - start:.1f}s, {index.get_stats()["memory_mb"]} MB, '
+          f'{index.get_stats()["trigrams"]} trigram')
+
+    # Baseline: cột đã chuẩn hóa sẵn, quét tuyến tính mỗi truy vấn (như LIKE '%q%' trên cột không dấu)
+    column = sorted((nguoi_haystack(r['ten'], r['tuoi'], r['gioitinh'], r['noio']), r['class_id']) for r in rows)
+
+    print(f'{"query":>16}{"total":>10}{"index (ms)":>12}{"quét (ms)":>12}{"khớp":>8}')
+    for query in QUERIES:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            page, total = index.search(query, 0, 15, None)
+        index_ms = (time.perf_counter() - start) / repeats * 1e3
+
+        start = time.perf_counter()
+        needle = normalize_text(query).strip().encode('utf-8')
+        expected = [class_id for hay, class_id in column if needle in hay]
+        scan_ms = (time.perf_counter() - start) * 1e3
+
+        match = total == len(expected) and page == expected[:15]
+        print(f'{query!r:>16}{total:>10}{index_ms:>12.1f}{scan_ms:>12.1f}{"✅" if match else "❌":>8}')
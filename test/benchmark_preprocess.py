@@ -0,0 +1,73 @@
+# ===== BENCHMARK: TIỀN XỬ LÝ ẢNH ARCFACE =====
+# File: face_api/test/benchmark_preprocess.py
+# Mục đích: So sánh số ảnh/giây của pipeline cũ (cv2.resize + albumentations Resize/Normalize/ToTensorV2
+#           + torch.stack) với BatchPreprocessor (ghi thẳng vào buffer float32 NCHW dùng lại).
+#           Không cần torch: khi thiếu torch, ToTensorV2 + torch.stack được thay bằng transpose + np.stack.
+# Chạy: python test/benchmark_preprocess.py [batch_size] [số_lần_lặp]
+
+import os
+import sys
+import time
+
+import numpy as np
+import cv2
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from model.preprocess import BatchPreprocessor
+
+IMG_SIZE = 112
+
+
+def make_images(n, seed=0):
+    """Ảnh BGR kích thước khác nhau (crop khuôn mặt lớn hơn 112x112 như ảnh upload thực tế)."""
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, (rng.integers(150, 400), rng.integers(150, 400), 3), dtype=np.uint8)
+            for _ in range(n)]
+
+
+def make_legacy_pipeline():
+    import albumentations as A
+    try:
+        import torch
+        from albumentations.pytorch import ToTensorV2
+    except ImportError:
+        torch = None
+
+    steps = [A.Resize(IMG_SIZE, IMG_SIZE), A.Normalize(mean=(0.5, 0.5, 0.5), std=(0.5, 0.5, 0.5))]
+    if torch is not None:
+        val_aug = A.Compose(steps + [ToTensorV2()])
+
+        def legacy(imgs):
+            return torch.stack([val_aug(image=cv2.resize(img, (IMG_SIZE, IMG_SIZE)))['image'] for img in imgs])
+    else:
+        val_aug = A.Compose(steps)
+
+        def legacy(imgs):
+            return np.stack([val_aug(image=cv2.resize(img, (IMG_SIZE, IMG_SIZE)))['image'].transpose(2, 0, 1)
+                             for img in imgs])
+    return legacy
+
+
+def bench(fn, imgs, iters):
+    fn(imgs)  # warm-up
+    start = time.perf_counter()
+    for _ in range(iters):
+        fn(imgs)
+    return len(imgs) * iters / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    iters = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    imgs = make_images(batch_size)
+    preprocess = BatchPreprocessor(img_size=IMG_SIZE)
+
+    legacy = make_legacy_pipeline()
+    diff = np.abs(np.asarray(legacy(imgs)) - preprocess(imgs)).max()
+    print(f'Batch {batch_size} ảnh, {iters} lần lặp, sai khác tối đa so với pipeline cũ: {diff:.2e}')
+    before = bench(legacy, imgs, iters)
+    after = bench(preprocess, imgs, iters)
+    print(f'{"pipeline":<28}{"ảnh/giây":>12}')
+    print(f'{"albumentations (cũ)":<28}{before:>12.0f}')
+    print(f'{"BatchPreprocessor":<28}{after:>12.0f}')
+    print(f'Tăng tốc: {after / before:.2f}x')
@@ -0,0 +1,61 @@
+# ===== BENCHMARK: FAISS INDEX CHIA SHARD THEO CLASS_ID =====
+# File: face_api/test/benchmark_sharded_search.py
+# Mục đích: So sánh độ trễ truy vấn đơn (topk=5, giống /query_top5) và thời gian xóa một class
+#           giữa một index và ShardedFaissIndexManager với số shard khác nhau; kiểm tra top-k gộp bằng heap
+#           trùng với index đơn. Mức giảm độ trễ phụ thuộc số core (mỗi shard search trên một thread).
+# Chạy: python test/benchmark_sharded_search.py [số_vector] [số_truy_vấn] [số_shard1,số_shard2,...]
+
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from index.sharded import create_faiss_manager
+from benchmark_ann_backends import make_gallery, make_queries
+
+
+def top_ids(results):
+    return [[int(item['image_id']) for item in items] for items in results]
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    shard_counts = [int(k) for k in sys.argv[3].split(',')] if len(sys.argv) > 3 else [1, 2, 4, 8]
+    d = 512
+    print(f'Benchmark FAISS shard: {n} vector x {d} chiều, {n_queries} truy vấn topk=5, {os.cpu_count()} CPU')
+
+    embeddings, class_ids, centers = make_gallery(n, d)
+    queries = make_queries(centers, n_queries)
+    image_ids = np.arange(n)
+    image_paths = [''] * n
+
+    reference = None
+    print(f'{"shard":>6}{"avg (ms)":>12}{"p99 (ms)":>12}{"xóa class (ms)":>16}{"khớp top-5":>12}')
+    for num_shards in shard_counts:
+        manager = create_faiss_manager(num_shards=num_shards, embedding_size=d, index_type='flat')
+        with contextlib.redirect_stdout(io.StringIO()):
+            manager.add_embeddings(embeddings, image_ids, image_paths, class_ids)
+        manager.query_batch(queries[:1], 5)
+        latencies = np.empty(n_queries)
+        results = []
+        for i, q in enumerate(queries):
+            start = time.perf_counter()
+            results.extend(manager.query_batch(q.reshape(1, -1), 5))
+            latencies[i] = time.perf_counter() - start
+        ids = top_ids(results)
+        if reference is None:
+            reference = ids
+        match = np.mean([a == b for a, b in zip(ids, reference)])
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            manager.delete_by_class_id(int(class_ids[0]))
+            delete_ms = (time.perf_counter() - start) * 1e3
+        print(f'{num_shards:>6}{latencies.mean() * 1e3:>12.2f}{np.percentile(latencies, 99) * 1e3:>12.2f}'
+              f'{delete_ms:>16.1f}{match:>12.3f}')
+        del manager
@@ -0,0 +1,167 @@
+# ===== LOAD TEST: ĐỘ TRỄ THEO MỨC ĐỒNG THỜI =====
+# File: face_api/test/load_test_concurrent.py
+# Mục đích: Gửi request /query (hoặc endpoint khác) với nhiều mức đồng thời, đo throughput và
+#           p50/p95/p99. Khi decode/model/FAISS/MySQL chạy trên thread pool riêng, p99 không được
+#           tăng tuyến tính theo số kết nối; request vượt backpressure nhận 503.
+# Chạy:
+#   python test/load_test_concurrent.py --url http://localhost:8000/query --image test2.jpg
+#   python test/load_test_concurrent.py --simulate   # không cần server: so sánh inline vs stage executor
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_LEVELS = [1, 4, 8, 16, 32, 64]
+
+
+def summarize(latencies, elapsed, statuses):
+    lat_ms = np.array(latencies) * 1000
+    ok = sum(1 for s in statuses if s == 200)
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50': np.percentile(lat_ms, 50),
+        'p95': np.percentile(lat_ms, 95),
+        'p99': np.percentile(lat_ms, 99),
+        'ok': ok,
+        'rejected': sum(1 for s in statuses if s == 503),
+        'errors': len(statuses) - ok - sum(1 for s in statuses if s == 503)
+    }
+
+
+def print_header(title):
+    print(title)
+    print(f'{"conc":>6}{"rps":>10}{"p50 (ms)":>12}{"p95 (ms)":>12}{"p99 (ms)":>12}{"ok":>8}{"503":>8}{"err":>8}')
+
+
+def print_row(concurrency, r):
+    print(f'{concurrency:>6}{r["rps"]:>10.1f}{r["p50"]:>12.1f}{r["p95"]:>12.1f}{r["p99"]:>12.1f}'
+          f'{r["ok"]:>8}{r["rejected"]:>8}{r["errors"]:>8}')
+
+
+async def run_level(send, concurrency, total):
+    """Chạy `total` request với `concurrency` client song song, trả về (latencies, statuses, elapsed)."""
+    latencies, statuses = [], []
+    remaining = iter(range(total))
+
+    async def client():
+        for _ in remaining:
+            start = time.perf_counter()
+            statuses.append(await send())
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - start
+
+
+async def run_waves(send, concurrency, total):
+    """
+    Gửi từng đợt `concurrency` request cùng lúc, đo từ lúc gửi (giống request tới server và chờ
+    event loop). Nếu một request chặn event loop, các request cùng đợt phải chờ nó.
+    """
+    latencies, statuses = [], []
+
+    async def timed(submitted):
+        statuses.append(await send())
+        latencies.append(time.perf_counter() - submitted)
+
+    start = time.perf_counter()
+    for sent in range(0, total, concurrency):
+        submitted = time.perf_counter()
+        await asyncio.gather(*(timed(submitted) for _ in range(min(concurrency, total - sent))))
+    return latencies, statuses, time.perf_counter() - start
+
+
+# ----- Chế độ HTTP: đo server đang chạy -----
+
+async def http_test(url, image_path, levels, requests_per_level):
+    import httpx
+
+    with open(image_path, 'rb') as f:
+        image_bytes = f.read()
+    filename = os.path.basename(image_path)
+
+    async with httpx.AsyncClient(timeout=60) as http:
+        async def send():
+            try:
+                resp = await http.post(url, files={'file': (filename, image_bytes, 'image/jpeg')})
+                return resp.status_code
+            except httpx.HTTPError:
+                return -1
+
+        await send()  # warm-up
+        print_header(f'Load test {url} ({requests_per_level} request mỗi mức)')
+        for concurrency in levels:
+            latencies, statuses, elapsed = await run_level(send, concurrency, requests_per_level)
+            print_row(concurrency, summarize(latencies, elapsed, statuses))
+
+
+# ----- Chế độ mô phỏng: không cần server/model/MySQL -----
+
+def fake_decode(_):
+    # CPU-bound, nhả GIL giống cv2.imdecode
+    a = np.random.rand(200, 200)
+    return a @ a
+
+
+def fake_model(_):
+    a = np.random.rand(300, 300)
+    return a @ a
+
+
+def fake_search(_):
+    a = np.random.rand(150, 150)
+    return a @ a
+
+
+def fake_db(_):
+    time.sleep(0.01)  # round-trip MySQL
+    return {}
+
+
+async def simulate(levels, requests_per_level):
+    from service.stage_executor import StageExecutor
+
+    stages = {name: StageExecutor(name, workers, 256, 10.0)
+              for name, workers in (('decode', 4), ('model', 1), ('index', 2), ('db', 8))}
+
+    async def inline_request():
+        # Cách cũ: mọi bước chạy trực tiếp trên event loop
+        fake_db(fake_search(fake_model(fake_decode(None))))
+        return 200
+
+    async def staged_request():
+        x = await stages['decode'].run(fake_decode, None)
+        x = await stages['model'].run(fake_model, x)
+        x = await stages['index'].run(fake_search, x)
+        await stages['db'].run(fake_db, x)
+        return 200
+
+    for title, send in (('Inline (chặn event loop)', inline_request), ('Stage executors', staged_request)):
+        print_header(f'Mô phỏng: {title} ({requests_per_level} request mỗi mức)')
+        for concurrency in levels:
+            latencies, statuses, elapsed = await run_waves(send, concurrency, requests_per_level)
+            print_row(concurrency, summarize(latencies, elapsed, statuses))
+        print()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test độ trễ theo mức đồng thời')
+    parser.add_argument('--url', default='http://localhost:8000/query')
+    parser.add_argument('--image', default='test2.jpg')
+    parser.add_argument('--levels', default=','.join(map(str, DEFAULT_LEVELS)))
+    parser.add_argument('--requests', type=int, default=200, help='Số request mỗi mức đồng thời')
+    parser.add_argument('--simulate', action='store_true', help='Mô phỏng tại chỗ, không cần server')
+    args = parser.parse_args()
+    levels = [int(x) for x in args.levels.split(',')]
+
+    if args.simulate:
+        asyncio.run(simulate(levels, args.requests))
+    else:
+        asyncio.run(http_test(args.url, args.image, levels, args.requests))
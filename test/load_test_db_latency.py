@@ -0,0 +1,203 @@
+# ===== LOAD TEST: ĐỘ TRỄ MYSQL VỚI DRIVER ĐỒNG BỘ VÀ ASYNC =====
+# File: face_api/test/load_test_db_latency.py
+# Mục đích: Tiêm độ trễ vào driver MySQL (mỗi câu SQL tốn --latency-ms) và so sánh ba cách handler async
+#           tra cứu người (NguoiRepository.get_by_class_id, giống /query):
+#             - pymysql gọi thẳng trong handler: chặn event loop, cả server chỉ phục vụ một truy vấn mỗi lúc
+#             - pymysql trên thread pool stage 'db' (mặc định): không chặn loop nhưng bị giới hạn bởi số thread
+#             - AsyncNguoiRepository (aiomysql, MYSQL_ASYNC_ENABLED): chỉ giới hạn bởi số kết nối của pool
+#           Cột "loop lag" là độ trễ lớn nhất của một coroutine tick 5ms, cho biết event loop có bị chặn không.
+#           Không cần MySQL: driver giả thay cho pymysql/aiomysql, còn repository, connection pool, nguoi_cache
+#           (tắt để mọi request đều xuống DB) và stage executor là code thật.
+# Chạy: python test/load_test_db_latency.py [--latency-ms 20] [--levels 8,32,128] [--requests 400]
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from load_test_concurrent import run_level, summarize
+
+import db.connection_helper
+import db.async_repository
+from db.connection_pool import ConnectionPool
+from db.nguoi_cache import nguoi_cache
+from db.nguoi_repository import NguoiRepository
+from db.async_repository import AsyncNguoiRepository
+from db.mysql_conn import MYSQL_POOL_MAX_SIZE, MYSQL_ASYNC_POOL_MAX_SIZE
+from service.stage_executor import run_in_stage, StageOverloadedError
+
+ROW = {'class_id': 1, 'ten': 'Nguyễn Văn A', 'tuoi': 30, 'gioitinh': 'Nam', 'noio': 'Hà Nội'}
+
+
+# ----- Driver giả: mỗi câu SQL tốn `latency` giây -----
+
+class FakeCursor:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def execute(self, sql, params=None):
+        time.sleep(self.latency)
+
+    def fetchone(self):
+        return dict(ROW)
+
+    def fetchall(self):
+        return [dict(ROW)]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def cursor(self):
+        return FakeCursor(self.latency)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeAsyncCursor:
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def execute(self, sql, params=None):
+        await asyncio.sleep(self.latency)
+
+    async def fetchone(self):
+        return dict(ROW)
+
+    async def fetchall(self):
+        return [dict(ROW)]
+
+    async def close(self):
+        pass
+
+
+class FakeAsyncConnection:
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def cursor(self):
+        return FakeAsyncCursor(self.latency)
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeAsyncPool:
+    """Giống aiomysql.Pool ở mức AsyncConnectionHelper dùng: acquire/release, tối đa `maxsize` kết nối."""
+
+    def __init__(self, latency, maxsize):
+        self.maxsize = maxsize
+        self._free = [FakeAsyncConnection(latency) for _ in range(maxsize)]
+        self._available = asyncio.Semaphore(maxsize)
+
+    async def acquire(self):
+        await self._available.acquire()
+        return self._free.pop()
+
+    def release(self, conn):
+        self._free.append(conn)
+        self._available.release()
+
+
+# ----- Ba cách handler tra cứu người -----
+
+def make_handlers(latency):
+    nguoi_repo = NguoiRepository()
+    async_nguoi_repo = AsyncNguoiRepository()
+    pool = ConnectionPool(lambda: FakeConnection(latency), min_size=1, max_size=MYSQL_POOL_MAX_SIZE)
+    db.connection_helper.get_pool = lambda: pool
+    async_pools = {}
+
+    async def fake_get_async_pool():
+        loop = asyncio.get_running_loop()
+        if loop not in async_pools:
+            async_pools[loop] = FakeAsyncPool(latency, MYSQL_ASYNC_POOL_MAX_SIZE)
+        return async_pools[loop]
+
+    db.async_repository.get_async_pool = fake_get_async_pool
+
+    async def blocking():
+        nguoi_repo.get_by_class_id(1)
+        return 200
+
+    async def staged():
+        try:
+            await run_in_stage('db', nguoi_repo.get_by_class_id, 1)
+        except StageOverloadedError:
+            return 503
+        return 200
+
+    async def awaited():
+        await async_nguoi_repo.get_by_class_id(1)
+        return 200
+
+    return [
+        ('pymysql trong handler', blocking),
+        ("pymysql trên stage 'db'", staged),
+        ('aiomysql (async)', awaited)
+    ]
+
+
+async def measure(send, concurrency, total, tick=0.005):
+    """Chạy một mức đồng thời, đồng thời đo độ trễ lớn nhất của event loop."""
+    lag = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal lag
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(tick)
+            lag = max(lag, time.perf_counter() - start - tick)
+
+    watcher = asyncio.create_task(ticker())
+    latencies, statuses, elapsed = await run_level(send, concurrency, total)
+    done = True
+    await watcher
+    return summarize(latencies, elapsed, statuses), lag
+
+
+async def main(latency_ms, levels, total):
+    # Tắt cache để mọi request đều xuống "MySQL"
+    nguoi_cache.max_size = 0
+    handlers = make_handlers(latency_ms / 1000)
+    print(f'Độ trễ MySQL tiêm vào: {latency_ms} ms/câu SQL, {total} request mỗi mức, '
+          f'pool đồng bộ {MYSQL_POOL_MAX_SIZE} kết nối, pool async {MYSQL_ASYNC_POOL_MAX_SIZE} kết nối')
+    for name, send in handlers:
+        print(f'\n{name}')
+        print(f'{"conc":>6}{"rps":>10}{"p50 (ms)":>12}{"p99 (ms)":>12}{"503":>8}{"loop lag (ms)":>16}')
+        for concurrency in levels:
+            r, lag = await measure(send, concurrency, total)
+            print(f'{concurrency:>6}{r["rps"]:>10.1f}{r["p50"]:>12.1f}{r["p99"]:>12.1f}{r["rejected"]:>8}{lag * 1000:>16.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='So sánh pymysql (chặn / thread pool) và aiomysql khi MySQL chậm')
+    parser.add_argument('--latency-ms', type=float, default=20, help='Độ trễ tiêm vào mỗi câu SQL (ms)')
+    parser.add_argument('--levels', default='8,32,128', help='Các mức đồng thời, phân cách bằng dấu phẩy')
+    parser.add_argument('--requests', type=int, default=400, help='Số request mỗi mức')
+    args = parser.parse_args()
+    asyncio.run(main(args.latency_ms, [int(x) for x in args.levels.split(',')], args.requests))
@@ -0,0 +1,104 @@
+import io
+import zipfile
+
+import pytest
+
+from service import batch_uploads
+from service.batch_uploads import UploadLimitError, expand_uploads
+
+
+@pytest.fixture(autouse=True)
+def small_limits(monkeypatch):
+    monkeypatch.setattr(batch_uploads, 'MAX_IMAGE_SIZE', 1000)
+    monkeypatch.setattr(batch_uploads, 'BATCH_QUERY_MAX_IMAGES', 5)
+    monkeypatch.setattr(batch_uploads, 'BATCH_QUERY_MAX_ZIP_ENTRIES', 8)
+    monkeypatch.setattr(batch_uploads, 'BATCH_QUERY_MAX_UNZIPPED_BYTES', 2500)
+
+
+def make_zip(members, compression=zipfile.ZIP_DEFLATED):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression) as zf:
+        for name, data in members:
+            if name.endswith('/'):
+                zf.writestr(zipfile.ZipInfo(name), b'')
+            else:
+                zf.writestr(name, data)
+    return buffer.getvalue()
+
+
+class CountingZipFile(zipfile.ZipFile):
+    reads = 0
+
+    def read(self, name, pwd=None):
+        CountingZipFile.reads += 1
+        return super().read(name, pwd)
+
+
+@pytest.fixture
+def count_reads(monkeypatch):
+    CountingZipFile.reads = 0
+    monkeypatch.setattr(batch_uploads.zipfile, 'ZipFile', CountingZipFile)
+    return CountingZipFile
+
+
+def test_plain_images_and_zip_members():
+    archive = make_zip([('a.jpg', b'A' * 10), ('dir/', b''), ('dir/b.PNG', b'B' * 20), ('notes.txt', b'x')])
+    items = expand_uploads([('one.jpg', b'1' * 5), ('batch.zip', archive)])
+    assert items == [('one.jpg', b'1' * 5), ('batch.zip/a.jpg', b'A' * 10), ('batch.zip/dir/b.PNG', b'B' * 20)]
+
+
+def test_zip_detected_by_content():
+    archive = make_zip([('a.jpg', b'A')])
+    assert expand_uploads([('upload', archive)]) == [('upload/a.jpg', b'A')]
+
+
+def test_plain_upload_over_image_size_is_rejected():
+    with pytest.raises(UploadLimitError, match='one.jpg'):
+        expand_uploads([('one.jpg', b'x' * 1001)])
+    assert expand_uploads([('one.jpg', b'x' * 1000)]) == [('one.jpg', b'x' * 1000)]
+
+
+def test_zip_entry_count_limit_checked_before_reading(count_reads):
+    archive = make_zip([(f'{i}.txt', b'') for i in range(9)])
+    with pytest.raises(UploadLimitError, match='9 mục'):
+        expand_uploads([('many.zip', archive)])
+    assert count_reads.reads == 0
+
+
+def test_zip_entry_size_limit_checked_before_reading(count_reads):
+    # Nén rất tốt: file zip nhỏ nhưng một mục giải nén vượt MAX_IMAGE_SIZE
+    archive = make_zip([('ok.jpg', b'a'), ('bomb.jpg', b'\0' * 5000)])
+    assert len(archive) < 1000
+    with pytest.raises(UploadLimitError, match='bomb.jpg'):
+        expand_uploads([('bomb.zip', archive)])
+    assert count_reads.reads == 0
+
+
+def test_total_unzipped_bytes_limit(count_reads):
+    archive = make_zip([(f'{i}.jpg', b'\0' * 900) for i in range(3)])
+    with pytest.raises(UploadLimitError, match='Tổng dung lượng'):
+        expand_uploads([('big.zip', archive)])
+    assert count_reads.reads == 0
+    # Tổng tính cả ảnh rời và nhiều file zip trong cùng request
+    with pytest.raises(UploadLimitError, match='Tổng dung lượng'):
+        expand_uploads([('a.zip', make_zip([('a.jpg', b'\0' * 900), ('b.jpg', b'\0' * 900)])),
+                        ('c.jpg', b'\0' * 800)])
+    assert len(expand_uploads([('ok.zip', make_zip([('a.jpg', b'\0' * 900), ('b.jpg', b'\0' * 900)]))])) == 2
+
+
+def test_image_count_limit_across_uploads(count_reads):
+    archive = make_zip([(f'{i}.jpg', b'x') for i in range(4)])
+    with pytest.raises(UploadLimitError, match='Tối đa 5 ảnh'):
+        expand_uploads([('a.zip', archive), ('b.jpg', b'x'), ('c.jpg', b'x')])
+    assert count_reads.reads == 0
+    assert len(expand_uploads([('a.zip', archive), ('b.jpg', b'x')])) == 5
+
+
+def test_non_image_members_do_not_count_as_images():
+    archive = make_zip([('a.jpg', b'x')] + [(f'{i}.txt', b'\0' * 900) for i in range(6)])
+    assert expand_uploads([('a.zip', archive)]) == [('a.zip/a.jpg', b'x')]
+
+
+def test_bad_zip_raises():
+    with pytest.raises(zipfile.BadZipFile):
+        expand_uploads([('broken.zip', b'PK\x03\x04 not really a zip')])
@@ -0,0 +1,159 @@
+import threading
+import time
+
+import pytest
+
+from db.connection_pool import ConnectionPool, PoolTimeoutError
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+        self.alive = True
+        self.pings = 0
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if not self.alive:
+            raise ConnectionError('MySQL server has gone away')
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnect:
+    def __init__(self, fail=False):
+        self.opened = []
+        self.fail = fail
+
+    def __call__(self):
+        if self.fail:
+            raise ConnectionError("Can't connect to MySQL server")
+        conn = FakeConnection(len(self.opened))
+        self.opened.append(conn)
+        return conn
+
+
+def test_prefill_opens_min_size():
+    connect = FakeConnect()
+    pool = ConnectionPool(connect, min_size=3, max_size=5)
+    assert len(connect.opened) == 3
+    assert pool.get_stats()['idle'] == 3
+
+
+def test_prefill_failure_does_not_block_startup():
+    connect = FakeConnect(fail=True)
+    pool = ConnectionPool(connect, min_size=2, max_size=2)
+    assert pool.get_stats()['size'] == 0
+    connect.fail = False
+    assert pool.acquire().conn is connect.opened[0]
+
+
+def test_invalid_sizes():
+    with pytest.raises(ValueError):
+        ConnectionPool(FakeConnect(), min_size=3, max_size=2)
+    with pytest.raises(ValueError):
+        ConnectionPool(FakeConnect(), min_size=0, max_size=0)
+
+
+def test_reuses_most_recently_released_connection():
+    pool = ConnectionPool(FakeConnect(), min_size=0, max_size=3)
+    a, b = pool.acquire(), pool.acquire()
+    pool.release(a)
+    pool.release(b)
+    assert pool.acquire() is b
+    assert pool.get_stats()['created'] == 2
+
+
+def test_max_size_times_out():
+    pool = ConnectionPool(FakeConnect(), min_size=0, max_size=2)
+    pool.acquire(), pool.acquire()
+    start = time.monotonic()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire(timeout=0.05)
+    assert time.monotonic() - start >= 0.05
+    stats = pool.get_stats()
+    assert stats['timeouts'] == 1 and stats['in_use'] == 2
+
+
+def test_release_wakes_waiting_thread():
+    pool = ConnectionPool(FakeConnect(), min_size=0, max_size=1)
+    held = pool.acquire()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire(timeout=5)))
+    waiter.start()
+    time.sleep(0.05)
+    assert not got
+    pool.release(held)
+    waiter.join(5)
+    assert got == [held]
+    assert pool.get_stats()['waits'] == 1
+
+
+def test_broken_connection_is_closed_and_frees_slot():
+    connect = FakeConnect()
+    pool = ConnectionPool(connect, min_size=0, max_size=1)
+    pooled = pool.acquire()
+    pool.release(pooled, broken=True)
+    assert connect.opened[0].closed
+    assert pool.acquire(timeout=0.05).conn is connect.opened[1]
+
+
+def test_failed_ping_replaces_connection():
+    connect = FakeConnect()
+    pool = ConnectionPool(connect, min_size=1, max_size=1, ping_after=0)
+    connect.opened[0].alive = False
+    pooled = pool.acquire()
+    assert pooled.conn is connect.opened[1]
+    assert connect.opened[0].closed
+    assert pool.get_stats()['health_check_failures'] == 1
+
+
+def test_recently_used_connection_is_not_pinged():
+    connect = FakeConnect()
+    pool = ConnectionPool(connect, min_size=1, max_size=1, ping_after=30)
+    pool.release(pool.acquire())
+    pool.acquire()
+    assert connect.opened[0].pings == 0
+
+
+def test_old_connection_is_recycled():
+    connect = FakeConnect()
+    pool = ConnectionPool(connect, min_size=1, max_size=1, recycle=0)
+    time.sleep(0.01)
+    assert pool.acquire().conn is connect.opened[1]
+    assert connect.opened[0].closed
+
+
+def test_idle_connections_above_min_size_are_reaped():
+    connect = FakeConnect()
+    pool = ConnectionPool(connect, min_size=1, max_size=3, idle_timeout=0)
+    held = [pool.acquire() for _ in range(3)]
+    time.sleep(0.01)
+    for pooled in held:
+        pool.release(pooled)
+    assert pool.get_stats()['size'] == 1
+    assert sum(conn.closed for conn in connect.opened) == 2
+
+
+def test_failed_open_releases_reserved_slot():
+    connect = FakeConnect()
+    pool = ConnectionPool(connect, min_size=0, max_size=1)
+    connect.fail = True
+    with pytest.raises(ConnectionError):
+        pool.acquire()
+    connect.fail = False
+    assert pool.acquire(timeout=0.05) is not None
+
+
+def test_close_closes_idle_and_later_released_connections():
+    connect = FakeConnect()
+    pool = ConnectionPool(connect, min_size=2, max_size=2)
+    in_use = pool.acquire()
+    pool.close()
+    assert connect.opened[0].closed and not in_use.conn.closed
+    pool.release(in_use)
+    assert in_use.conn.closed
+    with pytest.raises(RuntimeError):
+        pool.acquire()
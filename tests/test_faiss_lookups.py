@@ -0,0 +1,151 @@
+import random
+
+import numpy as np
+import pytest
+
+from index.faiss import FaissIndexManager
+
+D = 4
+
+
+def vectors(n, seed):
+    return np.random.default_rng(seed).random((n, D), dtype=np.float32) + 0.1
+
+
+def make_manager(prebuild):
+    manager = FaissIndexManager(D, index_type='flat')
+    if prebuild:
+        # Dựng bảng path/class ngay từ đầu: sau đó chỉ được cập nhật tăng dần
+        manager.get_row_by_path('x')
+        manager.has_class_id(0)
+    return manager
+
+
+def check_lookups(manager, model):
+    """model: image_id -> (image_path, class_id). So các bảng tra cứu với quét trực tiếp các cột."""
+    ids = manager.image_ids.tolist()
+    paths = manager.image_paths.tolist()
+    classes = manager.class_ids.tolist()
+    assert len(manager) == len(model) == manager.index.ntotal
+    assert sorted(ids) == sorted(model)
+    for row, image_id in enumerate(ids):
+        assert manager.get_row(image_id) == row
+        assert (paths[row], classes[row]) == model[image_id]
+    rows_by_path = {}
+    for row, path in enumerate(paths):
+        rows_by_path.setdefault(path, set()).add(row)
+    for path, rows in rows_by_path.items():
+        assert manager.get_row_by_path(path) in rows
+        # Mọi dòng trùng path đều được theo dõi: dòng chính + dòng phụ
+        tracked = {manager._path_to_row[path]} | manager._path_duplicates.get(path, set())
+        assert tracked == rows
+    assert set(manager._path_to_row) == set(rows_by_path)
+    rows_by_class = {}
+    for row, class_id in enumerate(classes):
+        rows_by_class.setdefault(class_id, []).append(row)
+    for class_id, rows in rows_by_class.items():
+        assert manager.get_rows_by_class(class_id).tolist() == rows
+        assert manager.has_class_id(class_id)
+    assert set(manager._class_lookup()) == set(rows_by_class)
+
+
+def random_operations(manager, model, seed, steps=300):
+    rng = random.Random(seed)
+    # image_id của dòng đã xóa có thể được dùng lại
+    next_id = max(model, default=0) + 1
+    for step in range(steps):
+        action = rng.random()
+        if action < 0.4 or not model:
+            n = rng.randint(1, 5)
+            ids = list(range(next_id, next_id + n))
+            next_id += n
+            # Ít path khác nhau để có nhiều path trùng
+            paths = [f'p{rng.randint(0, 15)}.jpg' for _ in ids]
+            classes = [rng.randint(0, 6) for _ in ids]
+            manager.add_embeddings(vectors(n, step), ids, paths, classes)
+            model.update({i: (p, c) for i, p, c in zip(ids, paths, classes)})
+        elif action < 0.6:
+            image_id = rng.choice(sorted(model))
+            assert manager.delete_by_image_id(image_id)
+            del model[image_id]
+        elif action < 0.7:
+            class_id = rng.choice([c for _, c in model.values()])
+            assert manager.delete_by_class_id(class_id)
+            for image_id in [i for i, (_, c) in model.items() if c == class_id]:
+                del model[image_id]
+        elif action < 0.9:
+            image_id = rng.choice(sorted(model))
+            path = f'p{rng.randint(0, 15)}.jpg'
+            assert manager.update_image_path(image_id, path)
+            model[image_id] = (path, model[image_id][1])
+        else:
+            image_id = rng.choice(sorted(model))
+            assert manager.update_embedding(image_id, vectors(1, step)[0])
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('prebuild', [True, False], ids=['eager', 'lazy'])
+def test_random_operations_keep_lookups_consistent(seed, prebuild):
+    manager = make_manager(prebuild)
+    model = {}
+    random_operations(manager, model, seed)
+    check_lookups(manager, model)
+
+
+@pytest.mark.parametrize('prebuild', [True, False], ids=['eager', 'lazy'])
+def test_lookups_checked_between_steps(prebuild):
+    manager = make_manager(prebuild)
+    model = {}
+    for seed in range(30):
+        random_operations(manager, model, seed, steps=10)
+        check_lookups(manager, model)
+
+
+def test_swap_remove_moves_tail_rows_into_holes():
+    manager = FaissIndexManager(D, index_type='flat')
+    manager.add_embeddings(vectors(6, 0), [1, 2, 3, 4, 5, 6], [f'{i}.jpg' for i in range(1, 7)], [1, 2, 1, 2, 1, 2])
+    manager.get_row_by_path('1.jpg')
+    manager.get_rows_by_class(1)
+    expected = manager.embeddings[[manager.get_row(5)]].copy()
+    # Xóa dòng 0 và 1: dòng 4, 5 ở đuôi được dời vào
+    manager._delete_rows([0, 1])
+    assert manager.image_ids.tolist() == [5, 6, 3, 4]
+    assert manager.get_row(5) == 0 and manager.get_row(6) == 1
+    assert manager.get_row_by_path('5.jpg') == 0 and manager.get_row_by_path('1.jpg') is None
+    assert manager.get_rows_by_class(1).tolist() == [0, 2]
+    assert manager.get_rows_by_class(2).tolist() == [1, 3]
+    np.testing.assert_array_equal(manager.embeddings[0], expected[0])
+
+
+def test_duplicate_paths():
+    manager = FaissIndexManager(D, index_type='flat')
+    manager.add_embeddings(vectors(3, 0), [1, 2, 3], ['same.jpg', 'same.jpg', 'other.jpg'], [1, 1, 2])
+    assert manager.get_row_by_path('same.jpg') in (0, 1)
+    manager.delete_by_image_id(manager.image_ids[manager.get_row_by_path('same.jpg')])
+    # Dòng trùng còn lại vẫn tìm được
+    row = manager.get_row_by_path('same.jpg')
+    assert row is not None and manager.image_paths[row] == 'same.jpg'
+    manager.delete_by_image_id(manager.image_ids[row])
+    assert manager.get_row_by_path('same.jpg') is None
+    assert manager.get_row_by_path('other.jpg') == 0
+
+
+def test_update_image_path_moves_lookup():
+    manager = FaissIndexManager(D, index_type='flat')
+    manager.add_embeddings(vectors(2, 0), [1, 2], ['a.jpg', 'b.jpg'], [1, 1])
+    manager.get_row_by_path('a.jpg')
+    assert manager.update_image_path(1, 'b.jpg')
+    assert manager.get_row_by_path('a.jpg') is None
+    assert manager.get_row_by_path('b.jpg') in (0, 1)
+    assert manager.update_image_path(2, 'c.jpg')
+    assert manager.get_row_by_path('b.jpg') == 0 and manager.get_row_by_path('c.jpg') == 1
+    assert manager.update_image_path(99, 'x.jpg') is False
+
+
+def test_lookups_built_lazily_after_mutations():
+    manager = FaissIndexManager(D, index_type='flat')
+    manager.add_embeddings(vectors(5, 0), [1, 2, 3, 4, 5], ['a', 'b', 'c', 'd', 'e'], [1, 2, 3, 1, 2])
+    manager.delete_by_image_id(1)
+    manager.update_image_path(5, 'z')
+    assert manager._path_to_row is None and manager._class_to_rows is None
+    check_lookups(manager, {2: ('b', 2), 3: ('c', 3), 4: ('d', 1), 5: ('z', 2)})
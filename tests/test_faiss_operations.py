@@ -0,0 +1,200 @@
+import os
+
+import numpy as np
+import pytest
+
+from index.faiss import FaissIndexManager
+from index.snapshot import SHARED_WAL_FILE
+
+D = 8
+
+
+@pytest.fixture
+def make_manager(tmp_path):
+    def make(**kwargs):
+        kwargs.setdefault('wal_path', str(tmp_path / 'wal.log'))
+        return FaissIndexManager(embedding_size=D, snapshot_dir=str(tmp_path / 'snap'), **kwargs)
+    return make
+
+
+def add(manager, ids, class_id=1):
+    rng = np.random.default_rng(ids[0])
+    manager.add_embeddings(rng.random((len(ids), D), dtype=np.float32), ids, [f'p{i}.jpg' for i in ids],
+                           [class_id] * len(ids))
+    manager.commit()
+
+
+def test_replay_after_snapshot(make_manager):
+    manager = make_manager()
+    add(manager, [1, 2, 3])
+    manager.save()
+    add(manager, [4, 5], class_id=2)
+    manager.update_image_path(1, 'moved.jpg')
+    manager.delete_by_image_id(2)
+    manager.commit()
+    manager.flush()
+
+    reloaded = make_manager()
+    reloaded.load()
+    assert sorted(reloaded.image_ids.tolist()) == [1, 3, 4, 5]
+    assert reloaded.get_row_by_path('moved.jpg') is not None
+    assert reloaded.get_row_by_path('p2.jpg') is None
+    assert sorted(reloaded.get_image_ids_by_class(2)) == ['4', '5']
+    assert reloaded.query(manager.embeddings[manager.get_row(4)], topk=1)[0]['image_id'] == 4
+
+
+def test_torn_tail_after_last_commit_is_dropped(make_manager, tmp_path):
+    manager = make_manager()
+    add(manager, [1, 2])
+    manager.save()
+    add(manager, [3])
+    manager.flush()
+    with open(tmp_path / 'wal.log', 'ab') as f:
+        f.write(b'\x20\x00\x00\x00torn')
+
+    reloaded = make_manager()
+    reloaded.load()
+    assert sorted(reloaded.image_ids.tolist()) == [1, 2, 3]
+    # Ghi tiếp sau khi cắt đuôi rồi load lại: không mất bản ghi mới
+    add(reloaded, [4])
+    reloaded.flush()
+    again = make_manager()
+    again.load()
+    assert sorted(again.image_ids.tolist()) == [1, 2, 3, 4]
+
+
+def test_save_drops_log_already_in_snapshot(make_manager, tmp_path):
+    manager = make_manager()
+    add(manager, [1, 2])
+    manager.save()
+    assert not os.path.exists(tmp_path / 'wal.log') or os.path.getsize(tmp_path / 'wal.log') == 0
+    assert manager.snapshots.latest() is not None
+
+    reloaded = make_manager()
+    reloaded.load()
+    assert sorted(reloaded.image_ids.tolist()) == [1, 2]
+
+
+def test_shared_writes_between_managers(make_manager, tmp_path):
+    writer = make_manager(wal_path=None, shared_writes=True)
+    writer.save()
+    reader = make_manager(wal_path=None, shared_writes=True)
+    reader.load()
+
+    add(writer, [1, 2])
+    assert os.path.exists(tmp_path / 'snap' / SHARED_WAL_FILE)
+    assert reader.snapshot_changed()
+    reader.refresh()
+    assert sorted(reader.image_ids.tolist()) == [1, 2]
+
+    # Reader ghi tiếp: áp dụng log của writer trước, rồi writer thấy bản ghi của reader
+    add(reader, [3])
+    writer.refresh()
+    assert sorted(writer.image_ids.tolist()) == [1, 2, 3]
+
+
+def test_reset_index_reloads_empty(make_manager, tmp_path):
+    manager = make_manager()
+    add(manager, [1, 2])
+    manager.save()
+    add(manager, [3])
+    manager.flush()
+    manager.reset_index()
+    assert len(manager) == 0
+
+    reloaded = make_manager()
+    reloaded.load()
+    assert len(reloaded) == 0 and reloaded.index.ntotal == 0
+    # Thêm sau reset vẫn được replay
+    add(reloaded, [4])
+    reloaded.flush()
+    again = make_manager()
+    again.load()
+    assert again.image_ids.tolist() == [4]
+
+
+def test_crash_after_reset_snapshot_does_not_restore_old_data(make_manager, tmp_path, monkeypatch):
+    manager = make_manager()
+    add(manager, [1, 2])
+    manager.save()
+    add(manager, [3])
+    manager.flush()
+
+    # Crash ngay sau khi ghi snapshot rỗng, trước khi kịp xóa log
+    def crash():
+        raise SystemExit('crash')
+    monkeypatch.setattr(manager.wal, 'reset', crash)
+    with pytest.raises(SystemExit):
+        manager.reset_index()
+
+    reloaded = make_manager()
+    reloaded.load()
+    assert len(reloaded) == 0
+
+
+def test_shared_reset_is_seen_by_other_worker(make_manager):
+    writer = make_manager(wal_path=None, shared_writes=True)
+    writer.save()
+    reader = make_manager(wal_path=None, shared_writes=True)
+    reader.load()
+    add(writer, [1, 2])
+    reader.refresh()
+    assert len(reader) == 2
+
+    writer.reset_index()
+    assert reader.snapshot_changed()
+    reader.refresh()
+    assert len(reader) == 0
+    fresh = make_manager(wal_path=None, shared_writes=True)
+    fresh.load()
+    assert len(fresh) == 0
+
+
+def test_shared_refresh_applies_each_record_once(make_manager, monkeypatch):
+    writer = make_manager(wal_path=None, shared_writes=True, wal_compact_bytes=600)
+    writer.save()
+    reader = make_manager(wal_path=None, shared_writes=True)
+    reader.load()
+
+    applied = []
+    apply_records = reader._apply_log_records
+
+    def spy(records):
+        records = list(records)
+        applied.extend(seq for seq, _, _ in records)
+        return apply_records(records)
+    monkeypatch.setattr(reader, '_apply_log_records', spy)
+
+    add(writer, [1, 2])
+    reader.refresh()
+    assert applied == [1]
+
+    # Writer vượt ngưỡng compact: publish generation mới, rồi ghi tiếp vào log sau generation đó
+    start_generation = writer.snapshots.published_generation()
+    for i in range(3, 15, 2):
+        add(writer, [i, i + 1])
+    assert writer.snapshots.published_generation() > start_generation
+    writer.update_embedding(3, np.ones(D, dtype=np.float32))
+    writer.delete_by_image_id(4)
+    assert reader.snapshot_changed()
+    reader.refresh()
+    assert reader.loaded_generation == writer.snapshots.published_generation()
+
+    # Chỉ replay_new phần log mới sau khi đã bắt kịp generation
+    add(writer, [20])
+    writer.update_image_path(1, 'moved.jpg')
+    reader.refresh()
+    assert not reader.snapshot_changed()
+
+    assert len(applied) == len(set(applied))
+    assert reader.wal.last_seq == writer.wal.last_seq
+    assert applied[-2:] == [writer.wal.last_seq - 1, writer.wal.last_seq]
+    assert sorted(reader.image_ids.tolist()) == sorted(writer.image_ids.tolist())
+    assert len(reader) == reader.index.ntotal == len(writer)
+    np.testing.assert_allclose(reader.embeddings[reader.get_row(3)], writer.embeddings[writer.get_row(3)])
+    assert reader.get_row_by_path('moved.jpg') == reader.get_row(1)
+
+    # Refresh khi không có gì mới không áp dụng lại bản ghi nào
+    count = len(applied)
+    assert not reader.refresh()
+    assert reader._catch_up() is None and len(applied) == count
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from index import backends
+from index.faiss import FaissIndexManager
+
+D = 16
+N = 800
+PARAMS = {'nlist': 4, 'nprobe': 4, 'pq_m': 8, 'pq_nbits': 4, 'hnsw_m': 16, 'ef_search': 128}
+# Index PQ nén vector nên chỉ yêu cầu vector đúng nằm trong top-k này
+APPROX_TOPK = {'flat': 1, 'ivf_flat': 1, 'hnsw_flat': 1, 'ivf_pq': 20, 'opq_ivf_pq': 20}
+
+
+def unit(n, seed):
+    vectors = np.random.default_rng(seed).standard_normal((n, D)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture(params=backends.INDEX_TYPES)
+def manager(request, monkeypatch):
+    manager = FaissIndexManager(D, index_type=request.param, index_params=PARAMS)
+    ids = np.arange(1, N + 1)
+    manager.add_embeddings(unit(N, 0), ids, [f'{i}.jpg' for i in ids], ids % 40)
+    assert manager._active_index_type == request.param
+    rebuilds = []
+    rebuild = manager._rebuild_index
+    monkeypatch.setattr(manager, '_rebuild_index', lambda: rebuilds.append(1) or rebuild())
+    manager.rebuilds = rebuilds
+    return manager
+
+
+def found(manager, vector, image_id):
+    topk = APPROX_TOPK[manager._active_index_type]
+    results = manager.query_batch(vector.reshape(1, -1), topk)[0]
+    return image_id in [int(r['image_id']) for r in results]
+
+
+def check_consistent(manager, removed=()):
+    """ntotal, ma trận embedding và kết quả truy vấn khớp với metadata hiện tại."""
+    assert manager.index.ntotal == len(manager) == manager.embeddings.shape[0]
+    ids = manager.image_ids
+    results = manager.query_batch(manager.embeddings[::7], 20)
+    for row_results in results:
+        for r in row_results:
+            assert int(r['image_id']) not in removed
+            assert ids[r['faiss_index']] == r['image_id']
+    for row in range(0, len(manager), 37):
+        assert found(manager, manager.embeddings[row], int(ids[row]))
+
+
+def expect_rebuilds(manager, count):
+    supports = backends.supports_remove(manager._active_index_type)
+    assert len(manager.rebuilds) == (0 if supports else count)
+
+
+def test_delete_by_image_id(manager):
+    removed = {5, 17, 400, N}
+    for image_id in removed:
+        vector = manager.embeddings[manager.get_row(image_id)].copy()
+        assert manager.delete_by_image_id(image_id)
+        assert not found(manager, vector, image_id)
+    assert len(manager) == N - len(removed)
+    check_consistent(manager, removed)
+    expect_rebuilds(manager, len(removed))
+    assert manager.delete_by_image_id(5) is False
+
+
+def test_delete_by_class_id(manager):
+    removed = set(np.flatnonzero(np.arange(1, N + 1) % 40 == 3) + 1)
+    assert manager.delete_by_class_id(3)
+    assert not manager.has_class_id(3)
+    assert len(manager) == N - len(removed)
+    check_consistent(manager, removed)
+    expect_rebuilds(manager, 1)
+
+
+def test_update_embedding_in_place(manager):
+    new = unit(3, 99)
+    for image_id, vector in zip((1, 300, N), new):
+        old = manager.embeddings[manager.get_row(image_id)].copy()
+        assert manager.update_embedding(image_id, vector * 3)
+        row = manager.get_row(image_id)
+        np.testing.assert_allclose(manager.embeddings[row], vector, rtol=1e-5, atol=1e-6)
+        assert found(manager, vector, image_id)
+        if manager._active_index_type in ('flat', 'ivf_flat', 'hnsw_flat'):
+            assert not found(manager, old, image_id)
+    assert len(manager) == N
+    check_consistent(manager)
+    expect_rebuilds(manager, 3)
+    assert manager.update_embedding(N + 1, new[0]) is False
+
+
+def test_mixed_operations_then_rebuild_matches(manager):
+    manager.delete_by_class_id(7)
+    manager.update_embedding(2, unit(1, 5)[0])
+    manager.delete_by_image_id(3)
+    extra = np.arange(N + 1, N + 21)
+    manager.add_embeddings(unit(20, 6), extra, [f'{i}.jpg' for i in extra], extra % 40)
+    check_consistent(manager)
+    queries = unit(5, 7)
+    before = [[int(r['image_id']) for r in rows] for rows in manager.query_batch(queries, 5)]
+    # Index được cập nhật tăng dần cho cùng kết quả với index dựng lại từ ma trận (index chính xác)
+    manager.rebuild_index()
+    after = [[int(r['image_id']) for r in rows] for rows in manager.query_batch(queries, 5)]
+    if manager._active_index_type in ('flat', 'hnsw_flat'):
+        assert before == after
+    check_consistent(manager)
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from index.metadata import StringColumn, read_metadata, write_metadata, is_columnar
+
+PATHS = ['a.jpg', 'thư mục/ảnh b.jpg', '', 'c.jpg']
+
+
+def test_string_column_list_operations():
+    column = StringColumn.from_strings(PATHS)
+    assert len(column) == 4
+    assert column.tolist() == PATHS
+    assert column[1] == 'thư mục/ảnh b.jpg'
+    assert column[-1] == 'c.jpg'
+    assert column[1:3] == PATHS[1:3]
+
+    column[0] = 'z.jpg'
+    column[3] = column.ref(1)
+    column.append('d.jpg')
+    del column[4:]
+    assert column.tolist() == ['z.jpg', 'thư mục/ảnh b.jpg', '', 'thư mục/ảnh b.jpg']
+    with pytest.raises(IndexError):
+        column[4]
+    with pytest.raises(TypeError):
+        del column[1]
+
+
+def test_find_and_contains():
+    offsets, heap = StringColumn.from_strings(PATHS).to_arrays()
+    column = StringColumn(offsets, heap)
+    column.append('e.jpg')
+    assert column.find('c.jpg') == 3
+    assert column.find('') == 2
+    assert column.find('e.jpg') == 4
+    assert 'thư mục/ảnh b.jpg' in column
+    assert 'missing.jpg' not in column
+    # Dòng gốc bị ghi đè không còn tìm thấy chuỗi cũ
+    column[3] = 'f.jpg'
+    assert column.find('c.jpg') == -1
+    assert column.find('f.jpg') == 3
+
+
+def test_to_arrays_roundtrip_after_edits():
+    offsets, heap = StringColumn.from_strings(PATHS).to_arrays()
+    column = StringColumn(offsets, heap)
+    column[1] = column.ref(3)
+    column.extend(['x.jpg', 'y.jpg'])
+    expected = column.tolist()
+    assert StringColumn(*column.to_arrays()).tolist() == expected
+    assert column.copy().tolist() == expected
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_columnar_roundtrip(tmp_path, mmap):
+    path = str(tmp_path / 'meta')
+    embeddings = np.random.default_rng(0).random((4, 8), dtype=np.float32)
+    write_metadata(path, np.array([1, 2, 3, 4]), np.array([7, 7, 8, 9]), PATHS, wal_seq=42, embeddings=embeddings)
+    assert is_columnar(path)
+
+    meta = read_metadata(path, mmap=mmap)
+    assert meta['image_ids'].tolist() == [1, 2, 3, 4]
+    assert meta['class_ids'].tolist() == [7, 7, 8, 9]
+    assert meta['image_paths'].tolist() == PATHS
+    np.testing.assert_array_equal(meta['embeddings'], embeddings)
+    assert meta['wal_seq'] == 42
+    assert isinstance(meta['image_ids'], np.memmap) == mmap
+
+
+def test_rewrite_replaces_previous_metadata(tmp_path):
+    path = str(tmp_path / 'meta')
+    write_metadata(path, np.array([1]), np.array([1]), ['old.jpg'])
+    write_metadata(path, np.array([2, 3]), np.array([1, 2]), ['new1.jpg', 'new2.jpg'], wal_seq=5)
+    meta = read_metadata(path)
+    assert meta['image_paths'].tolist() == ['new1.jpg', 'new2.jpg']
+    assert meta['embeddings'] is None
+    assert not (tmp_path / 'meta.tmp').exists() and not (tmp_path / 'meta.old').exists()
+
+
+def test_legacy_npz_is_still_readable(tmp_path):
+    path = str(tmp_path / 'meta.npz')
+    write_metadata(path, np.array([1, 2]), np.array([3, 4]), ['a.jpg', 'b.jpg'], wal_seq=3)
+    meta = read_metadata(path)
+    assert meta['image_paths'].tolist() == ['a.jpg', 'b.jpg']
+    assert meta['wal_seq'] == 3
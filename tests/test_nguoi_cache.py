@@ -0,0 +1,139 @@
+import threading
+import time
+
+from db.nguoi_cache import NguoiCache
+
+
+def read_through(cache, key, load):
+    """Cùng trình tự với NguoiRepository.get_by_class_id: get, version() trước khi đọc, rồi put."""
+    found, value = cache.get(key)
+    if found:
+        return value
+    version = cache.version()
+    value = load(key)
+    cache.put(key, value, version)
+    return value
+
+
+def test_hit_after_put():
+    cache = NguoiCache()
+    assert cache.get('1') == (False, None)
+    cache.put('1', 'An', cache.version())
+    assert cache.get('1') == (True, 'An')
+    stats = cache.get_stats()
+    assert stats['hits'] == 1 and stats['misses'] == 1 and stats['hit_rate'] == 0.5
+
+
+def test_negative_result_is_cached_with_its_own_ttl():
+    cache = NguoiCache(ttl=60, negative_ttl=0.02)
+    cache.put('1', None, cache.version())
+    cache.put('2', 'Bình', cache.version())
+    assert cache.get('1') == (True, None)
+    time.sleep(0.03)
+    assert cache.get('1') == (False, None)
+    assert cache.get('2') == (True, 'Bình')
+    stats = cache.get_stats()
+    assert stats['negative_hits'] == 1 and stats['expirations'] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = NguoiCache(ttl=0.02)
+    cache.put('1', 'An', cache.version())
+    time.sleep(0.03)
+    assert cache.get('1') == (False, None)
+    assert cache.get_stats()['size'] == 0
+
+
+def test_invalidate_and_clear():
+    cache = NguoiCache()
+    for key in '123':
+        cache.put(key, key, cache.version())
+    cache.invalidate(2)
+    assert cache.get('2') == (False, None)
+    assert cache.get('1') == (True, '1')
+    cache.clear()
+    assert cache.get('1') == (False, None)
+    assert cache.get_stats()['invalidations'] == 2
+
+
+def test_lru_eviction():
+    cache = NguoiCache(max_size=2)
+    cache.put('1', 'a', cache.version())
+    cache.put('2', 'b', cache.version())
+    cache.get('1')
+    cache.put('3', 'c', cache.version())
+    assert cache.get('2') == (False, None)
+    assert cache.get('1') == (True, 'a')
+    assert cache.get('3') == (True, 'c')
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_disabled_cache_stores_nothing():
+    cache = NguoiCache(max_size=0)
+    cache.put('1', 'a', cache.version())
+    assert cache.get('1') == (False, None)
+
+
+def test_stale_read_is_not_cached_after_concurrent_write():
+    cache = NguoiCache()
+    table = {'1': 'tên cũ'}
+    reading = threading.Event()
+    written = threading.Event()
+
+    def slow_load(key):
+        value = table.get(key)
+        reading.set()
+        # Writer sửa bảng và invalidate trong lúc lần đọc này còn đang chạy
+        written.wait(5)
+        return value
+
+    reader = threading.Thread(target=read_through, args=(cache, '1', slow_load))
+    reader.start()
+    assert reading.wait(5)
+    table['1'] = 'tên mới'
+    cache.invalidate(1)
+    written.set()
+    reader.join(5)
+
+    # Giá trị cũ đọc trước khi ghi không được đưa vào cache
+    assert cache.get('1') == (False, None)
+    assert read_through(cache, '1', table.get) == 'tên mới'
+    assert cache.get('1') == (True, 'tên mới')
+
+
+def test_concurrent_readers_and_writers_never_serve_deleted_rows():
+    cache = NguoiCache()
+    table = {str(i): f'người {i}' for i in range(50)}
+    table_lock = threading.Lock()
+    stop = threading.Event()
+    errors = []
+
+    def load(key):
+        with table_lock:
+            return table.get(key)
+
+    def reader():
+        while not stop.is_set():
+            for i in range(50):
+                read_through(cache, str(i), load)
+
+    def writer():
+        for i in range(50):
+            # Giống NguoiRepository.delete_by_class_id: ghi MySQL rồi invalidate
+            with table_lock:
+                del table[str(i)]
+            cache.invalidate(i)
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    writer()
+    stop.set()
+    for thread in readers:
+        thread.join(5)
+
+    for i in range(50):
+        found, value = cache.get(str(i))
+        if found and value is not None:
+            errors.append((i, value))
+    assert errors == []
@@ -0,0 +1,288 @@
+import random
+import sqlite3
+import threading
+
+import numpy as np
+import pytest
+
+from db import nguoi_search_index as search_module
+from db.models import Nguoi
+from db.nguoi_search_index import NguoiSearchIndex, normalize_text, nguoi_haystack
+
+HO = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Đặng', 'Bùi', 'Đỗ']
+DEM = ['Văn', 'Thị', 'Hữu', 'Minh', 'Ngọc', 'Đức']
+TEN = ['An', 'Bình', 'Dũng', 'Hà', 'Lan', 'Nghĩa', 'Tuấn', 'Yến', 'Đạt']
+NOI_O = ['Hà Nội', 'TP. Hồ Chí Minh', 'Đà Nẵng', 'Huế', 'Cần Thơ', None]
+
+
+def make_rows(n, seed=0):
+    rng = random.Random(seed)
+    return [{
+        'class_id': i,
+        'ten': f'{rng.choice(HO)} {rng.choice(DEM)} {rng.choice(TEN)}',
+        'tuoi': rng.randint(18, 80),
+        'gioitinh': rng.choice(['Nam', 'Nữ']),
+        'noio': rng.choice(NOI_O)
+    } for i in range(n)]
+
+
+class SqlTable:
+    """Bảng nguoi tham chiếu trong sqlite: tìm bằng LIKE '%q%' trên từng cột đã bỏ dấu, sắp xếp như index."""
+
+    def __init__(self, rows):
+        self.db = sqlite3.connect(':memory:')
+        self.db.execute('CREATE TABLE nguoi (class_id INTEGER PRIMARY KEY, ten TEXT, tuoi TEXT, gioitinh TEXT, '
+                        'noio TEXT, hay BLOB)')
+        for row in rows:
+            self.upsert(row)
+
+    def upsert(self, row):
+        self.db.execute('REPLACE INTO nguoi VALUES (?, ?, ?, ?, ?, ?)', (
+            row['class_id'], normalize_text(row['ten']), normalize_text(row['tuoi']),
+            normalize_text(row['gioitinh']), normalize_text(row['noio']),
+            nguoi_haystack(row['ten'], row['tuoi'], row['gioitinh'], row['noio'])))
+
+    def delete(self, class_id):
+        self.db.execute('DELETE FROM nguoi WHERE class_id = ?', (class_id,))
+
+    def search(self, query, offset=0, limit=-1):
+        pattern = f'%{normalize_text(query).strip()}%'
+        where = 'ten LIKE ?1 OR noio LIKE ?1 OR tuoi LIKE ?1 OR gioitinh LIKE ?1'
+        total = self.db.execute(f'SELECT COUNT(*) FROM nguoi WHERE {where}', (pattern,)).fetchone()[0]
+        page = self.db.execute(f'SELECT class_id FROM nguoi WHERE {where} ORDER BY hay, class_id LIMIT ?2 OFFSET ?3',
+                               (pattern, limit, offset)).fetchall()
+        return [class_id for class_id, in page], total
+
+
+def nguoi(row):
+    return Nguoi(**{key: row[key] for key in ('class_id', 'ten', 'tuoi', 'gioitinh', 'noio')})
+
+
+@pytest.fixture
+def rows():
+    return make_rows(400)
+
+
+@pytest.fixture
+def index(rows):
+    index = NguoiSearchIndex(refresh_s=0, max_delta=10 ** 9)
+    index.search('', 0, 1, lambda: rows)
+    return index
+
+
+def search_ids(index, query):
+    return index.search(query, 0, None, None)[0]
+
+
+def test_normalize_text():
+    assert normalize_text('Nguyễn Văn ĐỨC') == 'nguyen van duc'
+    assert normalize_text('Đặng Thị Hà') == 'dang thi ha'
+    assert normalize_text(None) == ''
+    assert normalize_text(45) == '45'
+
+
+def test_accent_and_case_insensitive():
+    rows = [
+        {'class_id': 1, 'ten': 'Nguyễn Văn Đức', 'tuoi': 30, 'gioitinh': 'Nam', 'noio': 'Hà Nội'},
+        {'class_id': 2, 'ten': 'Trần Thị Hà', 'tuoi': 25, 'gioitinh': 'Nữ', 'noio': 'Huế'},
+        {'class_id': 3, 'ten': 'Le Duc Anh', 'tuoi': 41, 'gioitinh': 'Nam', 'noio': 'Đà Nẵng'},
+    ]
+    index = NguoiSearchIndex(refresh_s=0)
+    index.search('', 0, 1, lambda: rows)
+    for query in ('duc', 'ĐỨC', 'Đức', 'dUc'):
+        assert search_ids(index, query) == [3, 1]
+    assert search_ids(index, 'nguyen van duc') == [1]
+    assert search_ids(index, 'HÀ NỘI') == [1]
+    assert search_ids(index, 'da nang') == [3]
+    assert search_ids(index, 'nu') == [2]
+    assert search_ids(index, 'NOI') == [1]
+    # Từ khóa không khớp vắt qua hai trường
+    assert search_ids(index, 'duc ha') == []
+    assert search_ids(index, 'hue 25') == []
+
+
+@pytest.mark.parametrize('query', ['a', 'h', 'đ', '4', 'an', 'hu', 'Hà', '1', ' '])
+def test_short_queries_use_scan(index, rows, query, monkeypatch):
+    calls = []
+    scan = search_module._SearchBase._scan
+    monkeypatch.setattr(search_module._SearchBase, '_scan', lambda self, q: calls.append(q) or scan(self, q))
+    expected = SqlTable(rows).search(query)
+    assert index.search(query, 0, None, None) == expected
+    if normalize_text(query).strip():
+        assert calls
+
+
+@pytest.mark.parametrize('query', ['van an', 'nguyen', 'ho chi minh', 'thi yen', 'dang minh', 'ha noi', 'xyz q'])
+def test_long_queries_are_verified(index, rows, query, monkeypatch):
+    calls = []
+    verify = search_module._SearchBase._verify
+    monkeypatch.setattr(search_module._SearchBase, '_verify', lambda self, d, q: calls.append(q) or verify(self, d, q))
+    assert index.search(query, 0, None, None) == SqlTable(rows).search(query)
+    assert calls
+
+
+def test_verify_rejects_trigrams_that_are_not_contiguous():
+    rows = [
+        {'class_id': 1, 'ten': 'abcxbcd', 'tuoi': 1, 'gioitinh': 'Nam', 'noio': ''},
+        {'class_id': 2, 'ten': 'abcd', 'tuoi': 1, 'gioitinh': 'Nam', 'noio': ''},
+    ]
+    index = NguoiSearchIndex(refresh_s=0)
+    index.search('', 0, 1, lambda: rows)
+    # Doc 1 có cả 'abc' và 'bcd' nhưng không có 'abcd'
+    assert search_ids(index, 'abcd') == [2]
+
+
+def test_three_byte_query_uses_postings_only(index, rows):
+    assert index.search('ngu', 0, None, None) == SqlTable(rows).search('ngu')
+
+
+@pytest.mark.parametrize('query', ['', 'a', 'nguyen', 'ha noi', 'thi'])
+@pytest.mark.parametrize('offset, limit', [(0, 15), (15, 15), (390, 15), (1000, 15)])
+def test_pages_match_sql_like(index, rows, query, offset, limit):
+    assert index.search(query, offset, limit, None) == SqlTable(rows).search(query, offset, limit)
+
+
+def apply_changes(index, table, rows):
+    rng = random.Random(1)
+    extra = make_rows(60, seed=7)
+    for i, row in enumerate(extra):
+        row['class_id'] = 1000 + i
+        index.upsert(nguoi(row))
+        table.upsert(row)
+    for row in rng.sample(rows, 40):
+        index.delete(row['class_id'])
+        table.delete(row['class_id'])
+    for row in rng.sample(rows, 40):
+        changed = dict(row, ten='Zô Văn Mới', noio='Hải Phòng')
+        index.upsert(nguoi(changed))
+        table.upsert(changed)
+    # Xóa một người mới thêm trong delta
+    index.delete(1000)
+    table.delete(1000)
+
+
+QUERIES = ['', 'zo van moi', 'hai phong', 'nguyen', 'an', 'a', 'moi', 'ho chi minh']
+
+
+def test_delta_changes_before_and_after_rebuild(index, rows):
+    table = SqlTable(rows)
+    apply_changes(index, table, rows)
+    assert index.get_stats()['delta_size'] > 0 and index.get_stats()['dead'] > 0
+    for query in QUERIES:
+        assert index.search(query, 0, None, None) == table.search(query), query
+        assert index.search(query, 5, 10, None) == table.search(query, 5, 10), query
+
+    # Gộp delta vào index chính (không đọc MySQL)
+    index._rebuild(from_db=False)
+    stats = index.get_stats()
+    assert stats['delta_size'] == 0 and stats['dead'] == 0 and stats['compactions'] == 1
+    for query in QUERIES:
+        assert index.search(query, 0, None, None) == table.search(query), query
+
+
+def test_changes_during_rebuild_are_replayed(index, rows):
+    table = SqlTable(rows)
+    loading = threading.Event()
+    resume = threading.Event()
+
+    def slow_loader():
+        loading.set()
+        resume.wait(5)
+        return rows
+
+    index._loader = slow_loader
+    builder = threading.Thread(target=index._rebuild, args=(True,))
+    builder.start()
+    assert loading.wait(5)
+    # Ghi trong lúc đang đọc MySQL: loader trả về dữ liệu trước thay đổi, thay đổi được áp lại sau khi dựng
+    apply_changes(index, table, rows)
+    resume.set()
+    builder.join(5)
+    for query in QUERIES:
+        assert index.search(query, 0, None, None) == table.search(query), query
+
+
+def test_oversized_delta_triggers_background_compaction(rows):
+    index = NguoiSearchIndex(refresh_s=0, max_delta=5)
+    index.search('', 0, 1, lambda: rows)
+    for row in rows[:10]:
+        index.upsert(nguoi(dict(row, ten='Zô Văn Mới')))
+    index.search('zo', 0, 1, None)
+    for _ in range(500):
+        if index.get_stats()['compactions']:
+            break
+        threading.Event().wait(0.01)
+    assert index.get_stats()['compactions'] == 1
+    assert index.search('zo van moi', 0, None, None)[1] == 10
+
+
+def test_clear_and_writes_before_first_build(rows):
+    index = NguoiSearchIndex(refresh_s=0)
+    # Chưa dựng: thay đổi bị bỏ qua, lần dựng đầu đọc dữ liệu từ loader
+    index.delete(rows[0]['class_id'])
+    assert index.search('', 0, None, lambda: rows)[1] == len(rows)
+    index.clear()
+    assert index.search('', 0, None, None) == ([], 0)
+    index.upsert(nguoi(rows[0]))
+    assert index.search('', 0, None, None) == ([rows[0]['class_id']], 1)
+
+
+# ----- NguoiRepository.search_nguoi_paged -----
+
+class SqliteCursor:
+    """Cursor kiểu pymysql DictCursor trên sqlite, để chạy đúng SQL của NguoiRepository."""
+
+    def __init__(self, db):
+        self._cursor = db.cursor()
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(sql.replace('%s', '?'), params)
+
+    def fetchone(self):
+        rows = self.fetchall()
+        return rows[0] if rows else None
+
+    def fetchall(self):
+        names = [column[0] for column in self._cursor.description]
+        return [dict(zip(names, row)) for row in self._cursor.fetchall()]
+
+
+@pytest.fixture
+def repository(rows, monkeypatch):
+    pytest.importorskip('pymysql')
+    import db.nguoi_repository as repository_module
+    from db.nguoi_cache import NguoiCache
+
+    db = sqlite3.connect(':memory:', check_same_thread=False)
+    db.execute('CREATE TABLE nguoi (class_id INTEGER PRIMARY KEY, ten TEXT, tuoi INTEGER, gioitinh TEXT, noio TEXT)')
+    db.executemany('INSERT INTO nguoi VALUES (:class_id, :ten, :tuoi, :gioitinh, :noio)', rows)
+
+    class SqliteNguoiRepository(repository_module.NguoiRepository):
+        def __enter__(self):
+            return SqliteCursor(db)
+
+        def __exit__(self, exc_type, exc_val, exc_tb):
+            db.commit()
+
+    monkeypatch.setattr(repository_module, 'nguoi_search_index', NguoiSearchIndex(refresh_s=0))
+    monkeypatch.setattr(repository_module, 'nguoi_cache', NguoiCache())
+    return SqliteNguoiRepository()
+
+
+@pytest.mark.parametrize('query', ['', 'nguyen van', 'HÀ NỘI', 'a', 'không có'])
+@pytest.mark.parametrize('page', [1, 2, 30])
+def test_search_nguoi_paged_filters_before_paging(repository, rows, query, page):
+    expected_ids, expected_total = SqlTable(rows).search(query, (page - 1) * 15, 15)
+    result = repository.search_nguoi_paged(query, page, 15)
+    assert result['total'] == expected_total
+    assert [n.class_id for n in result['nguoi_list']] == expected_ids
+
+
+def test_search_nguoi_paged_sees_repository_writes(repository, rows):
+    repository.search_nguoi_paged('', 1, 1)
+    new = Nguoi(class_id=5000, ten='Zô Văn Mới', tuoi=20, gioitinh='Nam', noio='Hải Phòng')
+    repository.add(new)
+    result = repository.search_nguoi_paged('zo van', 1, 15)
+    assert result['total'] == 1 and result['nguoi_list'][0].ten == 'Zô Văn Mới'
+    repository.delete_by_class_id(5000)
+    assert repository.search_nguoi_paged('zo van', 1, 15) == {'nguoi_list': [], 'total': 0}
@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+from index.persistence import PersistenceWorker
+
+
+class FakeManager:
+    """Ghi lại các lần persist_pending để kiểm tra việc gộp thay đổi của worker."""
+
+    def __init__(self, fail_times=0):
+        self.calls = []
+        self.fail_times = fail_times
+        self.persisted = threading.Event()
+
+    def persist_pending(self, lock, dirty=1):
+        with lock:
+            self.calls.append(dirty)
+        self.persisted.set()
+        if self.fail_times:
+            self.fail_times -= 1
+            raise OSError('disk full')
+
+
+@pytest.fixture
+def lock():
+    return threading.Lock()
+
+
+def start_worker(manager, lock, interval=60.0, max_dirty=1000):
+    return PersistenceWorker(manager, lock, interval=interval, max_dirty=max_dirty).start()
+
+
+def test_notifications_are_coalesced_into_one_flush(lock):
+    manager = FakeManager()
+    worker = start_worker(manager, lock)
+    for _ in range(50):
+        worker.notify()
+    assert manager.calls == []
+    assert worker.flush(timeout=5)
+    assert manager.calls == [50]
+    stats = worker.get_stats()
+    assert stats['flushes'] == 1 and stats['changes_persisted'] == 50 and stats['pending_changes'] == 0
+    worker.stop(timeout=5)
+
+
+def test_interval_triggers_flush(lock):
+    manager = FakeManager()
+    worker = start_worker(manager, lock, interval=0.05)
+    worker.notify(3)
+    assert manager.persisted.wait(5)
+    assert manager.calls == [3]
+    worker.stop(timeout=5)
+
+
+def test_max_dirty_flushes_without_waiting_for_interval(lock):
+    manager = FakeManager()
+    worker = start_worker(manager, lock, interval=60.0, max_dirty=10)
+    worker.notify(4)
+    time.sleep(0.05)
+    assert manager.calls == []
+    worker.notify(6)
+    assert manager.persisted.wait(5)
+    assert manager.calls == [10]
+    worker.stop(timeout=5)
+
+
+def test_stop_persists_remaining_changes(lock):
+    manager = FakeManager()
+    worker = start_worker(manager, lock)
+    worker.notify(2)
+    worker.stop(timeout=5)
+    assert manager.calls == [2]
+    assert not worker._thread.is_alive()
+
+
+def test_stop_without_changes_does_not_persist(lock):
+    manager = FakeManager()
+    worker = start_worker(manager, lock)
+    worker.stop(timeout=5)
+    assert manager.calls == []
+
+
+def test_failed_flush_is_retried(lock):
+    manager = FakeManager(fail_times=1)
+    worker = start_worker(manager, lock)
+    worker.notify(5)
+    assert not worker.flush(timeout=5)
+    assert worker.get_stats()['last_error'] == 'disk full'
+    # Thay đổi chưa ghi được được giữ lại cho lần ghi sau
+    assert worker.flush(timeout=5)
+    assert manager.calls == [5, 5]
+    worker.stop(timeout=5)
+
+
+def test_flush_before_start_persists_inline(lock):
+    manager = FakeManager()
+    worker = PersistenceWorker(manager, lock)
+    assert worker.flush()
+    assert manager.calls == [1]
@@ -0,0 +1,147 @@
+import threading
+import time
+
+import pytest
+
+from service.rw_lock import ReadWriteLock
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def test_readers_run_concurrently():
+    lock = ReadWriteLock()
+    inside = threading.Barrier(4, timeout=5)
+
+    def reader():
+        with lock.read():
+            # Chỉ qua được barrier khi cả 4 reader cùng giữ lock
+            inside.wait()
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert not inside.broken
+    stats = lock.get_stats()
+    assert stats['max_concurrent_readers'] == 4 and stats['reads'] == 4 and stats['active_readers'] == 0
+
+
+def test_writer_is_exclusive():
+    lock = ReadWriteLock()
+    events = []
+    lock.acquire_read()
+    writer = threading.Thread(target=lambda: (lock.acquire_write(), events.append('write'), lock.release_write()))
+    writer.start()
+    assert wait_until(lambda: lock.get_stats()['writers_waiting'] == 1)
+    assert events == []
+    lock.release_read()
+    writer.join(5)
+    assert events == ['write']
+
+
+def test_waiting_writer_blocks_new_readers():
+    lock = ReadWriteLock()
+    order = []
+    lock.acquire_read()
+
+    def writer():
+        with lock.write():
+            order.append('writer')
+
+    def late_reader():
+        with lock.read():
+            order.append('reader')
+
+    writer_thread = threading.Thread(target=writer)
+    writer_thread.start()
+    assert wait_until(lambda: lock.get_stats()['writers_waiting'] == 1)
+    reader_thread = threading.Thread(target=late_reader)
+    reader_thread.start()
+    time.sleep(0.05)
+    # Reader đến sau writer phải chờ, dù lock đang ở chế độ đọc
+    assert order == [] and lock.get_stats()['active_readers'] == 1
+    lock.release_read()
+    writer_thread.join(5)
+    reader_thread.join(5)
+    assert order == ['writer', 'reader']
+
+
+def test_writer_blocks_readers_and_writers():
+    lock = ReadWriteLock()
+    order = []
+    lock.acquire_write()
+    threads = [
+        threading.Thread(target=lambda: (lock.acquire_read(), order.append('reader'), lock.release_read())),
+        threading.Thread(target=lambda: (lock.acquire_write(), order.append('writer'), lock.release_write())),
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    assert order == []
+    lock.release_write()
+    for thread in threads:
+        thread.join(5)
+    assert sorted(order) == ['reader', 'writer']
+
+
+@pytest.mark.parametrize('mode', ['read', 'write', 'plain'])
+def test_views_release_on_exception(mode):
+    lock = ReadWriteLock()
+    view = lock if mode == 'plain' else getattr(lock, mode)()
+    with pytest.raises(RuntimeError):
+        with view:
+            raise RuntimeError('boom')
+    stats = lock.get_stats()
+    assert stats['active_readers'] == 0 and not stats['writer_active']
+    # Lock dùng lại được ngay ở cả hai chế độ
+    acquired = []
+    thread = threading.Thread(target=lambda: (lock.acquire_write(), acquired.append(1), lock.release_write()))
+    thread.start()
+    thread.join(5)
+    assert acquired == [1]
+    with lock.read():
+        pass
+
+
+def test_many_threads_never_overlap_writer():
+    lock = ReadWriteLock()
+    state = {'readers': 0, 'writers': 0}
+    errors = []
+    guard = threading.Lock()
+
+    def enter(kind):
+        with guard:
+            state[kind] += 1
+            if state['writers'] > 1 or (state['writers'] and state['readers']):
+                errors.append(dict(state))
+
+    def leave(kind):
+        with guard:
+            state[kind] -= 1
+
+    def worker(i):
+        for k in range(200):
+            if (i + k) % 10 == 0:
+                with lock.write():
+                    enter('writers')
+                    leave('writers')
+            else:
+                with lock.read():
+                    enter('readers')
+                    leave('readers')
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    assert errors == []
+    assert lock.get_stats()['writes'] == 160
@@ -0,0 +1,138 @@
+import numpy as np
+import pytest
+
+from index.faiss import FaissIndexManager
+from index.sharded import ShardedFaissIndexManager, create_faiss_manager, shard_path
+
+D = 16
+N = 120
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((N, D)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    image_ids = np.arange(1000, 1000 + N)
+    class_ids = rng.integers(0, 25, N)
+    return embeddings, image_ids, [f'img/{i}.jpg' for i in image_ids], class_ids
+
+
+@pytest.fixture
+def single(data):
+    manager = FaissIndexManager(D, index_type='flat')
+    manager.add_embeddings(*data)
+    return manager
+
+
+@pytest.fixture
+def sharded(data):
+    manager = ShardedFaissIndexManager(D, num_shards=3, index_type='flat')
+    manager.add_embeddings(*data)
+    return manager
+
+
+def test_create_faiss_manager_and_shard_path():
+    assert isinstance(create_faiss_manager(num_shards=1, embedding_size=D), FaissIndexManager)
+    assert isinstance(create_faiss_manager(num_shards=2, embedding_size=D), ShardedFaissIndexManager)
+    assert shard_path('index/faiss_db.index', 1) == 'index/faiss_db.shard01.index'
+    assert shard_path('index/meta/', 2) == 'index/meta.shard02'
+    assert shard_path(None, 0) is None
+
+
+def test_rows_are_placed_by_class(sharded, data):
+    _, image_ids, _, class_ids = data
+    for image_id, class_id in zip(image_ids.tolist(), class_ids.tolist()):
+        assert sharded.shards[class_id % 3].get_row(image_id) is not None
+    assert len(sharded) == N and sharded.index.ntotal == N
+
+
+def test_query_batch_merges_top_k_across_shards(single, sharded, data):
+    queries = np.random.default_rng(1).standard_normal((8, D)).astype(np.float32)
+    for topk in (1, 5, 20):
+        expected = single.query_batch(queries, topk)
+        merged = sharded.query_batch(queries, topk)
+        for want, got in zip(expected, merged):
+            assert [r['image_id'] for r in got] == [r['image_id'] for r in want]
+            np.testing.assert_allclose([r['score'] for r in got], [r['score'] for r in want], rtol=1e-5)
+            scores = [r['score'] for r in got]
+            assert scores == sorted(scores, reverse=True)
+
+
+def test_query_ignores_empty_shards(data):
+    embeddings, image_ids, image_paths, _ = data
+    manager = ShardedFaissIndexManager(D, num_shards=4, index_type='flat')
+    manager.add_embeddings(embeddings[:10], image_ids[:10], image_paths[:10], [4] * 10)
+    results = manager.query(embeddings[3], topk=3)
+    assert results[0]['image_id'] == image_ids[3]
+    assert len(results) == 3
+
+
+def test_global_rows(sharded, data):
+    embeddings, image_ids, image_paths, class_ids = data
+    all_embeddings = sharded.embeddings
+    all_ids = sharded.image_ids
+    for k, image_id in enumerate(image_ids.tolist()):
+        row = sharded.get_row(image_id)
+        assert all_ids[row] == image_id
+        np.testing.assert_allclose(all_embeddings[row], embeddings[k], rtol=1e-5, atol=1e-6)
+        assert sharded.get_row_by_path(image_paths[k]) == row
+        assert sharded.image_paths[row] == image_paths[k]
+        assert sharded._row_to_dict(row)['image_id'] == image_id
+    for class_id in np.unique(class_ids).tolist():
+        rows = sharded.get_rows_by_class(class_id)
+        assert sorted(all_ids[rows].tolist()) == sorted(image_ids[class_ids == class_id].tolist())
+    # faiss_index trong kết quả truy vấn là dòng toàn cục
+    for result in sharded.query(embeddings[50], topk=5):
+        assert all_ids[result['faiss_index']] == result['image_id']
+    with pytest.raises(IndexError):
+        sharded._locate(N)
+
+
+def test_duplicate_image_id_is_rejected_across_shards(sharded, data):
+    embeddings = data[0]
+    # image_id 1000 đang nằm ở shard của class đầu tiên, thêm lại với class thuộc shard khác
+    owner = sharded.shard_index(data[3][0])
+    other_class = owner + 1
+    with pytest.raises(ValueError, match='trùng'):
+        sharded.add_embeddings(embeddings[:1], [1000], ['dup.jpg'], [other_class])
+    with pytest.raises(ValueError, match='trùng'):
+        sharded.add_embeddings(embeddings[:2], [5000, 5000], ['a.jpg', 'b.jpg'], [0, 1])
+    assert len(sharded) == N
+    assert sharded.get_row(5000) is None
+    sharded.add_embeddings(embeddings[:2], [5000, 5001], ['a.jpg', 'b.jpg'], [0, 1])
+    assert sharded.get_row(5001) is not None
+
+
+def test_mutations_touch_only_owner_shard(sharded, data):
+    image_id, class_id = int(data[1][0]), int(data[3][0])
+    owner = sharded.shard_index(class_id)
+    sharded._touched.clear()
+    sharded.update_image_path(image_id, 'moved.jpg')
+    assert sharded._touched == {owner}
+    assert sharded.get_row_by_path('moved.jpg') == sharded.get_row(image_id)
+    sharded.delete_by_class_id(class_id)
+    assert not sharded.has_class_id(class_id)
+    assert sharded.get_row(image_id) is None
+    assert len(sharded) == N - int((data[3] == class_id).sum())
+
+
+def test_check_index_data_has_single_manager_keys(single, sharded):
+    expected = single.check_index_data()
+    result = sharded.check_index_data()
+    assert set(expected) <= set(result)
+    assert result['num_shards'] == 3 and len(result['shards']) == 3
+    for key in ('index_type', 'configured_index_type', 'num_vectors', 'num_image_ids', 'num_image_paths',
+                'num_class_ids', 'num_embeddings', 'num_unique_image_ids', 'num_unique_image_paths',
+                'num_unique_class_ids', 'num_nan_vectors'):
+        assert result[key] == expected[key], key
+    assert result['min_vector_value'] == pytest.approx(expected['min_vector_value'])
+    assert result['max_vector_value'] == pytest.approx(expected['max_vector_value'])
+
+
+def test_check_index_data_empty():
+    single = FaissIndexManager(D).check_index_data()
+    result = ShardedFaissIndexManager(D, num_shards=2).check_index_data()
+    assert {key: result[key] for key in single} == {
+        **single, 'embedding_capacity': result['embedding_capacity'], 'embedding_bytes': result['embedding_bytes']
+    }
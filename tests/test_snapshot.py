@@ -0,0 +1,81 @@
+import json
+import os
+
+import numpy as np
+
+from index.snapshot import SnapshotStore, generation_name, CURRENT_FILE, MANIFEST_FILE
+
+
+def write(store, rows, **kwargs):
+    ids = np.arange(rows, dtype=np.int64)
+    return store.write(b'index-%d' % rows, np.zeros((rows, 4), dtype=np.float32), ids, ids,
+                       [f'p{i}' for i in ids], wal_seq=rows, **kwargs)
+
+
+def test_write_and_latest(tmp_path):
+    store = SnapshotStore(str(tmp_path), keep=2)
+    assert store.latest() is None
+    assert write(store, 3) == 1
+    assert write(store, 5) == 2
+
+    generation, path, manifest = store.latest(verify_checksums=True)
+    assert generation == 2
+    assert path == str(tmp_path / generation_name(2))
+    assert manifest['rows'] == 5 and manifest['wal_seq'] == 5
+    assert store.published_generation() == 2
+    # Process khác mở cùng thư mục thấy cùng generation
+    assert SnapshotStore(str(tmp_path)).published_generation() == 2
+
+
+def test_corrupt_manifest_falls_back_to_previous_generation(tmp_path):
+    store = SnapshotStore(str(tmp_path), keep=3)
+    write(store, 3)
+    write(store, 5)
+    with open(tmp_path / generation_name(2) / MANIFEST_FILE, 'w') as f:
+        f.write('{"generation": 2, "files": ')
+    assert store.latest()[0] == 1
+
+
+def test_truncated_file_fails_size_check(tmp_path):
+    store = SnapshotStore(str(tmp_path), keep=3)
+    write(store, 3)
+    write(store, 5)
+    with open(tmp_path / generation_name(2) / 'index.faiss', 'r+b') as f:
+        f.truncate(2)
+    assert store.latest()[0] == 1
+
+
+def test_current_pointing_to_missing_generation(tmp_path):
+    store = SnapshotStore(str(tmp_path), keep=3)
+    write(store, 3)
+    with open(tmp_path / CURRENT_FILE, 'w') as f:
+        f.write(generation_name(9))
+    assert store.latest()[0] == 1
+    # Generation mới vẫn lớn hơn mọi số đã thấy
+    assert write(store, 4) == 10
+
+
+def test_gc_keeps_newest_generations_and_removes_tmp(tmp_path):
+    store = SnapshotStore(str(tmp_path), keep=2)
+    os.makedirs(tmp_path / (generation_name(7) + '.tmp'))
+    for rows in range(1, 5):
+        write(store, rows)
+    assert store.generations() == [3, 4]
+    assert not any(name.endswith('.tmp') for name in os.listdir(tmp_path))
+    with open(tmp_path / generation_name(4) / MANIFEST_FILE) as f:
+        assert json.load(f)['generation'] == 4
+
+
+def test_before_publish_runs_before_counter_and_gc(tmp_path):
+    store = SnapshotStore(str(tmp_path), keep=1)
+    write(store, 1)
+    seen = []
+
+    def before_publish(generation):
+        seen.append((generation, store.published_generation(), store.generations()))
+
+    assert write(store, 2, before_publish=before_publish) == 2
+    # Lúc gọi: CURRENT đã trỏ generation mới, số generation chưa publish và generation cũ chưa bị dọn
+    assert seen == [(2, 1, [1, 2])]
+    assert store.published_generation() == 2
+    assert store.generations() == [2]
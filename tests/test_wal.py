@@ -0,0 +1,125 @@
+import os
+
+import numpy as np
+
+from index.wal import MutationLog, OP_ADD, OP_UPDATE_EMBEDDING, OP_UPDATE_PATH, OP_DELETE_IDS
+
+D = 8
+
+
+def make_log(tmp_path, **kwargs):
+    return MutationLog(str(tmp_path / 'wal.log'), D, **kwargs)
+
+
+def write_sample(log):
+    rng = np.random.default_rng(0)
+    embeddings = rng.random((3, D), dtype=np.float32)
+    log.append_add(embeddings, [1, 2, 3], ['a.jpg', 'ảnh/b.jpg', 'c.jpg'], [10, 10, 20])
+    log.append_update_embedding(2, embeddings[0])
+    log.append_update_path(3, 'c2.jpg')
+    log.append_delete_ids([1])
+    log.sync()
+    return embeddings
+
+
+def test_roundtrip_all_ops(tmp_path):
+    log = make_log(tmp_path)
+    embeddings = write_sample(log)
+    log.close()
+
+    records = list(make_log(tmp_path).replay())
+    assert [(seq, op) for seq, op, _ in records] == [
+        (1, OP_ADD), (2, OP_UPDATE_EMBEDDING), (3, OP_UPDATE_PATH), (4, OP_DELETE_IDS)
+    ]
+    emb, image_ids, image_paths, class_ids = records[0][2]
+    np.testing.assert_array_equal(emb, embeddings)
+    assert image_ids.tolist() == [1, 2, 3]
+    assert image_paths == ['a.jpg', 'ảnh/b.jpg', 'c.jpg']
+    assert class_ids.tolist() == [10, 10, 20]
+    assert records[1][2][0] == 2
+    np.testing.assert_array_equal(records[1][2][1], embeddings[0])
+    assert records[2][2] == (3, 'c2.jpg')
+    assert records[3][2][0].tolist() == [1]
+
+
+def test_append_is_buffered_until_sync(tmp_path):
+    log = make_log(tmp_path)
+    log.append_delete_ids([1, 2])
+    assert log.size == 0
+    assert log.sync() > 0
+    assert log.size > 0
+    assert log.sync() == 0
+
+
+def test_replay_after_seq_and_continues_numbering(tmp_path):
+    log = make_log(tmp_path)
+    write_sample(log)
+    log.close()
+
+    reopened = make_log(tmp_path)
+    assert [seq for seq, _, _ in reopened.replay(after_seq=2)] == [3, 4]
+    assert reopened.append_delete_ids([5]) == 5
+
+
+def test_torn_tail_is_truncated(tmp_path):
+    log = make_log(tmp_path)
+    write_sample(log)
+    log.close()
+    valid_size = os.path.getsize(log.path)
+    with open(log.path, 'ab') as f:
+        f.write(b'\x40\x00\x00\x00\x00\x00\x00\x00partial')
+
+    reopened = make_log(tmp_path)
+    assert len(list(reopened.replay())) == 4
+    assert os.path.getsize(log.path) == valid_size
+    # Bản ghi mới nối ngay sau bản ghi hợp lệ cuối cùng, không nằm sau phần rác
+    reopened.append_delete_ids([2])
+    reopened.close()
+    assert [seq for seq, _, _ in make_log(tmp_path).replay()] == [1, 2, 3, 4, 5]
+
+
+def test_crc_mismatch_stops_replay(tmp_path):
+    log = make_log(tmp_path)
+    write_sample(log)
+    log.close()
+    data = bytearray(open(log.path, 'rb').read())
+    data[-1] ^= 0xFF
+    with open(log.path, 'wb') as f:
+        f.write(data)
+
+    assert [seq for seq, _, _ in make_log(tmp_path).replay()] == [1, 2, 3]
+
+
+def test_seal_and_drop_sealed(tmp_path):
+    log = make_log(tmp_path)
+    log.append_delete_ids([1])
+    log.append_delete_ids([2])
+    assert log.seal() == 2
+    log.append_delete_ids([3])
+    log.sync()
+    assert [seq for _, seq in log._sealed_segments()] == [2]
+
+    assert [seq for seq, _, _ in make_log(tmp_path).replay()] == [1, 2, 3]
+    log.drop_sealed(2)
+    assert log._sealed_segments() == []
+    assert [seq for seq, _, _ in make_log(tmp_path).replay(after_seq=2)] == [3]
+
+
+def test_shared_replay_new_reads_only_other_writers(tmp_path):
+    a = make_log(tmp_path, shared=True)
+    b = make_log(tmp_path, shared=True)
+    a.append_delete_ids([1])
+    a.sync()
+
+    assert [seq for seq, _, _ in b.replay_new()] == [1]
+    assert b.replay_new() == []
+    b.append_delete_ids([2])
+    b.sync()
+    # a không đọc lại bản ghi của chính mình, chỉ bản ghi b vừa nối
+    assert [(seq, args[0].tolist()) for seq, _, args in a.replay_new()] == [(2, [2])]
+
+    # Log bị seal (file mới): đọc lại từ đầu file mới, bỏ bản ghi đã áp dụng
+    a.seal()
+    a.append_delete_ids([3])
+    a.sync()
+    assert [seq for seq, _, _ in b.replay_new()] == [3]
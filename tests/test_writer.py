@@ -0,0 +1,223 @@
+import os
+import stat
+import threading
+
+import numpy as np
+import pytest
+
+from index.faiss import FaissIndexManager
+from index.writer import IndexWriterClient, IndexWriterServer, read_authkey, validate_ops
+
+D = 8
+AUTHKEY = b'test-authkey-0123456789'
+
+
+def embeddings(n, seed=0):
+    return np.random.default_rng(seed).random((n, D), dtype=np.float32)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = FaissIndexManager(embedding_size=D, snapshot_dir=str(tmp_path / 'snap'), shared_writes=True)
+    manager.save()
+    manager.load()
+    manager.add_embeddings(embeddings(2), [1, 2], ['a.jpg', 'b.jpg'], [10, 10])
+    return manager
+
+
+@pytest.fixture
+def server(manager, tmp_path):
+    server = IndexWriterServer(manager, str(tmp_path / 'writer.sock'), AUTHKEY, max_wait_ms=1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    for _ in range(200):
+        if os.path.exists(server.address):
+            break
+        threading.Event().wait(0.01)
+    yield server
+    server.stop()
+    thread.join(5)
+
+
+def add_op(ids, paths=None, class_ids=None, n=None):
+    n = len(ids) if n is None else n
+    return ('add_embeddings', (embeddings(n, seed=ids[0]), ids, paths or [f'p{i}.jpg' for i in ids],
+                               class_ids or [1] * len(ids)))
+
+
+# ----- validate_ops -----
+
+def test_validate_accepts_valid_request(manager):
+    validate_ops(manager, [add_op([3, 4]), ('update_image_path', (1, 'c.jpg')), ('delete_by_class_id', (10,))])
+
+
+@pytest.mark.parametrize('op', ['save', 'load', '__init__', '_remove_rows', 'query'])
+def test_validate_rejects_unknown_ops(manager, op):
+    with pytest.raises(ValueError, match='không hợp lệ'):
+        validate_ops(manager, [(op, ())])
+
+
+@pytest.mark.parametrize('ops', [
+    [('update_image_path', (1,))],
+    [('delete_by_image_id', (1, 2, 3))],
+    [('reset_index', (True,))],
+    [('update_embedding', ())],
+])
+def test_validate_rejects_bad_arguments(manager, ops):
+    with pytest.raises(ValueError, match='Tham số không hợp lệ'):
+        validate_ops(manager, ops)
+
+
+@pytest.mark.parametrize('op', [
+    add_op([3, 4], n=3),
+    add_op([3, 4], paths=['only-one.jpg']),
+    add_op([3, 4], class_ids=[1, 2, 3]),
+])
+def test_validate_rejects_mismatched_add_payload(manager, op):
+    with pytest.raises(ValueError, match='không khớp'):
+        validate_ops(manager, [op])
+
+
+def test_validate_rejects_duplicate_ids(manager):
+    with pytest.raises(ValueError, match='trùng'):
+        validate_ops(manager, [add_op([2])])
+    with pytest.raises(ValueError, match='trùng'):
+        validate_ops(manager, [add_op([5, 5])])
+    with pytest.raises(ValueError, match='trùng'):
+        validate_ops(manager, [add_op([5]), add_op([5])])
+    # image_id bị xóa trước đó trong cùng lệnh thì được thêm lại
+    validate_ops(manager, [('delete_by_image_id', (2,)), add_op([2])])
+
+
+# ----- authkey -----
+
+def test_read_authkey_requires_secret(monkeypatch, tmp_path):
+    monkeypatch.delenv('FAISS_WRITER_AUTHKEY', raising=False)
+    with pytest.raises(RuntimeError):
+        read_authkey('FAISS_WRITER_AUTHKEY')
+    monkeypatch.setenv('FAISS_WRITER_AUTHKEY', 'short')
+    with pytest.raises(RuntimeError):
+        read_authkey('FAISS_WRITER_AUTHKEY')
+    monkeypatch.setenv('FAISS_WRITER_AUTHKEY', AUTHKEY.decode())
+    assert read_authkey('FAISS_WRITER_AUTHKEY') == AUTHKEY
+
+    secret = tmp_path / 'authkey'
+    secret.write_bytes(b'from-secret-file-0123456789\n')
+    assert read_authkey('FAISS_WRITER_AUTHKEY', str(secret)) == b'from-secret-file-0123456789'
+
+
+def test_server_and_client_refuse_missing_authkey(manager, tmp_path):
+    for authkey in (None, b'', b'face-api'):
+        with pytest.raises(ValueError):
+            IndexWriterServer(manager, str(tmp_path / 'writer.sock'), authkey)
+        with pytest.raises(ValueError):
+            IndexWriterClient(str(tmp_path / 'writer.sock'), authkey)
+
+
+# ----- server / client -----
+
+def test_socket_is_owner_only(server):
+    assert stat.S_IMODE(os.stat(server.address).st_mode) == 0o600
+
+
+def test_second_writer_on_same_socket_is_refused(server, manager):
+    with pytest.raises(RuntimeError, match='writer khác'):
+        IndexWriterServer(manager, server.address, AUTHKEY)._listen()
+
+
+def test_stale_socket_is_replaced(manager, tmp_path):
+    import socket
+    path = str(tmp_path / 'writer.sock')
+    stale = socket.socket(socket.AF_UNIX)
+    stale.bind(path)
+    stale.close()
+    listener = IndexWriterServer(manager, path, AUTHKEY)._listen()
+    listener.close()
+
+
+def test_apply_roundtrip(server, manager):
+    client = IndexWriterClient(server.address, AUTHKEY)
+    results, generation = client.apply([add_op([3]), ('update_image_path', (3, 'moved.jpg'))])
+    assert generation == manager.loaded_generation
+    assert manager.get_row_by_path('moved.jpg') == manager.get_row(3)
+
+
+def test_rejected_request_applies_nothing(server, manager):
+    client = IndexWriterClient(server.address, AUTHKEY)
+    with pytest.raises(RuntimeError, match='trùng'):
+        client.apply([add_op([3]), add_op([1])])
+    assert manager.get_row(3) is None
+    assert len(manager) == 2
+
+
+def test_wrong_authkey_is_rejected(server):
+    from multiprocessing import AuthenticationError
+    client = IndexWriterClient(server.address, b'wrong-authkey-0123456789')
+    with pytest.raises(AuthenticationError):
+        client.apply([add_op([3])])
+
+
+class BrokenConnection:
+    """Kết nối cũ tới writer đã khởi động lại: send lỗi ngay."""
+
+    def __init__(self):
+        self.closed = False
+
+    def send(self, request):
+        raise BrokenPipeError('writer restarted')
+
+    def close(self):
+        self.closed = True
+
+
+class DropsAfterSend:
+    """Writer nhận lệnh rồi ngắt kết nối trước khi trả lời."""
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, request):
+        self.sent.append(request)
+
+    def poll(self, timeout):
+        raise EOFError
+
+    def close(self):
+        pass
+
+
+def test_client_resends_when_send_fails(server, manager):
+    client = IndexWriterClient(server.address, AUTHKEY)
+    broken = BrokenConnection()
+    client._local.conn = broken
+    client.apply([add_op([3])])
+    assert broken.closed
+    assert manager.get_row(3) is not None
+    # Kết nối mới được giữ lại cho lệnh sau
+    assert client._local.conn is not broken
+    client.apply([('delete_by_image_id', (3,))])
+    assert manager.get_row(3) is None
+
+
+def test_client_gives_up_after_second_failed_send(tmp_path):
+    client = IndexWriterClient(str(tmp_path / 'writer.sock'), AUTHKEY)
+    attempts = []
+
+    def connection():
+        attempts.append(1)
+        return BrokenConnection()
+
+    client._connection = connection
+    with pytest.raises(OSError):
+        client.apply([add_op([3])])
+    assert len(attempts) == 2
+
+
+def test_client_does_not_resend_after_request_was_sent(tmp_path):
+    client = IndexWriterClient(str(tmp_path / 'writer.sock'), AUTHKEY)
+    conn = DropsAfterSend()
+    client._local.conn = conn
+    with pytest.raises(ConnectionError):
+        client.apply([add_op([3])])
+    assert len(conn.sent) == 1
+    assert client._local.conn is None